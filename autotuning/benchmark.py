@@ -0,0 +1,122 @@
+import math
+import time
+import numpy
+
+class Measurement:
+    """
+    The runtimes of repeated runs of a program, after discarding outliers.
+    median, q1, q3 and iqr describe the kept samples. [low, high] is a confidence interval of the median.
+    converged: If the interval became narrower than the target before the repetitions or seconds ran out.
+    """
+    __slots__ = ('samples', 'kept', 'median', 'q1', 'q3', 'iqr', 'low', 'high', 'converged')
+
+    def __init__(self, samples:list, kept:list, low:float, high:float, converged:bool):
+        self.samples = samples
+        self.kept = kept
+        self.q1, self.median, self.q3 = numpy.percentile(kept, [25, 50, 75]).tolist()
+        self.iqr = self.q3 - self.q1
+        self.low = low
+        self.high = high
+        self.converged = converged
+
+    def RelativeError(self) -> float:
+        """ Half the width of the confidence interval, relative to the median. """
+        return (self.high - self.low) / 2 / self.median if self.median else math.inf
+
+    def __str__(self):
+        return (f'median {self.median:.4g} iqr {self.iqr:.2g} ci [{self.low:.4g}, {self.high:.4g}] '
+            f'of {len(self.kept)}/{len(self.samples)} samples' + ('' if self.converged else ' (not converged)'))
+
+
+def DiscardOutliers(samples:list, k:float = 1.5) -> list:
+    """ Returns the samples inside Tukey's fences, i.e. at most k IQRs outside the quartiles. """
+    q1, q3 = numpy.percentile(samples, [25, 75])
+    low, high = q1 - k * (q3 - q1), q3 + k * (q3 - q1)
+    return [s for s in samples if low <= s <= high]
+
+
+def MedianInterval(samples:list, z:float = 1.96) -> tuple:
+    """
+    Returns a distribution-free confidence interval of the median: the order statistics
+    whose ranks are z standard deviations of the binomial distribution around n/2.
+    z = 1.96 gives about 95% confidence. It has no randomness, so it is the same for the same samples.
+    """
+    ordered = sorted(samples)
+    n = len(ordered)
+    spread = z * math.sqrt(n) / 2
+    low = max(int(math.floor(n / 2 - spread)), 0)
+    high = min(int(math.ceil(n / 2 + spread)), n - 1)
+    return ordered[low], ordered[high]
+
+
+_flush_buffer = None
+
+def FlushCaches(size:int = 64 * 1024 * 1024):
+    """ Evicts the host's caches by writing and reading a buffer of 'size' bytes, which should exceed the last level cache. """
+    global _flush_buffer
+    if _flush_buffer is None or _flush_buffer.nbytes != size:
+        _flush_buffer = numpy.empty(size // 8)
+    _flush_buffer.fill(1.0)
+    _flush_buffer.sum()
+
+
+def Benchmark(sample, warmup:int = 1, min_repetitions:int = 5, max_repetitions:int = 50, target:float = 0.01,
+    max_seconds:float = None, flush:bool = False, outlier_k:float = 1.5, z:float = 1.96, clock = time.perf_counter) -> Measurement:
+    """
+    Runs sample() until the confidence interval of the median runtime is within 'target' of the median.
+    sample(): Runs the program once and returns its runtime, or None to use the wall time of the call.
+    warmup: Runs before measuring, which are not kept, e.g. to load the library and fill the caches.
+    min_repetitions, max_repetitions, max_seconds: Bound the measured runs. max_seconds includes the warm-up.
+    flush: Flushes the host's caches before each measured run.
+    outlier_k: Samples further than this many IQRs outside the quartiles are discarded. None keeps all.
+    """
+    if min_repetitions < 1 or max_repetitions < min_repetitions:
+        raise ValueError(f'Needs 1 <= min_repetitions <= max_repetitions, not {min_repetitions} and {max_repetitions}.')
+
+    def Run():
+        if flush:
+            FlushCaches()
+        start = clock()
+        runtime = sample()
+        return clock() - start if runtime is None else runtime
+
+    start = clock()
+    for _ in range(warmup):
+        Run()
+
+    samples = []
+    while True:
+        samples.append(Run())
+        kept = samples if outlier_k is None else DiscardOutliers(samples, outlier_k)
+        low, high = MedianInterval(kept, z)
+        median = numpy.median(kept)
+        converged = (high - low) / 2 <= target * median
+        if len(samples) < min_repetitions:
+            continue
+        if converged or len(samples) >= max_repetitions:
+            break
+        if max_seconds is not None and clock() - start >= max_seconds:
+            break
+    return Measurement(samples, kept, low, high, converged)
+
+
+def Rank(measurements:dict) -> list:
+    """
+    Returns (rank, key, Measurement) tuples, fastest first.
+    Measurements whose confidence interval overlaps the fastest of their group share its rank,
+    since their order is noise. Within a rank they are ordered by key, so the ranking is reproducible.
+    """
+    ordered = sorted(measurements.items(), key = lambda item: (item[1].median, str(item[0])))
+    groups = []
+    for key, measurement in ordered:
+        if groups and measurement.low <= groups[-1][0][1].high:
+            groups[-1].append((key, measurement))
+        else:
+            groups.append([(key, measurement)])
+
+    ranking = []
+    for group in groups:
+        rank = len(ranking) + 1
+        for key, measurement in sorted(group, key = lambda item: str(item[0])):
+            ranking.append((rank, key, measurement))
+    return ranking
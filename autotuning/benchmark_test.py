@@ -0,0 +1,78 @@
+import unittest
+import random
+from benchmark import *
+
+def Sampler(values):
+    values = iter(values)
+    return lambda: next(values)
+
+def Noisy(median, spread, seed):
+    rng = random.Random(seed)
+    return lambda: median * (1 + rng.uniform(-spread, spread))
+
+class Benchmark_test(unittest.TestCase):
+    def test_warmup_is_not_kept(self):
+        measurement = Benchmark(Sampler([100, 1, 1, 1, 1, 1]), warmup=1, min_repetitions=5)
+        self.assertEqual(measurement.samples, [1] * 5)
+        self.assertTrue(measurement.converged)
+
+    def test_outliers_are_discarded(self):
+        measurement = Benchmark(Sampler([1, 1.01, 0.99, 1, 50, 1.02, 0.98]), warmup=0, min_repetitions=7, max_repetitions=7)
+        self.assertEqual(len(measurement.samples), 7)
+        self.assertNotIn(50, measurement.kept)
+        self.assertAlmostEqual(measurement.median, 1)
+
+    def test_repeats_until_the_target(self):
+        loose = Benchmark(Noisy(1, 0.1, seed=0), warmup=0, target=0.1, max_repetitions=1000)
+        tight = Benchmark(Noisy(1, 0.1, seed=0), warmup=0, target=0.01, max_repetitions=1000)
+        self.assertTrue(loose.converged and tight.converged)
+        self.assertLess(len(loose.samples), len(tight.samples))
+        self.assertLessEqual(tight.RelativeError(), 0.01)
+        self.assertTrue(tight.low <= tight.median <= tight.high)
+
+    def test_max_repetitions(self):
+        measurement = Benchmark(Noisy(1, 0.5, seed=0), warmup=0, target=1e-9, max_repetitions=10)
+        self.assertEqual(len(measurement.samples), 10)
+        self.assertFalse(measurement.converged)
+
+    def test_wall_time(self):
+        now = [0]
+        def Clock():
+            now[0] += 1
+            return now[0]
+        measurement = Benchmark(lambda: None, warmup=0, min_repetitions=5, clock=Clock)
+        self.assertEqual(measurement.samples, [1] * 5)
+
+    def test_flush(self):
+        Benchmark(lambda: 1, warmup=0, min_repetitions=1, flush=True)
+
+    def test_invalid_repetitions(self):
+        self.assertRaises(ValueError, Benchmark, lambda: 1, min_repetitions=5, max_repetitions=2)
+
+class Rank_test(unittest.TestCase):
+    def test_overlapping_intervals_share_a_rank(self):
+        measurements = {
+            'b' : Measurement([1.0], [1.0], 0.98, 1.02, True),
+            'a' : Measurement([1.01], [1.01], 0.99, 1.03, True),
+            'c' : Measurement([2.0], [2.0], 1.9, 2.1, True),
+        }
+        ranking = [(rank, key) for rank, key, _ in Rank(measurements)]
+        self.assertEqual(ranking, [(1, 'a'), (1, 'b'), (3, 'c')])
+
+    def test_reproducible(self):
+        rankings = []
+        for seed in range(2):
+            measurements = { bi : Benchmark(Noisy(1 + bi * 0.001, 0.05, seed * 100 + bi), warmup=0) for bi in range(8) }
+            rankings.append([(rank, key) for rank, key, _ in Rank(measurements)])
+        self.assertEqual(rankings[0], rankings[1])
+
+class MedianInterval_test(unittest.TestCase):
+    def test_contains_the_median(self):
+        samples = list(range(101))
+        low, high = MedianInterval(samples)
+        self.assertTrue(low < 50 < high)
+        self.assertEqual(MedianInterval([3.0]), (3.0, 3.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
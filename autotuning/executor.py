@@ -0,0 +1,104 @@
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import time
+import traceback
+
+class Outcome:
+    """ What became of one task: its status is 'ok', 'failed' (raised), 'crashed' (the process died) or 'timeout'. """
+    __slots__ = ('task', 'status', 'seconds', 'value', 'error')
+
+    def __init__(self, task, status:str, seconds:float, value=None, error:str=None):
+        self.task = task
+        self.status = status
+        self.seconds = seconds
+        self.value = value
+        self.error = error
+
+    def __str__(self):
+        return f'{self.task} {self.status} after {self.seconds:.1f}s'
+
+
+def CoreSets(processes:int, cores_per_process:int = 1) -> list:
+    """ Returns disjoint sets of the cores this process may run on, one per concurrent process. """
+    cores = sorted(os.sched_getaffinity(0))
+    if processes * cores_per_process > len(cores):
+        raise ValueError(f'{processes} processes of {cores_per_process} cores need more than the {len(cores)} available cores.')
+    return [set(cores[i * cores_per_process : (i + 1) * cores_per_process]) for i in range(processes)]
+
+
+def _Child(function, task, cores, connection):
+    # A session of its own, so a timeout kills the compilers the task started too.
+    os.setsid()
+    if cores is not None:
+        os.sched_setaffinity(0, cores)
+    try:
+        result = ('ok', function(task), None)
+    except Exception:
+        result = ('failed', None, traceback.format_exc())
+    connection.send(result)
+    connection.close()
+
+
+def _KillGroup(process):
+    """ Kills the process and every process it started, which share its process group. """
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    process.join()
+
+
+def RunIsolated(function, tasks, processes:int = None, timeout:float = None, cores:list = None):
+    """
+    Runs function(task) for each task in a process of its own, and yields an Outcome per task as they finish.
+    A task that raises, crashes its process or runs longer than 'timeout' seconds does not affect the others.
+    processes: How many tasks run at a time. Defaults to the number of cores.
+    cores: Sets of cores to pin the processes to, one set per concurrent process, e.g. from CoreSets.
+        This also limits the concurrency to len(cores).
+    """
+    if cores is not None:
+        slots = list(cores)
+    else:
+        slots = [None] * (processes or os.cpu_count())
+    pending = list(tasks)
+    running = {} # dict[Process, (task, Connection, start, slot)]
+
+    while pending or running:
+        while pending and slots:
+            slot = slots.pop(0)
+            task = pending.pop(0)
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=_Child, args=(function, task, slot, sender), daemon=True)
+            process.start()
+            sender.close()
+            running[process] = (task, receiver, time.perf_counter(), slot)
+
+        # Wakes up when a process sends its result or dies, or to check the timeouts.
+        multiprocessing.connection.wait(
+            [receiver for _, receiver, _, _ in running.values()] + [process.sentinel for process in running],
+            timeout = 1.0 if timeout is not None else None)
+
+        for process, (task, receiver, start, slot) in list(running.items()):
+            seconds = time.perf_counter() - start
+            outcome = None
+            if receiver.poll():
+                try:
+                    status, value, error = receiver.recv()
+                    outcome = Outcome(task, status, seconds, value, error)
+                except EOFError:
+                    outcome = Outcome(task, 'crashed', seconds, error=f'exit code {process.exitcode}')
+                process.join()
+            elif not process.is_alive():
+                process.join()
+                outcome = Outcome(task, 'crashed', seconds, error=f'exit code {process.exitcode}')
+            elif (timeout is not None) and (seconds > timeout):
+                _KillGroup(process)
+                outcome = Outcome(task, 'timeout', seconds, error=f'exceeded {timeout}s')
+
+            if outcome is not None:
+                receiver.close()
+                del running[process]
+                slots.append(slot)
+                yield outcome
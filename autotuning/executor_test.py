@@ -0,0 +1,83 @@
+import unittest
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from executor import *
+
+def Square(x):
+    return x * x
+
+def Raise(x):
+    raise ValueError(x)
+
+def Crash(x):
+    os._exit(3)
+
+def Sleep(x):
+    time.sleep(x)
+    return x
+
+def SpawnAndSleep(file_name):
+    # Like DaCe, which compiles in subprocesses.
+    child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+    with open(file_name, 'w') as f:
+        f.write(str(child.pid))
+    time.sleep(60)
+
+def Alive(pid:int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # A killed child of another process stays a zombie until it is reaped.
+    with open(f'/proc/{pid}/stat') as f:
+        return f.read().split(')')[-1].split()[0] != 'Z'
+
+def Affinity(x):
+    return os.sched_getaffinity(0)
+
+class RunIsolated_test(unittest.TestCase):
+    def test_results(self):
+        outcomes = list(RunIsolated(Square, [1, 2, 3], processes=2))
+        self.assertEqual(sorted(o.value for o in outcomes), [1, 4, 9])
+        self.assertTrue(all(o.status == 'ok' for o in outcomes))
+
+    def test_failure_is_isolated(self):
+        outcomes = { o.task : o for o in RunIsolated(Raise, [1, 2]) }
+        self.assertEqual(outcomes[1].status, 'failed')
+        self.assertIn('ValueError', outcomes[1].error)
+
+    def test_crash_is_isolated(self):
+        [outcome] = RunIsolated(Crash, [1])
+        self.assertEqual(outcome.status, 'crashed')
+
+    def test_timeout(self):
+        outcomes = { o.task : o for o in RunIsolated(Sleep, [0, 60], timeout=0.5) }
+        self.assertEqual(outcomes[0].status, 'ok')
+        self.assertEqual(outcomes[60].status, 'timeout')
+
+    def test_timeout_kills_subprocesses(self):
+        with tempfile.TemporaryDirectory() as folder:
+            file_name = os.path.join(folder, 'pid')
+            [outcome] = RunIsolated(SpawnAndSleep, [file_name], timeout=0.5)
+            self.assertEqual(outcome.status, 'timeout')
+            with open(file_name) as f:
+                pid = int(f.read())
+        deadline = time.time() + 5
+        while Alive(pid) and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(Alive(pid))
+
+    def test_pinning(self):
+        cores = CoreSets(1)
+        [outcome] = RunIsolated(Affinity, [0], cores=cores)
+        self.assertEqual(outcome.value, cores[0])
+
+    def test_too_many_cores(self):
+        self.assertRaises(ValueError, CoreSets, os.cpu_count() + 1, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,91 +1,15 @@
 import dace
 import numpy
-import math
 import operator
 import sys
 from numpy.lib.stride_tricks import as_strided
 from functools import reduce
+# Shared with the tests of the translator.
+from src.reference_stencils import type2, smag, WaveValues
 
 def prod(iterable):
     return reduce(operator.mul, iterable, 1)
 
-def lap2D(data, i, j, k, plus=None, minus=None):
-    if (plus is None) and (minus is None):
-        return data[i-1,j,k] + data[i+1,j,k] - 2.0 * data[i,j,k] \
-            + (data[i,j+1,k] - data[i,j,k]) \
-            + (data[i,j-1,k] - data[i,j,k])
-
-    return data[i-1,j,k] + data[i+1,j,k] - 2.0 * data[i,j,k] \
-        + plus[j] * (data[i,j+1,k] - data[i,j,k]) \
-        + minus[j] * (data[i,j-1,k] - data[i,j,k])
-
-
-def diffusive_flux_x(lap, data, i, j, k):
-    flx = lap[i+1,j,k] - lap[i,j,k]
-    return 0.0 if (flx * (data[i+1,j,k] - data[i,j,k])) > 0.0 else flx
-
-def diffusive_flux_y(lap, data, crlato, i, j, k):
-    fly = crlato[j] * (lap[i,j+1,k] - lap[i,j,k])
-    return 0.0 if (fly * (data[i,j+1,k] - data[i,j,k])) > 0.0 else fly
-
-def type2(data, crlato, crlatu, hdmask, dim, halo=None):
-    halo = halo or dim.halo
-    lap = Zeros(dim.ijk)
-    for i in range(1, dim.I-1):
-        for j in range(1, dim.J-1):
-            for k in range(0, dim.K):
-                lap[i,j,k] = lap2D(data, i, j, k, crlato, crlatu)
-
-    out = Zeros(dim.ijk)
-    for i in range(halo, dim.I-halo):
-        for j in range(halo, dim.J-halo):
-            for k in range(0, dim.K):
-                delta_flux_x = diffusive_flux_x(lap, data, i, j, k) - diffusive_flux_x(lap, data, i-1, j, k)
-                delta_flux_y = diffusive_flux_y(lap, data, crlato, i, j, k) - diffusive_flux_y(lap, data, crlato, i, j-1, k)
-                out[i,j,k] = data[i,j,k] - hdmask[i,j,k] * (delta_flux_x + delta_flux_y)
-    return out
-
-def smag(u, v, hdmask, crlavo, crlavu, crlato, crlatu, acrlat0, dim):
-    eddlon = 5729.58
-    eddlat = 5729.58
-    T_sqr_s = Zeros(dim.ijk)
-    for i in range(1, dim.I):
-        for j in range(1, dim.J):
-            for k in range(0, dim.K):
-                frac_1_dx = acrlat0[j] * eddlon
-                frac_1_dy = eddlat / 6371.229e3
-
-                T_s = (v[i,j-1,k] - v[i,j,k]) * frac_1_dy - (u[i-1,j,k] - u[i,j,k]) * frac_1_dx
-                T_sqr_s[i,j,k] = T_s * T_s
-
-    S_sqr_uv = Zeros(dim.ijk)
-    for i in range(0, dim.I-1):
-        for j in range(0, dim.J-1):
-            for k in range(0, dim.K):
-                frac_1_dx = acrlat0[j] * eddlon
-                frac_1_dy = eddlat / 6371.229e3
-
-                S_uv = (u[i,j+1,k] - u[i,j,k]) * frac_1_dy - (v[i+1,j,k] - v[i,j,k]) * frac_1_dx
-                S_sqr_uv[i,j,k] = S_uv * S_uv
-
-    u_out = Zeros(dim.ijk)
-    v_out = Zeros(dim.ijk)
-    for i in range(dim.halo, dim.I-dim.halo):
-        for j in range(dim.halo, dim.J-dim.halo):
-            for k in range(0, dim.K):
-                weight_smag = 0.5
-                tau_smag = 0.3
-                hdweight = weight_smag * hdmask[i,j,k]
-
-                smag_u = tau_smag * numpy.sqrt(0.5 * (T_sqr_s[i,j,k] + T_sqr_s[i+1,j,k]) + 0.5 * (S_sqr_uv[i,j,k] + S_sqr_uv[i,j-1,k])) - hdweight
-                smag_u = min(0.5, max(0.0, smag_u))
-                u_out[i,j,k] = u[i,j,k] + smag_u * lap2D(u, i, j, k, crlato, crlatu)
-
-                smag_v = tau_smag * numpy.sqrt(0.5 * (T_sqr_s[i,j,k] + T_sqr_s[i,j+1,k]) + 0.5 * (S_sqr_uv[i,j,k] + S_sqr_uv[i-1,j,k])) - hdweight
-                smag_v = min(0.5, max(0.0, smag_v))
-                v_out[i,j,k] = v[i,j,k] + smag_v * lap2D(v, i, j, k, crlavo, crlavu)
-    return u_out, v_out
-
 class Dim:
     def __init__(self, domain_sizes:list, strides:list, total_size:int):
         """
@@ -164,19 +88,14 @@ def Iota(dim:Dim, offset=0):
 
 def Waves(a, b, c, d, e, f, dim:Dim):
     data = Zeros(dim)
-    for i in range(dim.I or 1):
-        for j in range(dim.J or 1):
-            x = i / (dim.I or 1)
-            y = j / (dim.J or 1)
-            tmp = a * (b + math.cos(math.pi * (x + c * y)) + math.sin(d * math.pi * (x + e * y))) / f
-            for k in range(dim.K or 1):
-                index = tuple(idx for idx, size in [(i,dim.I),(j,dim.J),(k,dim.K)] if size)
-                data[index] = tmp + k * 0.01
+    data[...] = WaveValues(a, b, c, d, e, f, dim)
     return data
 
-def assertIsClose(expected, received, name, dim, rtol=1e-5):
+def assertIsClose(expected, received, name, dim, rtol=1e-5) -> bool:
+    """ Prints and returns if the received values are close to the expected ones. """
     with numpy.printoptions(threshold=sys.maxsize):
-        if numpy.isclose(expected, received, rtol=rtol).all():
+        close = numpy.isclose(expected, received, rtol=rtol).all()
+        if close:
             print(f"{name} is good!")
         else:
             print(f"{name} is bad!")
@@ -185,6 +104,7 @@ def assertIsClose(expected, received, name, dim, rtol=1e-5):
             #         for k in range(0,dim.K):
             #             if received[i,j,k] != expected[i,j,k]:
             #                 print(f"{name}[{i},{j},{k}] ref {expected[i,j,k]}, dace {received[i,j,k]}, diff {received[i,j,k]-expected[i,j,k]}")
+        return bool(close)
 
 
 def CreateInputData(domain_sizes, memory_layout):
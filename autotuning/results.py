@@ -0,0 +1,135 @@
+import json
+import os
+import platform
+import socket
+import sqlite3
+import statistics
+import time
+
+def HostInfo() -> dict:
+    """ Describes the machine the results are measured on. """
+    return {
+        'hostname' : socket.gethostname(),
+        'platform' : platform.platform(),
+        'processor' : platform.processor(),
+        'cores' : os.cpu_count(),
+        'python' : platform.python_version(),
+    }
+
+def Runtimes(durations) -> list:
+    """ Returns all the times in an instrumentation report's durations, which nest dicts around lists of times. """
+    if isinstance(durations, dict):
+        return [t for value in durations.values() for t in Runtimes(value)]
+    if isinstance(durations, (list, tuple)):
+        return [t for value in durations for t in Runtimes(value)]
+    return [float(durations)]
+
+def ReportSeconds(report) -> float:
+    """ Returns the total time of an instrumentation report in seconds. DaCe reports milliseconds. """
+    return sum(Runtimes(report.durations)) / 1000
+
+def Key(config) -> str:
+    """ The full config tuple, e.g. ((128,128,80),'kij','kij',8,32,1), in JSON. """
+    return json.dumps(config)
+
+
+class Results:
+    """
+    SQLite store of a sweep's results, keyed by the full config.
+    Each config has its compile time, the runtime of every repetition in seconds and what timed them,
+    its validation status and the host it ran on.
+    """
+
+    def __init__(self, file_name:str):
+        self.file_name = file_name
+        with self.Connect() as db:
+            db.execute('''CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                compile_seconds REAL,
+                runtimes TEXT NOT NULL,
+                median REAL,
+                valid INTEGER,
+                host TEXT NOT NULL,
+                error TEXT,
+                time REAL NOT NULL,
+                timer TEXT)''')
+            if 'timer' not in { column for _, column, *_ in db.execute('PRAGMA table_info(results)') }:
+                db.execute('ALTER TABLE results ADD COLUMN timer TEXT') # A file of an earlier version.
+
+    def Connect(self):
+        # Concurrent sweeps write to the same file, so they wait for each other's transactions.
+        return sqlite3.connect(self.file_name, timeout=60)
+
+    def Record(self, config, status:str = 'ok', compile_seconds:float = None, runtimes:list = (), valid:bool = None,
+        error:str = None, host:dict = None, timer:str = None):
+        """
+        Stores the result of a config, replacing an earlier one.
+        status: 'ok', or how it failed, e.g. 'failed', 'crashed' or 'timeout'.
+        runtimes: In seconds.
+        valid: If the output matched the reference. None if it was not validated.
+        timer: What measured the runtimes: 'instrumentation' for the instrumented states, 'wall' for the whole call.
+        """
+        runtimes = list(runtimes)
+        median = statistics.median(runtimes) if runtimes else None
+        with self.Connect() as db:
+            db.execute('INSERT OR REPLACE INTO results VALUES (?,?,?,?,?,?,?,?,?,?)', (
+                Key(config),
+                status,
+                compile_seconds,
+                json.dumps(runtimes),
+                median,
+                None if valid is None else int(valid),
+                json.dumps(host or HostInfo()),
+                error,
+                time.time(),
+                timer))
+
+    def Get(self, config) -> dict:
+        """ Returns the result of a config, or None if it has none. """
+        with self.Connect() as db:
+            row = db.execute('SELECT * FROM results WHERE key = ?', (Key(config),)).fetchone()
+        return None if row is None else self._Result(row)
+
+    @staticmethod
+    def _Result(row) -> dict:
+        key, status, compile_seconds, runtimes, median, valid, host, error, time, timer = row
+        return {
+            'config' : json.loads(key),
+            'status' : status,
+            'compile_seconds' : compile_seconds,
+            'runtimes' : json.loads(runtimes),
+            'median' : median,
+            'valid' : None if valid is None else bool(valid),
+            'host' : json.loads(host),
+            'error' : error,
+            'time' : time,
+            'timer' : timer,
+        }
+
+    def All(self) -> list:
+        with self.Connect() as db:
+            return [self._Result(row) for row in db.execute('SELECT * FROM results ORDER BY time')]
+
+    def Completed(self, config, retry_failed:bool = False) -> bool:
+        """ Returns if the config has a result. retry_failed: Only successful results count. """
+        result = self.Get(config)
+        return (result is not None) and (result['status'] == 'ok' or not retry_failed)
+
+    def Pending(self, sweep:list, retry_failed:bool = False) -> list:
+        """ Returns the configs of the sweep without a result, to resume it. """
+        with self.Connect() as db:
+            query = 'SELECT key FROM results' + (" WHERE status = 'ok'" if retry_failed else '')
+            done = { key for key, in db.execute(query) }
+        return [config for config in sweep if Key(config) not in done]
+
+    def Rank(self, where = None, limit:int = None) -> list:
+        """
+        Returns the successful, not invalid results, fastest median runtime first.
+        where: A predicate on the config, e.g. lambda config: tuple(config[0]) == (128,128,80).
+        """
+        ranked = [r for r in self.All() if r['status'] == 'ok' and r['valid'] is not False and r['median'] is not None]
+        if where is not None:
+            ranked = [r for r in ranked if where(r['config'])]
+        ranked.sort(key = lambda r: (r['median'], Key(r['config'])))
+        return ranked[:limit]
@@ -0,0 +1,68 @@
+import unittest
+import os
+import tempfile
+import types
+from results import *
+
+class Results_test(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.results = Results(os.path.join(self.folder.name, 'results.sqlite'))
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_record_and_get(self):
+        config = ((128,128,80), 'kij', 'kij', 8, 32, 1)
+        self.results.Record(config, compile_seconds=2.0, runtimes=[3.0, 1.0, 2.0], valid=True)
+        result = self.results.Get(config)
+        self.assertEqual(result['config'], [[128,128,80], 'kij', 'kij', 8, 32, 1])
+        self.assertEqual(result['runtimes'], [3.0, 1.0, 2.0])
+        self.assertEqual(result['median'], 2.0)
+        self.assertTrue(result['valid'])
+        self.assertIsNone(self.results.Get(((1,1,1), 'kij', 'kij', 1, 1, 1)))
+
+    def test_resumes_where_it_stopped(self):
+        sweep = [((8,8,8), 'kij', 'kij', b, 1, 1) for b in (1, 2, 4)]
+        self.results.Record(sweep[0], runtimes=[1.0])
+        self.results.Record(sweep[1], status='crashed', error='exit code -11')
+        self.assertEqual(self.results.Pending(sweep), [sweep[2]])
+        self.assertEqual(self.results.Pending(sweep, retry_failed=True), sweep[1:])
+        self.assertTrue(self.results.Completed(sweep[1]))
+        self.assertFalse(self.results.Completed(sweep[1], retry_failed=True))
+
+    def test_rank(self):
+        self.results.Record(('a',), runtimes=[2.0])
+        self.results.Record(('b',), runtimes=[1.0], valid=False)
+        self.results.Record(('c',), runtimes=[3.0], valid=True)
+        self.results.Record(('d',), status='timeout')
+        self.assertEqual([r['config'] for r in self.results.Rank()], [['a'], ['c']])
+        self.assertEqual([r['config'] for r in self.results.Rank(where=lambda c: c[0] == 'c')], [['c']])
+
+    def test_runtimes(self):
+        self.assertEqual(Runtimes({ 'state' : { 'map' : [1, 2] }, 'other' : [3] }), [1.0, 2.0, 3.0])
+
+    def test_report_seconds(self):
+        report = types.SimpleNamespace(durations={ 'state' : { 'map' : [1500, 500] } })
+        self.assertEqual(ReportSeconds(report), 2.0)
+
+    def test_timer(self):
+        self.results.Record(('a',), runtimes=[1.0], timer='wall')
+        self.results.Record(('b',), runtimes=[1.0])
+        self.assertEqual(self.results.Get(('a',))['timer'], 'wall')
+        self.assertIsNone(self.results.Get(('b',))['timer'])
+
+    def test_opens_files_without_timer(self):
+        file_name = os.path.join(self.folder.name, 'old.sqlite')
+        with sqlite3.connect(file_name) as db:
+            db.execute('''CREATE TABLE results (key TEXT PRIMARY KEY, status TEXT NOT NULL, compile_seconds REAL,
+                runtimes TEXT NOT NULL, median REAL, valid INTEGER, host TEXT NOT NULL, error TEXT, time REAL NOT NULL)''')
+            db.execute('INSERT INTO results VALUES (?,?,?,?,?,?,?,?,?)', (Key(('a',)), 'ok', None, '[1.0]', 1.0, None, '{}', None, 0))
+        results = Results(file_name)
+        self.assertIsNone(results.Get(('a',))['timer'])
+        results.Record(('b',), runtimes=[1.0], timer='instrumentation')
+        self.assertEqual(results.Get(('b',))['timer'], 'instrumentation')
+
+
+if __name__ == '__main__':
+    unittest.main()
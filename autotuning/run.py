@@ -1,9 +1,15 @@
+import os
+import sys
+# The reference stencils are imported from the translator's package in the repository's root.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 from itertools import permutations
 from sweep import *
+from benchmark import Benchmark
+from results import Results, ReportSeconds
 import numpy as np
 import reference
 import dace
-import sys
+import time
 
 def CreateProgam(program_config):
     loop_order, block_size_i, block_size_j, block_size_k = program_config
@@ -73,7 +79,13 @@ def CreateProgam(program_config):
     sdfg.save(common_folder + f'smag-gpu_{sdfg.name}.sdfg')
     return sdfg
 
-def run(sdfg, config):
+def run(sdfg, config, results:Results = None, compile_seconds:float = None, **benchmark):
+    """
+    Runs the SDFG on the config's input data until its runtime is stable, see benchmark.Benchmark for the options.
+    sdfg: An SDFG, which is compiled once here, or the CompiledSDFG of sdfg.compile() to reuse it for several configs.
+    Returns the runtimes it kept in seconds, if its output matched the reference (None if unchecked),
+    and what timed them, see Results.Record.
+    """
     num_input_vars = 6
     num_output_vars = 2
     input_vars = []
@@ -95,34 +107,47 @@ def run(sdfg, config):
     u_out_dace = reference.Zeros(dim.ijk)
     v_out_dace = reference.Zeros(dim.ijk)
 
-    sdfg(
-        acrlat0 = acrlat0,
-        crlavo = crlavo,
-        crlavu = crlavu,
-        crlato = crlato,
-        crlatu = crlatu,
-        hdmaskvel = hdmask,
-        u_out = u_out_dace,
-        u_in = u_in,
-        v_out = v_out_dace,
-        v_in = v_in,
-        **dim.ProgramArguments())
-
-    with open(common_folder + f'log_{FullName(config)}.txt', 'w') as f:
-        original_stdout = sys.stdout
-        sys.stdout = f
-        print(f'{config} {sdfg.get_latest_report().durations}')
-
-        if (config[0] == (128,128,80)):
-            # load the reference output data
-            for index in range(num_output_vars):
-                file_name = common_folder + OutVarName(data_config, index) + '.npy'
-                output_vars.append(np.load(file_name))
-            u_out, v_out = output_vars
-            reference.assertIsClose(u_out, u_out_dace, 'u', dim)
-            reference.assertIsClose(v_out, v_out_dace, 'v', dim)
-
-        sys.stdout = original_stdout
+    # Calling the SDFG itself would generate and build its code again on every call.
+    csdfg = sdfg.compile() if isinstance(sdfg, dace.SDFG) else sdfg
+
+    timers = set()
+
+    def Sample():
+        csdfg(
+            acrlat0 = acrlat0,
+            crlavo = crlavo,
+            crlavu = crlavu,
+            crlato = crlato,
+            crlatu = crlatu,
+            hdmaskvel = hdmask,
+            u_out = u_out_dace,
+            u_in = u_in,
+            v_out = v_out_dace,
+            v_in = v_in,
+            **dim.ProgramArguments())
+        report = csdfg.sdfg.get_latest_report()
+        # The instrumented states' times, or the wall time of the call if nothing is instrumented.
+        timers.add('wall' if report is None else 'instrumentation')
+        return None if report is None else ReportSeconds(report)
+
+    measurement = Benchmark(Sample, **benchmark)
+    runtimes = measurement.kept
+    timer = timers.pop() if len(timers) == 1 else 'mixed'
+    print(f'{config} {measurement} in seconds of {timer} time')
+
+    valid = None
+    if (config[0] == (128,128,80)):
+        # load the reference output data
+        for index in range(num_output_vars):
+            file_name = common_folder + OutVarName(data_config, index) + '.npy'
+            output_vars.append(np.load(file_name))
+        u_out, v_out = output_vars
+        valid = reference.assertIsClose(u_out, u_out_dace, 'u', dim)
+        valid = reference.assertIsClose(v_out, v_out_dace, 'v', dim) and valid
+
+    if results is not None:
+        results.Record(config, compile_seconds=compile_seconds, runtimes=runtimes, valid=valid, timer=timer)
+    return runtimes, valid, timer
 
 
 def main():
@@ -132,14 +157,20 @@ def main():
     data_set = CreateDataSet(sweep)
     program_set = CreateProgramSet(sweep)
 
-    # run all configs for one program
+    # run all configs for one program, except the ones a previous attempt completed.
     if (sweep_index >= len(program_set)):
         return
     program_config = program_set[sweep_index]
+    results = Results(results_file)
+    configs = [s for s in results.Pending(sweep) if ProgramRelevant(s) == program_config]
+    if not configs:
+        return
+    start = time.perf_counter()
     sdfg = CreateProgam(program_config)
-    for s in sweep:
-        if ProgramRelevant(s) == program_config:
-            run(sdfg, s)
+    csdfg = sdfg.compile()
+    compile_seconds = time.perf_counter() - start
+    for s in configs:
+        run(csdfg, s, results, compile_seconds)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
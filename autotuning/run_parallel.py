@@ -0,0 +1,97 @@
+import os
+import sys
+# The reference stencils are imported from the translator's package in the repository's root.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import argparse
+import time
+import dace
+import run
+from executor import *
+from results import Results
+from sweep import *
+
+def LoadProgram(program_config):
+    """ Returns the SDFG that CreateProgam saved for this program config. """
+    return dace.sdfg.SDFG.from_file(common_folder + f'smag-gpu_{ProgramName(program_config)}.sdfg')
+
+def CompileProgram(program_config) -> float:
+    """ Creates and compiles a program variant into DaCe's build folder. Returns the seconds it took. """
+    start = time.perf_counter()
+    sdfg = run.CreateProgam(program_config)
+    sdfg.compile()
+    return time.perf_counter() - start
+
+def RunProgram(task):
+    config, compile_seconds, results_file, benchmark = task
+    # The compiled library of CompileProgram is loaded instead of being built again.
+    dace.Config.set('compiler', 'use_cache', value=True)
+    run.run(LoadProgram(ProgramRelevant(config)), config, Results(results_file), compile_seconds, **benchmark)
+
+def RunSweep(sweep, compile_processes:int = None, run_processes:int = 1, cores_per_run:int = 1,
+    compile_timeout:float = None, run_timeout:float = None, results:Results = None, retry_failed:bool = False,
+    benchmark:dict = None) -> list:
+    """
+    Compiles the programs of the sweep concurrently, then runs the configs with at most run_processes at a time,
+    each pinned to cores_per_run cores of its own, so their timings don't interfere.
+    Every variant runs in a process of its own, so crashes and timeouts only lose that variant.
+    results: Where the results are stored. Configs that already have one are skipped, so an interrupted sweep resumes.
+    retry_failed: Also runs the configs whose result is a failure again.
+    benchmark: Options of benchmark.Benchmark for the runs.
+    Returns the Outcome of every compilation and run.
+    """
+    results = results or Results(results_file)
+    sweep = results.Pending(sweep, retry_failed)
+    outcomes = []
+    compile_seconds = {}
+    program_set = CreateProgramSet(sweep)
+    for outcome in RunIsolated(CompileProgram, program_set, compile_processes, compile_timeout):
+        print(f'compile {outcome}', flush=True)
+        outcomes.append(outcome)
+        if outcome.status == 'ok':
+            compile_seconds[outcome.task] = outcome.value
+        else:
+            print(outcome.error, file=sys.stderr)
+            for s in sweep:
+                if ProgramRelevant(s) == outcome.task:
+                    results.Record(s, status='compile ' + outcome.status, compile_seconds=outcome.seconds, error=outcome.error)
+
+    runs = [(s, compile_seconds[ProgramRelevant(s)], results.file_name, benchmark or {}) for s in sweep if ProgramRelevant(s) in compile_seconds]
+    for outcome in RunIsolated(RunProgram, runs, timeout=run_timeout, cores=CoreSets(run_processes, cores_per_run)):
+        print(f'run {outcome}', flush=True)
+        outcomes.append(outcome)
+        if outcome.status != 'ok':
+            print(outcome.error, file=sys.stderr)
+            config, seconds, _, _ = outcome.task
+            results.Record(config, status=outcome.status, compile_seconds=seconds, error=outcome.error)
+    return outcomes
+
+def main():
+    parser = argparse.ArgumentParser(description="Compiles and runs the autotuning sweep in parallel.")
+    parser.add_argument("-j", "--compile-processes", type=int, default=None, help="Concurrent compilations. Defaults to the number of cores.")
+    parser.add_argument("--run-processes", type=int, default=1, help="Concurrent runs.")
+    parser.add_argument("--cores-per-run", type=int, default=1, help="Cores each run is pinned to.")
+    parser.add_argument("--compile-timeout", type=float, default=None, help="Seconds after which a compilation is killed.")
+    parser.add_argument("--run-timeout", type=float, default=None, help="Seconds after which a run is killed.")
+    parser.add_argument("--warmup", type=int, default=1, help="Runs of each config before measuring.")
+    parser.add_argument("--min-repetitions", type=int, default=5, help="Measured runs of each config at least.")
+    parser.add_argument("--max-repetitions", type=int, default=50, help="Measured runs of each config at most.")
+    parser.add_argument("--target", type=float, default=0.01, help="Relative half-width of the median's confidence interval to reach.")
+    parser.add_argument("--flush", action="store_true", help="Flushes the host's caches before each run.")
+    parser.add_argument("--results", default=results_file, help="SQLite file of the results. Configs with a result are skipped.")
+    parser.add_argument("--retry-failed", action="store_true", help="Run the configs whose result is a failure again.")
+    args = parser.parse_args()
+
+    outcomes = RunSweep(CreateSweep(), args.compile_processes, args.run_processes, args.cores_per_run, args.compile_timeout, args.run_timeout,
+        Results(args.results), args.retry_failed, {
+            'warmup' : args.warmup,
+            'min_repetitions' : args.min_repetitions,
+            'max_repetitions' : args.max_repetitions,
+            'target' : args.target,
+            'flush' : args.flush,
+        })
+    failed = [o for o in outcomes if o.status != 'ok']
+    print(f'{len(outcomes) - len(failed)} of {len(outcomes)} compilations and runs succeeded')
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,9 @@
+import os
+import sys
+# The reference stencils are imported from the translator's package in the repository's root.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 import run
+from results import Results
 from sweep import *
 
 def main():
@@ -12,13 +17,14 @@ def main():
         # ((393,338,60),'kij','kij',8,32,1)
     ]
     program_set = CreateProgramSet(sweep)
+    results = Results(results_file)
 
     # run all
     for program_config in program_set:
-        sdfg = run.CreateProgam(program_config)
+        csdfg = run.CreateProgam(program_config).compile()
         for s in sweep:
             if ProgramRelevant(s) == program_config:
-                run.run(sdfg, s)
+                run.run(csdfg, s, results)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
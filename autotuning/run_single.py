@@ -1,3 +1,7 @@
+import os
+import sys
+# The reference stencils are imported from the translator's package in the repository's root.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 import run
 from sweep import *
 
@@ -0,0 +1,241 @@
+import math
+import random
+import statistics
+import time
+import numpy
+
+class Trial:
+    """ One measured config: its status is 'ok', 'stopped' (early, for being clearly slower than the best) or 'failed'. """
+    __slots__ = ('config', 'repetitions', 'runtimes', 'status', 'seconds', 'error')
+
+    def __init__(self, config, repetitions:int, runtimes:list, status:str, seconds:float, error:str = None):
+        self.config = config
+        self.repetitions = repetitions
+        self.runtimes = runtimes
+        self.status = status
+        self.seconds = seconds
+        self.error = error
+
+    def Runtime(self) -> float:
+        """ The median runtime, or infinity if it failed. """
+        if self.status == 'failed' or not self.runtimes:
+            return math.inf
+        return statistics.median(self.runtimes)
+
+    def __str__(self):
+        return f'{self.config} {self.status} {self.Runtime():.4g} in {self.seconds:.1f}s'
+
+
+class SearchStrategy:
+    """
+    Proposes the configs of a search space to measure.
+    Ask returns the next (config, repetitions) to measure, or None when the strategy is done.
+    Tell reports the median runtime of a config that was asked, math.inf if it failed.
+    """
+
+    def __init__(self, space:list, seed:int = None):
+        self.space = list(space)
+        self.random = random.Random(seed)
+
+    def Ask(self):
+        raise NotImplementedError()
+
+    def Tell(self, config, runtime:float):
+        pass
+
+
+class RandomSearch(SearchStrategy):
+    """ Measures the configs in a random order. """
+
+    def __init__(self, space:list, repetitions:int = 1, seed:int = None):
+        super().__init__(space, seed)
+        self.repetitions = repetitions
+        self.order = self.space[:]
+        self.random.shuffle(self.order)
+
+    def Ask(self):
+        if not self.order:
+            return None
+        return self.order.pop(), self.repetitions
+
+
+class SuccessiveHalving(SearchStrategy):
+    """
+    Measures 'configs' random configs with few repetitions, and keeps measuring the best 1/eta of them
+    with eta times more repetitions, until one is left or max_repetitions is reached.
+    """
+
+    def __init__(self, space:list, configs:int = 81, eta:int = 3, min_repetitions:int = 1, max_repetitions:int = 27, seed:int = None):
+        super().__init__(space, seed)
+        if eta < 2:
+            raise ValueError(f'eta must be at least 2, not {eta}.')
+        self.eta = eta
+        self.max_repetitions = max_repetitions
+        self.repetitions = min_repetitions
+        self.rung = self.random.sample(self.space, min(configs, len(self.space)))
+        self.asked = 0
+        self.runtimes = {}
+
+    def Ask(self):
+        if self.asked == len(self.rung):
+            if len(self.runtimes) < len(self.rung):
+                raise RuntimeError('Ask was called before every config of the rung was told.')
+            if len(self.rung) <= 1 or self.repetitions >= self.max_repetitions:
+                return None
+            survivors = len(self.rung) // self.eta or 1
+            self.rung = sorted(self.rung, key = lambda c: self.runtimes[c])[:survivors]
+            self.rung = [c for c in self.rung if self.runtimes[c] < math.inf]
+            self.repetitions = min(self.repetitions * self.eta, self.max_repetitions)
+            self.asked = 0
+            self.runtimes = {}
+            if not self.rung:
+                return None
+        self.asked += 1
+        return self.rung[self.asked - 1], self.repetitions
+
+    def Tell(self, config, runtime:float):
+        self.runtimes[config] = runtime
+
+
+def Encoder(space:list):
+    """
+    Returns a function that maps a config of the space to a feature vector in [0,1]:
+    strings are one-hot encoded, numbers and tuples of numbers are log-scaled and normalized.
+    """
+    columns = []
+    for index, value in enumerate(space[0]):
+        if isinstance(value, str):
+            columns.append((index, sorted({ c[index] for c in space })))
+        else:
+            columns.append((index, None))
+
+    def Numbers(config) -> list:
+        features = []
+        for index, categories in columns:
+            value = config[index]
+            if categories is not None:
+                features += [float(value == c) for c in categories]
+            else:
+                features += [math.log2(v) for v in (value if isinstance(value, tuple) else (value,))]
+        return features
+
+    numbers = numpy.array([Numbers(c) for c in space])
+    low = numbers.min(axis=0)
+    scale = numbers.max(axis=0) - low
+    scale[scale == 0] = 1
+
+    def Encode(configs:list) -> numpy.ndarray:
+        return (numpy.array([Numbers(c) for c in configs]) - low) / scale
+    return Encode
+
+
+class SurrogateSearch(SearchStrategy):
+    """
+    Bayesian optimization: measures 'initial' random configs, then always the config with the highest
+    expected improvement under a Gaussian process fitted to the log runtimes measured so far.
+    """
+
+    def __init__(self, space:list, initial:int = 10, repetitions:int = 1, length_scale:float = 1.0, noise:float = 1e-3, seed:int = None):
+        super().__init__(space, seed)
+        self.initial = initial
+        self.repetitions = repetitions
+        self.length_scale = length_scale
+        self.noise = noise
+        self.encode = Encoder(self.space)
+        self.features = self.encode(self.space)
+        self.untried = set(range(len(self.space)))
+        self.index = { c : i for i, c in enumerate(self.space) }
+        self.told = {} # dict[index, log runtime]
+
+    def Kernel(self, a:numpy.ndarray, b:numpy.ndarray) -> numpy.ndarray:
+        distance = ((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=2)
+        return numpy.exp(-0.5 * distance / self.length_scale ** 2)
+
+    def ExpectedImprovement(self, candidates:list) -> numpy.ndarray:
+        known = list(self.told)
+        y = numpy.array([self.told[i] for i in known])
+        # Failures are modelled as twice as slow as the slowest success, so their neighbourhood is avoided.
+        finite = y[numpy.isfinite(y)]
+        y[~numpy.isfinite(y)] = (finite.max() + math.log(2)) if finite.size else 0
+        mean, std = y.mean(), y.std() or 1
+        y = (y - mean) / std
+
+        x = self.features[known]
+        K = self.Kernel(x, x) + self.noise * numpy.eye(len(known))
+        L = numpy.linalg.cholesky(K)
+        alpha = numpy.linalg.solve(L.T, numpy.linalg.solve(L, y))
+        k = self.Kernel(self.features[candidates], x)
+        mu = k @ alpha
+        v = numpy.linalg.solve(L, k.T)
+        sigma = numpy.sqrt(numpy.maximum(1 - (v * v).sum(axis=0), 1e-12))
+
+        z = (y.min() - mu) / sigma
+        cdf = 0.5 * (1 + numpy.vectorize(math.erf)(z / math.sqrt(2)))
+        pdf = numpy.exp(-0.5 * z * z) / math.sqrt(2 * math.pi)
+        return (y.min() - mu) * cdf + sigma * pdf
+
+    def Ask(self):
+        if not self.untried:
+            return None
+        candidates = sorted(self.untried)
+        if len(self.told) < self.initial:
+            i = self.random.choice(candidates)
+        else:
+            i = candidates[int(numpy.argmax(self.ExpectedImprovement(candidates)))]
+        self.untried.discard(i)
+        return self.space[i], self.repetitions
+
+    def Tell(self, config, runtime:float):
+        self.told[self.index[config]] = math.log(runtime) if runtime < math.inf else math.inf
+
+
+STRATEGIES = {
+    'random' : RandomSearch,
+    'halving' : SuccessiveHalving,
+    'surrogate' : SurrogateSearch,
+}
+
+
+def Search(strategy:SearchStrategy, measure, budget:float = math.inf, early_stop:float = None, clock = time.perf_counter) -> list:
+    """
+    Measures the configs the strategy asks for, until it is done or 'budget' seconds were spent.
+    measure(config, repetitions): Runs the config 'repetitions' times and returns their runtimes.
+        The seconds it takes count against the budget, so compiling a program in it does too.
+    early_stop: A config's first repetition that takes longer than early_stop times the best runtime
+        stops it, without its other repetitions.
+    Returns the Trial of every measured config, in the order they were measured.
+    """
+    trials = []
+    best = math.inf
+    spent = 0.0
+    while spent < budget:
+        asked = strategy.Ask()
+        if asked is None:
+            break
+        config, repetitions = asked
+        start = clock()
+        status, runtimes, error = 'ok', [], None
+        try:
+            runtimes = list(measure(config, 1 if early_stop else repetitions))
+            if early_stop and repetitions > 1:
+                if statistics.median(runtimes) > early_stop * best:
+                    status = 'stopped'
+                else:
+                    runtimes += measure(config, repetitions - 1)
+        except Exception as e:
+            status, error = 'failed', f'{type(e).__name__}: {e}'
+        seconds = clock() - start
+        spent += seconds
+
+        trial = Trial(config, repetitions, runtimes, status, seconds, error)
+        trials.append(trial)
+        strategy.Tell(config, trial.Runtime())
+        if status == 'ok':
+            best = min(best, trial.Runtime())
+    return trials
+
+
+def Best(trials:list) -> Trial:
+    """ The fastest trial that ran all its repetitions, or None. """
+    complete = [t for t in trials if t.status == 'ok']
+    return min(complete, key = Trial.Runtime) if complete else None
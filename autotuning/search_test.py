@@ -0,0 +1,82 @@
+import unittest
+import math
+from itertools import product
+from search import *
+
+# A space like CreateSweep's, with a smooth runtime that is fastest at block sizes (32, 8, 1) and loop order 'kji'.
+SPACE = [((128,128,80), layout, order, i, j, k)
+    for layout, order, i, j, k in product(['ijk', 'kji'], ['ijk', 'kji'], [1,2,4,8,16,32,64], [1,2,4,8,16,32,64], [1,2,4])]
+
+def Runtime(config):
+    _, layout, order, i, j, k = config
+    return 1 + (math.log2(i) - 5) ** 2 + (math.log2(j) - 3) ** 2 + math.log2(k) + (order != 'kji') * 4 + (layout != 'kji')
+
+class Clock:
+    """ Advances by one second per measured repetition. """
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def Measurer(clock, measured):
+    def Measure(config, repetitions):
+        measured.append((config, repetitions))
+        clock.now += repetitions
+        return [Runtime(config)] * repetitions
+    return Measure
+
+class Search_test(unittest.TestCase):
+    def test_random_search_measures_everything(self):
+        measured = []
+        trials = Search(RandomSearch(SPACE[:20], seed=0), Measurer(Clock(), measured))
+        self.assertEqual(sorted(t.config for t in trials), sorted(SPACE[:20]))
+        self.assertEqual(Best(trials).config, min(SPACE[:20], key=Runtime))
+
+    def test_budget(self):
+        clock = Clock()
+        trials = Search(RandomSearch(SPACE, repetitions=2, seed=0), Measurer(clock, []), budget=10, clock=clock)
+        self.assertEqual(len(trials), 5)
+
+    def test_early_stop(self):
+        measured = []
+        space = [((8,8,8), 'kji', 'kji', 32, 8, 1), ((8,8,8), 'ijk', 'ijk', 1, 1, 4)]
+        trials = Search(RandomSearch(space, repetitions=5, seed=0), Measurer(Clock(), measured), early_stop=2)
+        statuses = { t.config : t.status for t in trials }
+        if trials[0].config == space[0]:
+            self.assertEqual(statuses[space[1]], 'stopped')
+            self.assertEqual(len(trials[1].runtimes), 1)
+        self.assertEqual(statuses[space[0]], 'ok')
+
+    def test_failures(self):
+        def Fail(config, repetitions):
+            raise RuntimeError('compilation failed')
+        [trial] = Search(RandomSearch(SPACE[:1]), Fail)
+        self.assertEqual(trial.status, 'failed')
+        self.assertEqual(trial.Runtime(), math.inf)
+        self.assertIsNone(Best([trial]))
+
+    def test_successive_halving(self):
+        measured = []
+        strategy = SuccessiveHalving(SPACE, configs=27, eta=3, seed=0)
+        trials = Search(strategy, Measurer(Clock(), measured))
+        self.assertEqual([r for _, r in measured], [1] * 27 + [3] * 9 + [9] * 3 + [27])
+        best_of_first_rung = min((c for c, _ in measured[:27]), key=Runtime)
+        self.assertEqual(measured[-1][0], best_of_first_rung)
+
+    def test_surrogate_finds_a_near_optimal_config(self):
+        clock = Clock()
+        trials = Search(SurrogateSearch(SPACE, initial=10, seed=1), Measurer(clock, []), budget=40, clock=clock)
+        self.assertEqual(len(trials), 40)
+        optimum = min(Runtime(c) for c in SPACE)
+        self.assertLessEqual(Best(trials).Runtime(), optimum + 1)
+
+    def test_encoder(self):
+        features = Encoder(SPACE)(SPACE)
+        self.assertEqual(features.shape, (len(SPACE), 3 + 2 + 2 + 3))
+        self.assertEqual(features.min(), 0)
+        self.assertEqual(features.max(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
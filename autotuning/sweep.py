@@ -9,6 +9,7 @@ from dace.transformation.interstate import GPUTransformSDFG
 
 # common_folder = '/scratch/snx3000/hdominic/dace/autotuning/'
 common_folder = '/home/dominic/work/autotuning/'
+results_file = common_folder + 'results.sqlite'
 
 def CreateSweep():
     sweep = []
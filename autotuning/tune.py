@@ -0,0 +1,90 @@
+import os
+import sys
+# The reference stencils are imported from the translator's package in the repository's root.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import argparse
+import time
+import run
+from results import Results
+from search import *
+from sweep import *
+
+def Measurer(results:Results, **benchmark):
+    """
+    Returns a measure function for Search, which compiles each program once and
+    records the runtimes of every config into the results.
+    Configs that already have a successful result are not run again.
+    benchmark: Options of benchmark.Benchmark, except the repetitions, which the search decides.
+    """
+    programs = {} # dict[program_config, (CompiledSDFG, compile seconds)]
+    measured = {} # dict[config, runtimes]
+    stored = {} # dict[config, runtimes of earlier sweeps not handed out yet]
+    warm = set() # configs that ran in this process
+
+    def Measure(config, repetitions:int) -> list:
+        if config not in stored:
+            result = results.Get(config)
+            ok = result is not None and result['status'] == 'ok'
+            if ok and result['valid'] is False:
+                raise ValueError(f'{config} does not match the reference.')
+            # Runtimes of results without a timer may be in milliseconds, so they are measured again.
+            stored[config] = result['runtimes'] if ok and result['timer'] is not None else []
+        if len(stored[config]) >= repetitions:
+            runtimes, stored[config] = stored[config][:repetitions], stored[config][repetitions:]
+            measured[config] = measured.get(config, []) + runtimes
+            return runtimes
+
+        program_config = ProgramRelevant(config)
+        try:
+            if program_config not in programs:
+                start = time.perf_counter()
+                csdfg = run.CreateProgam(program_config).compile()
+                programs[program_config] = (csdfg, time.perf_counter() - start)
+            csdfg, compile_seconds = programs[program_config]
+
+            # A config that was measured before in this search is warm already, e.g. after its early stopping check.
+            options = dict(benchmark, warmup=0) if config in warm else benchmark
+            runtimes, valid, timer = run.run(csdfg, config, min_repetitions=repetitions, max_repetitions=repetitions, **options)
+            warm.add(config)
+        except Exception as e:
+            results.Record(config, status='failed', error=f'{type(e).__name__}: {e}')
+            raise
+        measured[config] = measured.get(config, []) + stored[config] + runtimes
+        stored[config] = []
+        results.Record(config, compile_seconds=compile_seconds, runtimes=measured[config], valid=valid, timer=timer)
+        if valid is False:
+            raise ValueError(f'{config} does not match the reference.')
+        return runtimes
+    return Measure
+
+def main():
+    parser = argparse.ArgumentParser(description="Searches the autotuning sweep for the fastest config of a domain.")
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), default='surrogate', help="How configs are chosen.")
+    parser.add_argument("--domain", type=int, nargs=3, default=(128,128,80), metavar=('I', 'J', 'K'), help="The domain size to tune for.")
+    parser.add_argument("--budget", type=float, default=3600, help="Compile plus run seconds after which the search stops.")
+    parser.add_argument("--early-stop", type=float, default=2.0, help="Stops a config whose first run is this many times slower than the best.")
+    parser.add_argument("--warmup", type=int, default=1, help="Runs of each config before measuring.")
+    parser.add_argument("--flush", action="store_true", help="Flushes the host's caches before each run.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the strategy's random choices.")
+    parser.add_argument("--results", default=results_file, help="SQLite file of the results.")
+    args = parser.parse_args()
+
+    space = [s for s in CreateSweep() if s[0] == tuple(args.domain)]
+    if not space:
+        parser.error(f'The sweep has no configs of domain {tuple(args.domain)}.')
+    strategy = STRATEGIES[args.strategy](space, seed=args.seed)
+    trials = Search(strategy, Measurer(Results(args.results), warmup=args.warmup, flush=args.flush), args.budget, args.early_stop)
+    for trial in trials:
+        print(trial)
+
+    best = Best(trials)
+    programs = len(CreateProgramSet([t.config for t in trials]))
+    print(f'{len(trials)} of {len(space)} configs measured, {programs} of {len(CreateProgramSet(space))} programs compiled')
+    if best is None:
+        print('No config succeeded.')
+        return 1
+    print(f'best: {best}')
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
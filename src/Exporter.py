@@ -1,52 +1,80 @@
+import ast
+import astunparse
 import dace
 import dace.data
+import hashlib
+import re
+from dace.transformation.interstate import InlineSDFG
+from dace.transformation.dataflow import MapCollapse, StripMining
 from stencilflow.stencil.stencil import Stencil as StencilLib
 import sympy
 from itertools import chain
 from Intermediates import *
 from IdResolver import IdResolver
-
-I = dace.symbol("I", dtype=dace.int32)
-J = dace.symbol("J", dtype=dace.int32)
-K = dace.symbol("K", dtype=dace.int32)
-halo = dace.symbol("halo", dtype=dace.int32)
-float_type = dace.float64
-
-IJK_stride_I = dace.symbol("IJK_stride_I", dtype=dace.int32)
-IJK_stride_J = dace.symbol("IJK_stride_J", dtype=dace.int32)
-IJK_stride_K = dace.symbol("IJK_stride_K", dtype=dace.int32)
-IJK_total_size = dace.symbol("IJK_total_size", dtype=dace.int32)
-
-IJ_stride_I = dace.symbol("IJ_stride_I", dtype=dace.int32)
-IJ_stride_J = dace.symbol("IJ_stride_J", dtype=dace.int32)
-IJ_total_size = dace.symbol("IJ_total_size", dtype=dace.int32)
-
-I_total_size = dace.symbol("I_total_size", dtype=dace.int32)
-J_total_size = dace.symbol("J_total_size", dtype=dace.int32)
-K_total_size = dace.symbol("K_total_size", dtype=dace.int32)
+from Profiler import NullProfiler
+from HaloExchange import SIDES, HaloWidth, HaloRegion
+from Log import GetLogger, Event
+
+log = GetLogger('Exporter')
+
+# The symbols every SDFG of a translation defines, and passes on to its nested SDFGs.
+SYMBOLS = { name : dace.symbol(name, dtype=dace.int32) for name in [
+    'I', 'J', 'K', 'halo',
+    'IJK_stride_I', 'IJK_stride_J', 'IJK_stride_K', 'IJK_total_size',
+    'IJ_stride_I', 'IJ_stride_J', 'IJ_total_size',
+    'I_total_size', 'J_total_size', 'K_total_size'
+]}
+
+I = SYMBOLS['I']
+J = SYMBOLS['J']
+K = SYMBOLS['K']
+halo = SYMBOLS['halo']
+
+IJK_stride_I = SYMBOLS['IJK_stride_I']
+IJK_stride_J = SYMBOLS['IJK_stride_J']
+IJK_stride_K = SYMBOLS['IJK_stride_K']
+IJK_total_size = SYMBOLS['IJK_total_size']
+
+IJ_stride_I = SYMBOLS['IJ_stride_I']
+IJ_stride_J = SYMBOLS['IJ_stride_J']
+IJ_total_size = SYMBOLS['IJ_total_size']
+
+I_total_size = SYMBOLS['I_total_size']
+J_total_size = SYMBOLS['J_total_size']
+K_total_size = SYMBOLS['K_total_size']
 
 def dim_filter(dim:Any3D, i, j, k) -> tuple:
     return tuple(elem for dim, elem in zip(dim, [i, j, k]) if dim)
 
+def IsInsideMap(sdfg) -> bool:
+    """ Returns if the SDFG is nested in a map, directly or through other nested SDFGs. """
+    while sdfg.parent is not None:
+        if sdfg.parent.entry_node(sdfg.parent_nsdfg_node) is not None:
+            return True
+        sdfg = sdfg.parent.parent
+    return False
+
 class Exporter:
-    def __init__(self, id_resolver:IdResolver, name:str):
+    def __init__(self, id_resolver:IdResolver, name:str, profiler=None, precision:Precision=None, layout:str=None,
+        schedule:Schedule=None, halo_exchange=None):
+        """
+        precision: The floating point types of the fields. Defaults to float64.
+        layout: The memory layout of the fields in C-array notation, e.g. 'kji'. See ApplyLayout.
+        schedule: The iteration spaces, tiles and map schedule. See ApplySchedule.
+        halo_exchange: The HaloExchange that updates halos before the boundary conditions. None updates no halos.
+        """
         self.id_resolver = id_resolver
+        self.profiler = profiler or NullProfiler()
+        self.precision = precision or Precision()
+        self.layout = layout
+        self.schedule = schedule or Schedule()
+        self.halo_exchange = halo_exchange
         self.sdfg = dace.SDFG(name)
-        self.sdfg.add_symbol('I', stype=dace.int32)
-        self.sdfg.add_symbol('J', stype=dace.int32)
-        self.sdfg.add_symbol('K', stype=dace.int32)
-        self.sdfg.add_symbol('halo', stype=dace.int32)
-        self.sdfg.add_symbol("IJK_stride_I", stype=dace.int32)
-        self.sdfg.add_symbol("IJK_stride_J", stype=dace.int32)
-        self.sdfg.add_symbol("IJK_stride_K", stype=dace.int32)
-        self.sdfg.add_symbol("IJK_total_size", stype=dace.int32)
-        self.sdfg.add_symbol("IJ_stride_I", stype=dace.int32)
-        self.sdfg.add_symbol("IJ_stride_J", stype=dace.int32)
-        self.sdfg.add_symbol("IJ_total_size", stype=dace.int32)
-        self.sdfg.add_symbol("I_total_size", stype=dace.int32)
-        self.sdfg.add_symbol("J_total_size", stype=dace.int32)
-        self.sdfg.add_symbol("K_total_size", stype=dace.int32)
+        for name in SYMBOLS:
+            self.sdfg.add_symbol(name, stype=dace.int32)
         self.last_state_ = None
+        self.filled_caches = {} # dict[uid of a cache whose window has been loaded before, the k-offsets loaded]
+        self.shared_caches_ = set() # uids of caches of multi-stages of the current stencil that are exported apart.
 
     def Name(self, id:int) -> str:
         return self.id_resolver.GetName(id)
@@ -55,6 +83,9 @@ class Exporter:
         """ Returns if the dimensions (i,j,k) are present in this field. """
         return self.id_resolver.GetDimensions(id)
 
+    def FloatType(self, id:int):
+        return dace.dtypes.DTYPE_TO_TYPECLASS[self.precision.Of(self.Name(id))]
+
     def Shape(self, id:int) -> list:
         return list(dim_filter(self.Dimensions(id), I, J, K+1) or [1])
 
@@ -78,46 +109,175 @@ class Exporter:
             Bool3D(False, False, False) : 1
         }[self.Dimensions(id)]
 
-    def TryAddScalar(self, sdfg, ids):
+    def SymbolMapping(self) -> dict:
+        """ Maps the symbols of a nested SDFG to the ones of the top-level SDFG. """
+        return dict(SYMBOLS)
+
+    def AddScalars(self, sdfg, ids):
+        """ Adds the scalars to the SDFG, unless it already has them. """
         for id in ids:
             name = self.Name(id)
+            if name in sdfg.arrays:
+                continue
+            sdfg.add_scalar(name, dtype=self.FloatType(id))
+            log.debug('Added scalar: %s', name)
+            Event('AddScalar', sdfg=sdfg.name, name=name)
 
-            try:
-                sdfg.add_scalar(name, dtype=float_type)
-                print(f'Added scalar: {name}')
-            except:
-                pass
-
-    def TryAddArray(self, sdfg, ids, transient:bool=False):
+    def AddArrays(self, sdfg, ids, transient:bool=False):
+        """ Adds the arrays of the fields to the SDFG, unless it already has them. """
         for id in ids:
             name = self.Name(id)
+            if name in sdfg.arrays:
+                continue
             shape = self.Shape(id)
             strides = self.Strides(id)
             total_size = self.TotalSize(id)
 
+            sdfg.add_array(
+                name, 
+                shape, 
+                dtype=self.FloatType(id),
+                transient=transient,
+                strides=strides, 
+                total_size=total_size
+            )
+            log.debug('Added %s: %s of size %s with strides %s and total size %s', "transient" if transient else "array", name, shape, strides, total_size)
+            Event('AddArray', sdfg=sdfg.name, name=name, transient=transient, shape=shape)
+
+    def Specialize(self, dimensions: Dimensions):
+        """
+        Turns the size, stride and halo symbols into the constants of 'dimensions', in all nested SDFGs too,
+        so the generated code addresses with constant strides and bounds.
+        The SDFG's name gets a suffix, so builds of different specializations do not overwrite each other.
+        """
+        constants = dimensions.ProgramArguments()
+        for sdfg in self.sdfg.all_sdfgs_recursive():
+            sdfg.specialize({ name : value for name, value in constants.items() if name in SYMBOLS })
+        self.sdfg.name = '{}_{}'.format(self.sdfg.name, hashlib.sha1(dimensions.Signature().encode()).hexdigest()[:8])
+        Event('Specialize', sdfg=self.sdfg.name, signature=dimensions.Signature())
+
+    def FieldDimensions(self, data:str) -> str:
+        """ Returns the dimensions of a field's array, or of an '_in' or '_out' array of it, e.g. 'ij'. None if it is no field. """
+        for name in (data, re.sub(r'_(in|out)$', '', data)):
             try:
-                sdfg.add_array(
-                    name, 
-                    shape, 
-                    dtype=float_type,
-                    transient=transient,
-                    strides=strides, 
-                    total_size=total_size
-                )
-                print(f'Added {"transient" if transient else "array"}: {name} of size {shape} with strides {strides} and total size {total_size}')
-            except:
-                pass
+                id = self.id_resolver.GetFieldId(name)
+            except KeyError:
+                continue
+            return ''.join(dim_filter(self.Dimensions(id), 'i', 'j', 'k'))
+        return None
+
+    def MapDimensions(self, state, map_entry) -> str:
+        """
+        Returns the dimension each parameter of a map iterates over, e.g. 'kij'. Unknown ones are '?'.
+        A parameter is identified by its name if it is i, j or k (e.g. '__i' or 'tile_i'), else by the field dimensions
+        it indexes in the map's memlets, else by the domain symbols of its range, which specialization removes.
+        """
+        indexed = {} # dict[symbol, set of dimensions it indexes]
+        for edge in state.scope_subgraph(map_entry).edges():
+            memlet = edge.data
+            if memlet.data is None or memlet.subset is None:
+                continue
+            dims = self.FieldDimensions(memlet.data)
+            if dims is None or len(dims) != len(memlet.subset.ranges):
+                continue
+            for dim, (begin, end, _) in zip(dims, memlet.subset.ranges):
+                for symbol in set(re.findall(r'\w+', f'{begin} {end}')):
+                    indexed.setdefault(symbol, set()).add(dim)
+
+        ret = ''
+        for param, (begin, end, _) in zip(map_entry.map.params, map_entry.map.range.ranges):
+            name = re.sub(r'^tile_', '', param).strip('_')
+            symbols = set(re.findall(r'\w+', f'{begin} {end}'))
+            if name in ('i', 'j', 'k'):
+                ret += name
+            elif len(indexed.get(param, ())) == 1:
+                ret += next(iter(indexed[param]))
+            elif 'K' in symbols:
+                ret += 'k'
+            elif 'I' in symbols:
+                ret += 'i'
+            elif 'J' in symbols:
+                ret += 'j'
+            else:
+                ret += '?'
+        return ret
+
+    def ApplyLayout(self):
+        """
+        Orders the maps' dimensions like the memory layout, so the contiguous dimension is iterated innermost and vectorizable.
+        This expands the stencils and collapses the k-maps of parallel multi-stages with the maps inside, which lets k move inwards too.
+        """
+        sdfg = self.sdfg
+        sdfg.expand_library_nodes()
+        sdfg.apply_strict_transformations(validate=False)
+        sdfg.apply_transformations_repeated([InlineSDFG], validate=False)
+        sdfg.apply_transformations_repeated([MapCollapse], validate=False)
+
+        for state in chain.from_iterable(x.nodes() for x in sdfg.all_sdfgs_recursive()):
+            for node in state.nodes():
+                if not isinstance(node, dace.nodes.MapEntry):
+                    continue
+                dims = self.MapDimensions(state, node)
+                if len(dims) < 2 or '?' in dims or len(set(dims)) != len(dims):
+                    continue
+                order = sorted(range(len(dims)), key = lambda x: self.layout.index(dims[x]))
+                node.map.params = [node.map.params[x] for x in order]
+                node.map.range = dace.subsets.Range([node.map.range.ranges[x] for x in order])
+                log.debug('Map %s: %s -> %s', node.map.label, dims, ''.join(dims[x] for x in order))
+        Event('ApplyLayout', sdfg=sdfg.name, layout=self.layout)
+
+    def ApplySchedule(self):
+        """
+        Tiles the maps' dimensions that the schedule has tile sizes for, and gives the outermost maps its map schedule.
+        Maps inside other maps, e.g. the IJ-maps inside a k-map, and the tiles iterate sequentially, so parallel regions don't nest.
+        This expands the stencils.
+        """
+        self.sdfg.expand_library_nodes()
+        map_schedule = dace.ScheduleType[self.schedule.map_schedule]
+
+        for sdfg in self.sdfg.all_sdfgs_recursive():
+            nested = IsInsideMap(sdfg)
+            for state in sdfg.nodes():
+                scope = state.scope_dict()
+                for node in [n for n in state.nodes() if isinstance(n, dace.nodes.MapEntry) and scope[n] is None]:
+                    dims = self.MapDimensions(state, node)
+                    outer = self.Tile(sdfg, state, node, dims)
+                    outer.map.schedule = dace.ScheduleType.Sequential if nested else map_schedule
+                    log.debug('Map %s: %s tiled by %s', outer.map.label, dims, self.schedule.tiles)
+        Event('ApplySchedule', sdfg=self.sdfg.name, schedule=str(self.schedule))
+
+    def Tile(self, sdfg, state, map_entry, dims:str):
+        """
+        Strip-mines each dimension of the map that the schedule has a tile size for, and collapses the tile maps into one.
+        Returns the entry of the tile map, or the map's if nothing was tiled. The map inside iterates sequentially.
+        """
+        tiled = [x for x, dim in enumerate(dims) if dim in self.schedule.tiles and dims.count(dim) == 1]
+        for x in tiled:
+            StripMining.apply_to(sdfg,
+                options={ 'dim_idx' : x, 'tile_size' : str(self.schedule.tiles[dims[x]]), 'divides_evenly' : False },
+                map_entry=map_entry)
+        if not tiled:
+            return map_entry
+
+        map_entry.map.schedule = dace.ScheduleType.Sequential
+        outer = state.entry_node(map_entry)
+        for _ in tiled[1:]:
+            outer_outer = state.entry_node(outer)
+            MapCollapse.apply_to(sdfg, outer_map_entry=outer_outer, inner_map_entry=outer)
+            outer = state.entry_node(map_entry)
+        return outer
 
     def Export_ApiFields(self, ids):
-        self.TryAddArray(self.sdfg, ids)
+        self.AddArrays(self.sdfg, ids)
 
     def Export_TemporaryFields(self, ids):
-        self.TryAddArray(self.sdfg, ids, transient=True)
+        self.AddArrays(self.sdfg, ids, transient=True)
 
     def Export_Globals(self, id_value: dict):
         for id, value in id_value.items():
             name = self.Name(id)
-            self.sdfg.add_constant(name, value, dtype=dace.data.Scalar(float_type))
+            float_type = self.FloatType(id)
+            self.sdfg.add_constant(name, float_type.type(value), dtype=dace.data.Scalar(float_type))
 
     def Export_Accesses(self, id:int, mem_acc:ClosedInterval3D):
         """
@@ -129,7 +289,7 @@ class Exporter:
         dims = self.Dimensions(id)
 
         #This is the bounding box of all memory accesses
-        accs = [ dim_filter(dims, i, j, k) for i,j,k in mem_acc.range() ]
+        accs = [ tuple(x) for x in mem_acc.range_array(dims).tolist() ]
         dimensions_present = dims.to_tuple()
         return dimensions_present, accs
 
@@ -139,28 +299,147 @@ class Exporter:
             for id, acc in transactions.items()
             }
 
+    def LoweredCaches(self, multi_stage: MultiStage, column:bool = False) -> dict:
+        """
+        Returns the caches of the multi-stage that are turned into buffers, by id.
+        column: If the multi-stage is lowered into columns, whose buffers only live as long as the multi-stage.
+        """
+        ret = {}
+        for id, cache in multi_stage.caches.items():
+            if not self.Dimensions(id).k:
+                continue
+            temporary = self.id_resolver.IsATemporary(id)
+            if cache.type == CacheType.IJ.value:
+                # Only levels that are produced and consumed at the same k can live in an IJ-plane,
+                # which has to be private to an iteration of the k-map.
+                lower = (cache.policy == CachePolicy.Local.value) and temporary and (cache.window == ClosedInterval(0, 0)) \
+                    and (multi_stage.execution_order != ExecutionOrder.Parallel.value or self.schedule.iteration_space == 'kmap')
+            elif cache.type == CacheType.K.value:
+                # A column holds the window in a ring of scalars. A stencil of an IJ-plane accesses a contiguous range of levels,
+                # which a ring does not have, so planes only hold temporaries that are accessed at level k alone.
+                lower = (multi_stage.execution_order != ExecutionOrder.Parallel.value) \
+                    and (cache.policy != CachePolicy.Unknown.value) \
+                    and (temporary or cache.policy != CachePolicy.Local.value) \
+                    and (column or (cache.policy == CachePolicy.Local.value and cache.window == ClosedInterval(0, 0))) \
+                    and not (column and cache.uid in self.shared_caches_)
+            else:
+                lower = False
+            if lower:
+                ret[id] = cache
+        return ret
+
+    def CacheName(self, cache: Cache) -> str:
+        return f'{self.Name(cache.id)}_{cache}'
+
+    def AddCacheBuffer(self, sdfg, cache: Cache, name:str = None, column:bool = False):
+        """ Adds a transient holding one IJ-plane, or one value of a column, per k-offset of the cache's window. See CacheSlot. """
+        name = name or self.CacheName(cache)
+        if name in sdfg.arrays:
+            return
+        shape = list(dim_filter(self.Dimensions(cache.id), 1 if column else I, 1 if column else J, cache.window.upper - cache.window.lower + 1))
+        sdfg.add_array(name, shape, dtype=self.FloatType(cache.id), transient=True)
+        log.debug('Added cache buffer: %s of size %s', name, shape)
+        Event('AddCacheBuffer', sdfg=sdfg.name, name=name, field=self.Name(cache.id), shape=shape)
+
+    @staticmethod
+    def CacheSlot(cache: Cache, level:str) -> str:
+        """
+        Returns the index of the element of a cache's buffer that holds a level of the field.
+        The buffer is a ring, so the window moves along with k without copying the levels it keeps.
+        """
+        size = cache.window.upper - cache.window.lower + 1
+        if size == 1:
+            return '0'
+        return f'(({level})-({cache.window.lower}))%{size}'
+
+    @staticmethod
+    def MemletWindow(multi_stage: MultiStage, id:int, reads:bool = True) -> ClosedInterval:
+        """
+        Returns the k-offsets the DoMethods of a multi-stage access a field at, including 0.
+        They are taken from the memlets, because the statements access the levels relative to the memlets by now.
+        reads: False for the k-offsets the field is written at only.
+        """
+        accesses = [memlets[id].k
+            for stage in multi_stage.stages
+            for do_method in stage.do_methods
+            for memlets in ((do_method.read_memlets, do_method.write_memlets) if reads else (do_method.write_memlets,))
+            if id in memlets]
+        return Hull([ClosedInterval(0, 0)] + accesses)
+
+    def Plane(self, id:int, k:str, column:bool = False) -> str:
+        """ Returns the subset of the IJ-plane of a field at level k, or of its element in a column. """
+        if column:
+            return ','.join(dim_filter(self.Dimensions(id), '0', '0', k)) or '0'
+        return ','.join(dim_filter(self.Dimensions(id), '0:I', '0:J', k)) or '0'
+
+    def Export_Copies(self, label:str, copies:list, column_sdfg = None):
+        """
+        Returns a state copying (src, src_subset, dst, dst_subset) for each element of 'copies'.
+        column_sdfg: The SDFG of a column to add the state to, instead of the top-level one.
+        """
+        sdfg = self.sdfg if column_sdfg is None else column_sdfg
+        state = sdfg.add_state(f'{label}_{CreateUID()}')
+        for src, src_subset, dst, dst_subset in copies:
+            state.add_nedge(
+                state.add_read(src),
+                state.add_write(dst),
+                dace.Memlet(f'{src}[{src_subset}]', other_subset=dst_subset)
+            )
+        return state
+
+    def Export_CacheFill(self, cache: Cache, offsets:list, k:str, column_sdfg = None):
+        """ Returns a state loading the levels k+offset of the field into the cache. """
+        name, buffer, column = self.Name(cache.id), self.CacheName(cache), column_sdfg is not None
+        return self.Export_Copies(f'fill_{cache}', [
+            (name, self.Plane(cache.id, f'({k})+({offset})', column), buffer, self.Plane(cache.id, self.CacheSlot(cache, f'({k})+({offset})'), column))
+            for offset in offsets
+        ], column_sdfg)
+
+    def Export_CacheFlush(self, cache: Cache, levels:list, column_sdfg = None):
+        """ Returns a state storing the cached levels back to the field. """
+        name, buffer, column = self.Name(cache.id), self.CacheName(cache), column_sdfg is not None
+        return self.Export_Copies(f'flush_{cache}', [
+            (buffer, self.Plane(cache.id, self.CacheSlot(cache, level), column), name, self.Plane(cache.id, level, column))
+            for level in levels
+        ], column_sdfg)
+
+    def RemoveUnusedTransients(self):
+        """ Removes transients that no state accesses, e.g. temporaries that only live in cache buffers. """
+        used = { node.data for state in self.sdfg.nodes() for node in state.nodes() if isinstance(node, dace.nodes.AccessNode) }
+        for name, array in list(self.sdfg.arrays.items()):
+            if array.transient and name not in used:
+                self.sdfg.remove_data(name, validate=False)
+                log.debug('Removed unused transient: %s', name)
+
+    def BoundaryConditions(self, stage: Stage, ids) -> dict:
+        """ Returns the boundary conditions of the output connectors, which shrink each field to its extents. """
+        ret = {}
+        for id in ids:
+            halo = ClosedInterval3D(Symbol('halo'),Symbol('halo'),Symbol('halo'),Symbol('halo'),0,0)
+            halo -= stage.extents
+            ret[f'{self.Name(id)}_out'] = { "btype" : "shrink", "halo" : halo.to_6_tuple() }
+        return ret
+
     def Export_parallel(self, multi_stage: MultiStage):
         ms_state = self.sdfg.add_state(f'ms_state_{CreateUID()}')
         ms_sdfg = dace.SDFG(f'ms_sdfg_{CreateUID()}')
         last_state = None
+
+        # IJ-caches become per-level transients of the nested SDFG, which the k-map never moves out of.
+        cached = set(self.LoweredCaches(multi_stage))
+        for id in cached:
+            self.AddCacheBuffer(ms_sdfg, multi_stage.caches[id], name=self.Name(id))
+
+        all = multi_stage.ReadIds() | multi_stage.WriteIds()
+        globals = { id for id in all if self.id_resolver.IsGlobal(id) }
+        self.AddArrays(ms_sdfg, all - globals - cached)
+        self.AddArrays(self.sdfg, all - globals - cached, transient=True)
+        # self.AddScalars(ms_sdfg, multi_stage.ReadIds() & globals)
         
         for stage in multi_stage.stages:
             for do_method in stage.do_methods:
-                reads = do_method.ReadIds()
                 writes = do_method.WriteIds()
-                all = reads | writes
-                globals = { id for id in all if self.id_resolver.IsGlobal(id) }
-
-                self.TryAddArray(ms_sdfg, all - globals)
-                # self.TryAddScalar(ms_sdfg, reads & globals)
-
-                self.TryAddArray(self.sdfg, all - globals, transient=True)
-                # self.TryAddScalar(self.sdfg, reads & globals)
-                
-                halo = ClosedInterval3D(Symbol('halo'),Symbol('halo'),Symbol('halo'),Symbol('halo'),0,0)
-                halo -= stage.extents
-                bc_dict = { "btype" : "shrink", "halo" : halo.to_6_tuple() }
-                boundary_conditions = { f'{self.Name(id)}_out' : bc_dict for id in writes }
+                boundary_conditions = self.BoundaryConditions(stage, writes)
 
                 state = ms_sdfg.add_state(str(do_method))
 
@@ -208,8 +487,8 @@ class Exporter:
                     ms_sdfg.add_edge(last_state, state, dace.InterstateEdge())
                 last_state = state
 
-        read_ids = multi_stage.ReadIds()
-        write_ids = multi_stage.WriteIds()
+        read_ids = multi_stage.ReadIds() - cached
+        write_ids = multi_stage.WriteIds() - cached
 
         read_names = set(self.Name(id) for id in read_ids)
         write_names = set(self.Name(id) for id in write_ids)
@@ -219,17 +498,7 @@ class Exporter:
             self.sdfg,
             read_names,
             write_names,
-            {'halo' : dace.symbol('halo'), 'I' : dace.symbol('I'), 'J' : dace.symbol('J'), 'K' : dace.symbol('K'),
-            'IJK_stride_I' : dace.symbol('IJK_stride_I'),
-            'IJK_stride_J' : dace.symbol('IJK_stride_J'),
-            'IJK_stride_K' : dace.symbol('IJK_stride_K'),
-            'IJK_total_size' : dace.symbol('IJK_total_size'),
-            'IJ_stride_I' : dace.symbol('IJ_stride_I'),
-            'IJ_stride_J' : dace.symbol('IJ_stride_J'),
-            'IJ_total_size' : dace.symbol('IJ_total_size'),
-            'I_total_size' : dace.symbol('I_total_size'),
-            'J_total_size' : dace.symbol('J_total_size'),
-            'K_total_size' : dace.symbol('K_total_size')}
+            self.SymbolMapping()
         )
 
         map_entry, map_exit = ms_state.add_map("kmap", { 'k' : str(do_method.k_interval) })
@@ -278,44 +547,35 @@ class Exporter:
 
         return ms_state
 
-    def Export_loop(self, multi_stage: MultiStage, execution_order: ExecutionOrder):
-        last_state = None
-        first_state = None
-        # This is the state previous to this ms
+    def Export_parallel_3d(self, multi_stage: MultiStage):
+        """ Exports each DoMethod as one stencil over its whole I x J x K iteration space. """
+        all = multi_stage.ReadIds() | multi_stage.WriteIds()
+        globals = { id for id in all if self.id_resolver.IsGlobal(id) }
+        self.AddArrays(self.sdfg, all - globals, transient=True)
 
+        last_state = self.last_state_
         for stage in multi_stage.stages:
             for do_method in stage.do_methods:
-                reads = do_method.ReadIds()
                 writes = do_method.WriteIds()
-                all = reads | writes
-                globals = { id for id in all if self.id_resolver.IsGlobal(id) }
-
-                self.TryAddArray(self.sdfg, all - globals, transient=True)
-                # self.TryAddScalar(self.sdfg, reads & globals)
-
-                halo = ClosedInterval3D(Symbol('halo'),Symbol('halo'),Symbol('halo'),Symbol('halo'),0,0)
-                halo -= stage.extents
-                bc_dict = { "btype" : "shrink", "halo" : halo.to_6_tuple() }
-                boundary_conditions = { f'{self.Name(id)}_out' : bc_dict for id in writes }
+                lower, upper = do_method.k_interval.lower, do_method.k_interval.upper
 
                 state = self.sdfg.add_state(str(do_method))
 
                 stenc = StencilLib(
                     label = str(do_method),
-                    shape = [I, J, 1],
+                    shape = [I, J, dace.symbolic.pystr_to_symbolic(f'({upper}) - ({lower})')],
                     accesses = self.Create_Variable_Access_map(do_method.Reads(), '_in'), # input fields
                     output_fields = self.Create_Variable_Access_map(do_method.Writes(), '_out'), # output fields
-                    boundary_conditions = boundary_conditions,
+                    boundary_conditions = self.BoundaryConditions(stage, writes),
                     code = do_method.Code()
                 )
                 stenc.implementation = 'CPU'
                 state.add_node(stenc)
-                
+
                 # Add memlet path from state.read to stencil.
                 for id, acc in do_method.read_memlets.items():
                     name = self.Name(id)
-                    dims = self.Dimensions(id)
-                    subset = ','.join(dim_filter(dims, '0:I', '0:J', f'k+{acc.k.lower}:k+{acc.k.upper+1}')) or '0'
+                    subset = ','.join(dim_filter(self.Dimensions(id), '0:I', '0:J', f'({lower})+({acc.k.lower}):({upper})+({acc.k.upper})')) or '0'
 
                     state.add_memlet_path(
                         state.add_read(name),
@@ -328,8 +588,7 @@ class Exporter:
                 # Add memlet path from stencil to state.write.
                 for id, acc in do_method.write_memlets.items():
                     name = self.Name(id)
-                    dims = self.Dimensions(id)
-                    subset = ','.join(dim_filter(dims, '0:I', '0:J', f'k+{acc.k.lower}:k+{acc.k.upper+1}')) or '0'
+                    subset = ','.join(dim_filter(self.Dimensions(id), '0:I', '0:J', f'({lower})+({acc.k.lower}):({upper})+({acc.k.upper})')) or '0'
 
                     state.add_memlet_path(
                         stenc,
@@ -339,47 +598,411 @@ class Exporter:
                         propagate=True
                     )
 
-                if first_state is None:
-                    first_state = state
-
                 if last_state is not None:
                     self.sdfg.add_edge(last_state, state, dace.InterstateEdge())
                 last_state = state
+        return last_state
+
+    def Export_loop(self, multi_stage: MultiStage, execution_order: ExecutionOrder):
+        caches = self.LoweredCaches(multi_stage)
+        for cache in caches.values():
+            self.AddCacheBuffer(self.sdfg, cache)
+
+        all = multi_stage.ReadIds() | multi_stage.WriteIds()
+        globals = { id for id in all if self.id_resolver.IsGlobal(id) }
+        self.AddArrays(self.sdfg, all - globals, transient=True)
+        # self.AddScalars(self.sdfg, multi_stage.ReadIds() & globals)
+
+        return self.Export_KLoop(multi_stage, execution_order, caches, self.last_state_)
+
+    def Export_column(self, multi_stages: list):
+        """
+        Exports the multi-stages as an IJ-map around a nested SDFG that sweeps one column in a k-loop per multi-stage.
+        The cached levels of the column are carried in scalars, from one multi-stage to the next too.
+        """
+        ms_state = self.sdfg.add_state(f'ms_state_{CreateUID()}')
+        column_sdfg = dace.SDFG(f'column_sdfg_{CreateUID()}')
+        caches = {}
+        for multi_stage in multi_stages:
+            caches.update(self.LoweredCaches(multi_stage, column=True))
+        for cache in caches.values():
+            self.AddCacheBuffer(column_sdfg, cache, column=True)
+        self.filled_caches = {} # The buffers are new.
+
+        all = set().union(*(ms.ReadIds() | ms.WriteIds() for ms in multi_stages))
+        globals = { id for id in all if self.id_resolver.IsGlobal(id) }
+        self.AddArrays(self.sdfg, all - globals, transient=True)
+        self.AddColumns(column_sdfg, all - globals)
+
+        last_state = None
+        for multi_stage in multi_stages:
+            accessed = multi_stage.ReadIds() | multi_stage.WriteIds()
+            last_state = self.Export_KLoop(multi_stage, multi_stage.execution_order,
+                { id : cache for id, cache in caches.items() if id in accessed }, last_state, column_sdfg)
+
+        # Only the fields that are not entirely cached are connected to memory.
+        read_names, write_names = set(), set()
+        for state in column_sdfg.nodes():
+            for node in state.data_nodes():
+                if state.out_degree(node) > 0:
+                    read_names.add(node.data)
+                if state.in_degree(node) > 0:
+                    write_names.add(node.data)
+        for name, array in list(column_sdfg.arrays.items()):
+            if array.transient:
+                read_names.discard(name)
+                write_names.discard(name)
+            elif name not in read_names | write_names:
+                column_sdfg.remove_data(name, validate=False)
+        ids = { self.Name(id) : id for id in all - globals }
+
+        nested_sdfg = ms_state.add_nested_sdfg(
+            column_sdfg,
+            self.sdfg,
+            read_names,
+            write_names,
+            self.SymbolMapping()
+        )
+
+        i_lower, i_upper, j_lower, j_upper = self.ColumnDomain(multi_stages[0])
+        map_entry, map_exit = ms_state.add_map("ijmap", { 'i' : f'{i_lower}:I-({i_upper})', 'j' : f'{j_lower}:J-({j_upper})' })
+
+        for name in read_names:
+            ms_state.add_memlet_path(
+                ms_state.add_read(name),
+                map_entry,
+                nested_sdfg,
+                memlet = dace.Memlet(f'{name}[{self.ColumnSubset(ids[name])}]'),
+                dst_conn = name,
+                propagate=True
+            )
+        if not read_names:
+            ms_state.add_edge(map_entry, None, nested_sdfg, None, dace.memlet.Memlet())
+
+        for name in write_names:
+            ms_state.add_memlet_path(
+                nested_sdfg,
+                map_exit,
+                ms_state.add_write(name),
+                memlet = dace.Memlet(f'{name}[{self.ColumnSubset(ids[name])}]'),
+                src_conn = name,
+                propagate=True
+            )
+
+        if self.last_state_ is not None:
+            self.sdfg.add_edge(self.last_state_, ms_state, dace.InterstateEdge())
+        return ms_state
+
+    def Export_KLoop(self, multi_stage: MultiStage, execution_order: ExecutionOrder, caches: dict, before_state, column_sdfg = None):
+        """
+        Adds the k-loop of a forward or backward multi-stage after 'before_state' and returns its last state.
+        column_sdfg: The SDFG of a column to sweep, instead of the IJ-planes of the top-level SDFG.
+        """
+        sdfg = self.sdfg if column_sdfg is None else column_sdfg
+        forward = (execution_order == ExecutionOrder.Forward_Loop.value)
+
+        # Only the levels this interval accesses are loaded, the others of the window may lie outside of the field.
+        windows = { cache.uid : self.MemletWindow(multi_stage, id) for id, cache in caches.items() }
+
+        def LeadingOffset(cache: Cache) -> int:
+            """ The offset of the level that enters the window in each iteration. """
+            window = windows[cache.uid]
+            return window.upper if forward else window.lower
+
+        # The loop body, in order: fill the leading levels, compute, flush.
+        # The buffers are rings, whose windows move along with k by themselves.
+        body = []
+        for cache in caches.values():
+            if cache.FillsEachLevel() or (cache.Fills() and LeadingOffset(cache) != 0):
+                body.append(self.Export_CacheFill(cache, [LeadingOffset(cache)], 'k', column_sdfg))
 
-        if execution_order == ExecutionOrder.Forward_Loop.value:
+        for stage in multi_stage.stages:
+            for do_method in stage.do_methods:
+                if column_sdfg is None:
+                    body.append(self.Export_DoMethodPlane(stage, do_method, caches))
+                else:
+                    body.append(self.Export_DoMethodColumn(column_sdfg, do_method, caches))
+
+        write_ids = multi_stage.WriteIds()
+        for id, cache in caches.items():
+            if cache.Flushes() and id in write_ids:
+                body.append(self.Export_CacheFlush(cache, ['k'], column_sdfg))
+
+        for src, dst in zip(body, body[1:]):
+            sdfg.add_edge(src, dst, dace.InterstateEdge())
+
+        if forward:
             initialize_expr = str(do_method.k_interval.lower)
             condition_expr = f'k < {do_method.k_interval.upper}'
             increment_expr = 'k + 1'
+            final_expr = str(do_method.k_interval.upper - 1)
         else:
             initialize_expr = str(do_method.k_interval.upper - 1)
             condition_expr = f'k >= {do_method.k_interval.lower}'
             increment_expr = 'k - 1'
-
-        print(initialize_expr, condition_expr, increment_expr)
-
-        _, _, last_state  = self.sdfg.add_loop(
-            before_state = self.last_state_,
-            loop_state = first_state,
-            loop_end_state = last_state,
+            final_expr = str(do_method.k_interval.lower)
+
+        log.debug('Loop: %s; %s; %s', initialize_expr, condition_expr, increment_expr)
+
+        # Loads the window, except for the leading level, before the first iteration.
+        # Caches that are not filled each level keep their window across the intervals of a split multi-stage
+        # that access the same levels.
+        for cache in caches.values():
+            window = windows[cache.uid]
+            if cache.Fills() and (cache.FillsEachLevel() or self.filled_caches.get(cache.uid) != window):
+                self.filled_caches[cache.uid] = window
+                offsets = [o for o in range(window.lower, window.upper + 1) if o != LeadingOffset(cache)]
+                if not offsets:
+                    continue
+                state = self.Export_CacheFill(cache, offsets, initialize_expr, column_sdfg)
+                if before_state is not None:
+                    sdfg.add_edge(before_state, state, dace.InterstateEdge())
+                before_state = state
+
+        _, _, last_state  = sdfg.add_loop(
+            before_state = before_state,
+            loop_state = body[0],
+            loop_end_state = body[-1],
             after_state = None,
             loop_var = 'k',
             initialize_expr = initialize_expr,
             condition_expr = condition_expr,
             increment_expr = increment_expr
         )
+
+        # An end-point flush also stores the levels written beyond the last level of the interval, which never were level k.
+        for id, cache in caches.items():
+            if cache.FlushesEndPoint() and id in write_ids:
+                written = self.MemletWindow(multi_stage, id, reads=False)
+                offsets = range(1, written.upper + 1) if forward else range(written.lower, 0)
+                if not offsets:
+                    continue
+                state = self.Export_CacheFlush(cache, [f'({final_expr})+({offset})' for offset in offsets], column_sdfg)
+                sdfg.add_edge(last_state, state, dace.InterstateEdge())
+                last_state = state
         return last_state
 
-    
-    def Export_MultiStage(self, multi_stage: MultiStage):
-        if multi_stage.execution_order == ExecutionOrder.Parallel.value:
-            self.last_state_ = self.Export_parallel(multi_stage)
+    def Export_DoMethodPlane(self, stage: Stage, do_method: DoMethod, caches: dict):
+        """ Returns a state computing the IJ-plane at level k of a DoMethod in a k-loop. """
+        writes = do_method.WriteIds()
+        boundary_conditions = self.BoundaryConditions(stage, writes)
+
+        state = self.sdfg.add_state(str(do_method))
+
+        stenc = StencilLib(
+            label = str(do_method),
+            shape = [I, J, 1],
+            accesses = self.Create_Variable_Access_map(do_method.Reads(), '_in'), # input fields
+            output_fields = self.Create_Variable_Access_map(do_method.Writes(), '_out'), # output fields
+            boundary_conditions = boundary_conditions,
+            code = do_method.Code()
+        )
+        stenc.implementation = 'CPU'
+        state.add_node(stenc)
+        
+        # Add memlet path from state.read to stencil.
+        for id, acc in do_method.read_memlets.items():
+            data, subset = self.LoopSubset(id, acc.k, caches)
+
+            state.add_memlet_path(
+                state.add_read(data),
+                stenc,
+                memlet = dace.Memlet(f'{data}[{subset}]'),
+                dst_conn = self.Name(id) + '_in',
+                propagate=True
+            )
+
+        # Add memlet path from stencil to state.write.
+        for id, acc in do_method.write_memlets.items():
+            data, subset = self.LoopSubset(id, acc.k, caches)
+
+            state.add_memlet_path(
+                stenc,
+                state.add_write(data),
+                memlet = dace.Memlet(f'{data}[{subset}]'),
+                src_conn = self.Name(id) + '_out',
+                propagate=True
+            )
+        return state
+
+    def Export_DoMethodColumn(self, column_sdfg, do_method: DoMethod, caches: dict):
+        """ Returns a state computing the level k of a column in a tasklet, with one scalar connector per accessed level. """
+        state = column_sdfg.add_state(str(do_method))
+
+        # The code accesses the levels relative to the lower bound of the memlets, e.g. a_in[0, 0, 0] for k-1.
+        replace = {}
+        inputs, outputs = {}, {}
+        for memlets, suffix, connectors in [(do_method.read_memlets, '_in', inputs), (do_method.write_memlets, '_out', outputs)]:
+            for id, acc in memlets.items():
+                name = self.Name(id)
+                for offset in acc.k.range():
+                    connector = f'{name}{suffix}_{len(replace)}'
+                    replace[(name + suffix, tuple(dim_filter(self.Dimensions(id), 0, 0, offset - acc.k.lower)))] = connector
+                    connectors[connector] = self.LoopSubset(id, ClosedInterval(offset, offset), caches, column=True)
+
+        tree = ast.parse(do_method.Code())
+        code = astunparse.unparse(ReplaceSubscript(replace).visit(tree))
+        tasklet = state.add_tasklet(str(do_method), set(inputs), set(outputs), code)
+
+        for connector, (data, subset) in inputs.items():
+            state.add_edge(state.add_read(data), None, tasklet, connector, dace.Memlet(f'{data}[{subset}]'))
+        for connector, (data, subset) in outputs.items():
+            state.add_edge(tasklet, connector, state.add_write(data), None, dace.Memlet(f'{data}[{subset}]'))
+        return state
+
+    def LoopSubset(self, id:int, k:ClosedInterval, caches:dict, column:bool = False) -> tuple:
+        """
+        Returns the data and subset a do-method in a k-loop accesses the levels k+k.lower..k+k.upper of a field through.
+        column: If the do-method accesses the elements of a column instead of IJ-planes.
+        """
+        if id in caches:
+            cache = caches[id]
+            assert k.lower == k.upper, 'The levels of a ring are accessed one at a time.'
+            data = self.CacheName(cache)
+            k_subset = self.CacheSlot(cache, f'k+({k.lower})')
         else:
-            self.last_state_ = self.Export_loop(multi_stage, multi_stage.execution_order)
+            data = self.Name(id)
+            k_subset = f'k+{k.lower}:k+{k.upper+1}'
+        return data, self.Plane(id, k_subset, column)
 
-    def Export_Stencil(self, stenc:Stencil):
-        for ms in stenc.multi_stages:
-            self.Export_MultiStage(ms)
+    def AddColumns(self, sdfg, ids):
+        """ Adds the columns of the fields to the SDFG of a column, unless it already has them. """
+        for id in ids:
+            name = self.Name(id)
+            if name in sdfg.arrays:
+                continue
+            shape = list(dim_filter(self.Dimensions(id), 1, 1, K+1) or [1])
+            sdfg.add_array(name, shape, dtype=self.FloatType(id), strides=self.Strides(id))
+            log.debug('Added column: %s', name)
+            Event('AddColumn', sdfg=sdfg.name, name=name)
+
+    def ColumnSubset(self, id:int) -> str:
+        """ Returns the subset of the column at (i,j) of a field. """
+        return ','.join(dim_filter(self.Dimensions(id), 'i', 'j', '0:K+1')) or '0'
+
+    def ColumnDomain(self, multi_stage: MultiStage):
+        """ Returns the shrinking of the IJ-domain that all the stages of the multi-stage compute, or None if they differ. """
+        domains = set()
+        for stage in multi_stage.stages:
+            for condition in self.BoundaryConditions(stage, stage.WriteIds()).values():
+                domains.add(condition['halo'][:4])
+        if len(domains) != 1:
+            return None
+        return domains.pop()
+
+    def IsColumnLowerable(self, multi_stage: MultiStage) -> bool:
+        """ Returns if each column of the multi-stage only accesses itself and all its stages compute the same IJ-domain. """
+        for stage in multi_stage.stages:
+            for do_method in stage.do_methods:
+                for acc in chain(do_method.read_memlets.values(), do_method.write_memlets.values()):
+                    if (acc.i.lower, acc.i.upper, acc.j.lower, acc.j.upper) != (0, 0, 0, 0):
+                        return False
+        return self.ColumnDomain(multi_stage) is not None
+
+    def IsColumnGroup(self, multi_stages: list) -> bool:
+        """ Returns if the multi-stages can be swept in the same columns, one after the other. """
+        return (self.schedule.vertical == 'column') \
+            and all(ms.execution_order != ExecutionOrder.Parallel.value and self.IsColumnLowerable(ms) for ms in multi_stages) \
+            and len({ self.ColumnDomain(ms) for ms in multi_stages }) == 1
+
+    def ExportGroups(self, multi_stages: list) -> list:
+        """
+        Returns the multi-stages in lists that are exported together.
+        Consecutive parts of a split multi-stage, which share caches, are swept in the same columns if they all can be,
+        so the buffers carry the cached levels from one part to the next.
+        """
+        ret = []
+        for ms in multi_stages:
+            if ret and (set(ret[-1][-1].caches.values()) & set(ms.caches.values())) and self.IsColumnGroup(ret[-1] + [ms]):
+                ret[-1].append(ms)
+            else:
+                ret.append([ms])
+        return ret
+
+    def Export_MultiStages(self, multi_stages: list):
+        """ Exports a group of multi-stages, see ExportGroups. """
+        if len(multi_stages) == 1:
+            self.Export_MultiStage(multi_stages[0])
+            return
+        Event('Export_MultiStage', multi_stage=[str(ms) for ms in multi_stages], execution_order=multi_stages[0].execution_order)
+        with self.profiler.Measure('Export_MultiStage', multi_stage=str(multi_stages[0])):
+            self.last_state_ = self.Export_column(multi_stages)
+
+    def Export_MultiStage(self, multi_stage: MultiStage):
+        Event('Export_MultiStage', multi_stage=str(multi_stage), execution_order=multi_stage.execution_order)
+        with self.profiler.Measure('Export_MultiStage', multi_stage=str(multi_stage)):
+            if multi_stage.execution_order == ExecutionOrder.Parallel.value:
+                if self.schedule.iteration_space == '3d':
+                    self.last_state_ = self.Export_parallel_3d(multi_stage)
+                else:
+                    self.last_state_ = self.Export_parallel(multi_stage)
+            elif self.IsColumnGroup([multi_stage]):
+                self.last_state_ = self.Export_column([multi_stage])
+            else:
+                self.last_state_ = self.Export_loop(multi_stage, multi_stage.execution_order)
+
+    def Export_HaloUpdate(self, bc: BoundaryCondition, side:str):
+        """ Returns a state applying the boundary condition's functor to each point of the halo region of a side. """
+        state = self.sdfg.add_state(f'{bc}_{side}'.replace('-', 'm').replace('+', 'p'))
+        i, j = HaloRegion(side, bc.extents)
+        ranges = dict(dim_filter(self.Dimensions(bc.Id()), ('i', i), ('j', j), ('k', '0:K')))
+        map_entry, map_exit = state.add_map(str(bc), ranges)
+
+        # One scalar connector per accessed point.
+        replace = {}
+        inputs, outputs = {}, {}
+        for (name, offset), id in bc.accesses.items():
+            if offset:
+                connector = f'{name}_{len(replace)}'
+                replace[(name, offset)] = connector
+            else:
+                connector = name # Fields without dimensions are accessed without subscript.
+            index = (f'{p}+({o})' for p, o in zip(dim_filter(self.Dimensions(id), 'i', 'j', 'k'), offset))
+            memlet = dace.Memlet(f'{self.Name(id)}[{",".join(index) or "0"}]')
+            (outputs if name.endswith('_out') else inputs)[connector] = memlet
+
+        code = astunparse.unparse(ReplaceSubscript(replace).visit(ast.parse(bc.code)))
+        tasklet = state.add_tasklet(str(bc), set(inputs), set(outputs), code)
+
+        for connector, memlet in inputs.items():
+            state.add_memlet_path(state.add_read(memlet.data), map_entry, tasklet, memlet=memlet, dst_conn=connector, propagate=True)
+        if not inputs:
+            state.add_edge(map_entry, None, tasklet, None, dace.memlet.Memlet())
+        for connector, memlet in outputs.items():
+            state.add_memlet_path(tasklet, map_exit, state.add_write(memlet.data), memlet=memlet, src_conn=connector, propagate=True)
+        return state
+
+    def Export_BoundaryConditions(self, boundary_conditions: list):
+        """
+        Adds the halo updates of the boundary conditions after the last state.
+        The halo exchange updates its sides, the boundary condition's functor the others.
+        """
+        for bc in boundary_conditions:
+            exchanged = set()
+            states = []
+            if self.halo_exchange is not None:
+                exchanged = self.halo_exchange.Sides()
+                states += self.halo_exchange.Export(self, bc.Id(), bc.extents)
+            for side in SIDES:
+                if side not in exchanged and HaloWidth(side, bc.extents) != 0:
+                    states.append(self.Export_HaloUpdate(bc, side))
+            Event('Export_BoundaryCondition', functor=bc.functor, field=self.Name(bc.Id()), states=len(states), exchanged=sorted(exchanged))
+
+            for state in states:
+                if self.last_state_ is not None:
+                    self.sdfg.add_edge(self.last_state_, state, dace.InterstateEdge())
+                self.last_state_ = state
+
+    def Export_Stencil(self, stenc:Stencil, index:int = 0):
+        # The caches of a split multi-stage are shared by its parts, which may be exported apart.
+        groups = self.ExportGroups(stenc.multi_stages)
+        uids = [cache.uid for group in groups for cache in set(chain.from_iterable(ms.caches.values() for ms in group))]
+        self.shared_caches_ = { uid for uid in uids if uids.count(uid) > 1 }
+        self.Export_BoundaryConditions(stenc.boundary_conditions)
+        with self.profiler.Measure('Export_Stencil', stencil=index):
+            for group in groups:
+                self.Export_MultiStages(group)
 
     def Export_Stencils(self, stenc: list):
-        for s in stenc:
-            self.Export_Stencil(s)
+        for index, s in enumerate(stenc):
+            self.Export_Stencil(s, index)
@@ -0,0 +1,89 @@
+from helpers import *
+
+# The sides of the IJ-domain, in the order their halos are updated. The i-sides span the corners.
+SIDES = ('i-', 'i+', 'j-', 'j+')
+
+
+def HaloWidth(side:str, extents:ClosedInterval3D):
+    """ Returns how far the halo of a side is updated. """
+    return {
+        'i-' : extents.i.lower,
+        'i+' : extents.i.upper,
+        'j-' : extents.j.lower,
+        'j+' : extents.j.upper,
+    }[side]
+
+
+def HaloRegion(side:str, extents:ClosedInterval3D) -> tuple:
+    """ Returns the ranges (i, j) of the halo region of a side, in the symbols I, J and halo. """
+    e = extents
+    i = 'halo:I-halo'
+    j = 'halo:J-halo'
+    if side == 'i-':
+        return f'halo-({e.i.lower}):halo', f'halo-({e.j.lower}):J-halo+({e.j.upper})'
+    if side == 'i+':
+        return f'I-halo:I-halo+({e.i.upper})', f'halo-({e.j.lower}):J-halo+({e.j.upper})'
+    if side == 'j-':
+        return i, f'halo-({e.j.lower}):halo'
+    if side == 'j+':
+        return i, f'J-halo:J-halo+({e.j.upper})'
+    raise ValueError("Unknown side: {}".format(side))
+
+
+class HaloExchange:
+    """
+    Backend that updates the halos on some sides of the domain before a boundary condition, e.g. from neighbouring subdomains.
+    The boundary condition functor then only updates the remaining sides.
+    """
+
+    def Sides(self) -> set:
+        """ Returns the sides whose halos this backend updates. """
+        return set()
+
+    def Export(self, exporter, id:int, extents:ClosedInterval3D) -> list:
+        """ Returns the states of the exporter's SDFG that update the halos of the field on Sides(). """
+        return []
+
+    def __str__(self):
+        return type(self).__name__
+
+
+class PeriodicHaloExchange(HaloExchange):
+    """
+    In-process stand-in for a distributed halo exchange: along the given dimensions, the domain is its own neighbour.
+    The halo of a side is copied from the opposite edge of the compute domain.
+    """
+
+    def __init__(self, dims:str = 'ij'):
+        if not set(dims) <= set('ij'):
+            raise ValueError("Only i and j can be periodic: {}".format(dims))
+        self.dims = ''.join(sorted(set(dims)))
+
+    def Sides(self) -> set:
+        return { side for side in SIDES if side[0] in self.dims }
+
+    def __str__(self):
+        return f'{type(self).__name__}({self.dims})'
+
+    @staticmethod
+    def Source(side:str, extents:ClosedInterval3D) -> tuple:
+        """ Returns the ranges (i, j) of the region the halo region of a side is copied from. """
+        i, j = HaloRegion(side, extents)
+        shift = { 'i-' : ('+(I-2*halo)', ''), 'i+' : ('-(I-2*halo)', ''), 'j-' : ('', '+(J-2*halo)'), 'j+' : ('', '-(J-2*halo)') }[side]
+        return tuple(
+            ':'.join(f'({bound}){offset}' for bound in subset.split(':')) if offset else subset
+            for subset, offset in zip((i, j), shift)
+        )
+
+    def Export(self, exporter, id:int, extents:ClosedInterval3D) -> list:
+        name = exporter.Name(id)
+        dims = exporter.Dimensions(id)
+        states = []
+        # The j-sides go first, so the i-sides, which span the corners, copy them from updated j-halos.
+        for side in ('j-', 'j+', 'i-', 'i+'):
+            if side[0] not in self.dims or HaloWidth(side, extents) == 0:
+                continue
+            dst = ','.join(dim_filter(dims, *HaloRegion(side, extents), '0:K+1'))
+            src = ','.join(dim_filter(dims, *self.Source(side, extents), '0:K+1'))
+            states.append(exporter.Export_Copies(f'exchange_{name}_{side}', [(name, src, name, dst)]))
+        return states
@@ -0,0 +1,46 @@
+import unittest
+import numpy
+from HaloExchange import *
+
+def Slice(subset:str, **symbols) -> slice:
+    lower, upper = subset.split(':')
+    return slice(eval(lower, {}, symbols), eval(upper, {}, symbols))
+
+class HaloRegion_test(unittest.TestCase):
+    def test_i_sides_span_the_corners(self):
+        extents = ClosedInterval3D(1, 2, 3, 4, 0, 0)
+        self.assertEqual(HaloRegion('i-', extents), ('halo-(1):halo', 'halo-(3):J-halo+(4)'))
+        self.assertEqual(HaloRegion('j+', extents), ('halo:I-halo', 'J-halo:J-halo+(4)'))
+
+    def test_width(self):
+        extents = ClosedInterval3D(1, 2, 3, 4, 0, 0)
+        self.assertEqual([HaloWidth(side, extents) for side in SIDES], [1, 2, 3, 4])
+
+    def test_unknown_side(self):
+        self.assertRaises(ValueError, HaloRegion, 'k-', ClosedInterval3D(1, 1, 1, 1, 0, 0))
+
+class PeriodicHaloExchange_test(unittest.TestCase):
+    def test_sides(self):
+        self.assertEqual(HaloExchange().Sides(), set())
+        self.assertEqual(PeriodicHaloExchange('i').Sides(), { 'i-', 'i+' })
+        self.assertEqual(PeriodicHaloExchange('ji').Sides(), set(SIDES))
+        self.assertEqual(str(PeriodicHaloExchange('ji')), 'PeriodicHaloExchange(ij)')
+        self.assertRaises(ValueError, PeriodicHaloExchange, 'k')
+
+    def test_wraps_around(self):
+        halo, I, J = 2, 8, 7
+        extents = ClosedInterval3D(halo, halo, halo, halo, 0, 0)
+        interior = numpy.arange((I - 2 * halo) * (J - 2 * halo)).reshape(I - 2 * halo, J - 2 * halo)
+        field = numpy.zeros((I, J))
+        field[halo:I-halo, halo:J-halo] = interior
+
+        for side in ('j-', 'j+', 'i-', 'i+'):
+            dst = [Slice(s, halo=halo, I=I, J=J) for s in HaloRegion(side, extents)]
+            src = [Slice(s, halo=halo, I=I, J=J) for s in PeriodicHaloExchange.Source(side, extents)]
+            field[tuple(dst)] = field[tuple(src)]
+
+        numpy.testing.assert_array_equal(field, numpy.pad(interior, halo, mode='wrap'))
+
+
+if __name__ == '__main__':
+    unittest.main()
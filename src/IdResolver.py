@@ -1,4 +1,5 @@
 from helpers import *
+from itertools import chain
 
 class IdResolver:
     def __init__(self, accessIDToName:dict,
@@ -13,6 +14,13 @@ class IdResolver:
     def GetName(self, id:int) -> str:
         return self.__accessIDToName[id]
 
+    def GetFieldId(self, name:str) -> int:
+        """ Returns the id of the API field or temporary of this name. """
+        for id in chain(self.__APIFieldIDs, self.__temporaryFieldIDs):
+            if self.__accessIDToName[id] == name:
+                return id
+        raise KeyError(name)
+
     def GetDimensions(self, id:int) -> Bool3D:
         """ Returns if the dimensions (i,j,k) are present in this field. """
         if self.IsLocal(id):
@@ -3,6 +3,9 @@ import astunparse
 from Intermediates import *
 from IdResolver import IdResolver
 from Unparser import *
+from Log import GetLogger, Event
+
+log = GetLogger('Importer')
 
 def DownCastStatement(stmt):
     which = stmt.WhichOneof("stmt")
@@ -44,8 +47,9 @@ class Importer:
 
         upper += interval.upper_offset
 
-        print(lower, upper + 1)
-        return HalfOpenInterval(lower, upper + 1)
+        ret = HalfOpenInterval(lower, upper + 1)
+        log.debug('Imported interval %s', ret)
+        return ret
 
     def Import_MemoryAccesses(self, access: dict) -> dict:
         ret = {}
@@ -101,20 +105,115 @@ class Importer:
                 stage.extents.vertical_extent.plus
         ))
 
+    @staticmethod
+    def Import_Cache(cache, ms:MultiStage) -> Cache:
+        # The window is taken from the accesses, which also determine the memlets.
+        return Cache(
+            id = cache.accessID,
+            type = cache.type,
+            policy = cache.policy,
+            window = ms.KWindow(cache.accessID)
+        )
+
     def Import_MultiStage(self, multi_stage) -> MultiStage:
         if multi_stage.loopOrder == ExecutionOrder.Parallel.value:
             for s in multi_stage.stages:
                 if len(s.doMethods) > 1:
-                    print('This parallel MS has a Stage with {} DoMethods!'.format(len(s.doMethods)))
-        return MultiStage(
+                    log.warning('This parallel MS has a Stage with %d DoMethods!', len(s.doMethods))
+        ms = MultiStage(
             execution_order = multi_stage.loopOrder,
             stages = [self.Import_Stage(s) for s in multi_stage.stages]
         )
+        ms.caches = { id : self.Import_Cache(cache, ms) for id, cache in multi_stage.Caches.items() }
+        return ms
+
+    def Import_Stencil(self, stencil, boundary_conditions:list = None) -> Stencil:
+        ret = Stencil(
+            [self.Import_MultiStage(s) for s in stencil.multiStages],
+            boundary_conditions
+        )
+        Event('Import_Stencil', stencil_id=stencil.stencilID, multi_stages=len(ret.multi_stages))
+        return ret
 
-    def Import_Stencil(self, stencil) -> Stencil:
-        return Stencil(
-            [self.Import_MultiStage(s) for s in stencil.multiStages]
+    def Iter_Stencils(self, stencils: list, boundary_conditions:dict = None):
+        """
+        Imports the stencils one at a time, so a stencil can be processed and released before the next one is imported.
+        boundary_conditions: The boundary conditions applied before each stencil, by stencil id. See Import_BoundaryConditions.
+        """
+        boundary_conditions = boundary_conditions or {}
+        for s in stencils:
+            yield self.Import_Stencil(s, boundary_conditions.get(s.stencilID))
+
+    def Import_SharedIds(self, stencils: list) -> set:
+        """
+        Returns the ids of the fields accessed by more than one stencil, whose values have to live on between them.
+        Reads only the accesses of the statements, so it is cheap compared to importing the stencils.
+        """
+        seen = set()
+        shared = set()
+        for stencil in stencils:
+            ids = set()
+            for multi_stage in stencil.multiStages:
+                for stage in multi_stage.stages:
+                    for do_method in stage.doMethods:
+                        for stmt in do_method.ast.block_stmt.statements:
+                            accesses = DownCastStatement(stmt).data.accesses
+                            ids.update(accesses.readAccess.keys(), accesses.writeAccess.keys())
+            shared |= ids & seen
+            seen |= ids
+        log.debug('Ids shared between stencils: %s', sorted(shared))
+        return shared
+
+    @staticmethod
+    def Import_Extents(extents) -> ClosedInterval3D:
+        """ Returns how far the extents reach in each direction, as non-negative numbers. """
+        horizontal = extents.cartesian_extent
+        return ClosedInterval3D(
+            -horizontal.i_extent.minus,
+            horizontal.i_extent.plus,
+            -horizontal.j_extent.minus,
+            horizontal.j_extent.plus,
+            -extents.vertical_extent.minus,
+            extents.vertical_extent.plus
         )
 
+    def Import_BoundaryCondition(self, decl, functor, extents) -> BoundaryCondition:
+        """
+        decl: The BoundaryConditionDeclStmt applying the functor to fields.
+        extents: The Extents of the halo to update. None updates the whole halo.
+        """
+        ids = [self.id_resolver.GetFieldId(name) for name in decl.fields]
+        if extents is None:
+            halo = Symbol('halo')
+            extents = ClosedInterval3D(halo, halo, halo, halo, 0, 0)
+        else:
+            extents = self.Import_Extents(extents)
+        ret = BoundaryCondition(decl.functor, ids, dict(zip(functor.args, ids)), functor.ASTStmt, extents)
+        Event('Import_BoundaryCondition', functor=decl.functor, fields=list(decl.fields), extents=str(extents))
+        return ret
+
+    def Import_BoundaryConditions(self, iir, metadata) -> dict:
+        """
+        Returns the boundary conditions of the control flow, by the id of the stencil that is called after them.
+        The ones after the last stencil call are keyed by None.
+        """
+        functors = { functor.name : functor for functor in iir.boundaryConditions }
+        call_to_stencil = { stmt.stencil_call_decl_stmt.ID : stencil_id for stencil_id, stmt in metadata.idToStencilCall.items() }
+
+        ret = {}
+        pending = []
+        for stmt in iir.controlFlowStatements:
+            which = stmt.WhichOneof("stmt")
+            if which == "boundary_condition_decl_stmt":
+                decl = stmt.boundary_condition_decl_stmt
+                extents = metadata.boundaryCallToExtent[decl.ID] if decl.ID in metadata.boundaryCallToExtent else None
+                pending.append(self.Import_BoundaryCondition(decl, functors[decl.functor], extents))
+            elif which == "stencil_call_decl_stmt" and pending:
+                ret[call_to_stencil[stmt.stencil_call_decl_stmt.ID]] = pending
+                pending = []
+        if pending:
+            ret[None] = pending
+        return ret
+
     def Import_Stencils(self, stencils: list) -> list:
-        return [self.Import_Stencil(s) for s in stencils]
+        return list(self.Iter_Stencils(stencils))
@@ -0,0 +1,126 @@
+import unittest
+import IIR_pb2
+from IdResolver import IdResolver
+from Importer import Importer
+from helpers import *
+
+def Extents(i_minus, i_plus, j_minus, j_plus):
+    extents = IIR_pb2.SIR_dot_statements__pb2.Extents()
+    extents.cartesian_extent.i_extent.minus = i_minus
+    extents.cartesian_extent.i_extent.plus = i_plus
+    extents.cartesian_extent.j_extent.minus = j_minus
+    extents.cartesian_extent.j_extent.plus = j_plus
+    return extents
+
+class Import_BoundaryConditions_test(unittest.TestCase):
+    """ Imports the boundary conditions of a hand built IIR, so no Dawn or DaCe is needed. """
+
+    def setUp(self):
+        self.instantiation = IIR_pb2.StencilInstantiation()
+        metadata = self.instantiation.metadata
+        metadata.accessIDToName[1] = 'u'
+        metadata.accessIDToName[2] = 'v'
+        metadata.APIFieldIDs.extend([1, 2])
+
+        functor = self.instantiation.internalIR.boundaryConditions.add()
+        functor.name = 'zero_gradient'
+        functor.args.extend(['out', 'in'])
+        functor.ASTStmt.block_stmt.SetInParent()
+
+        self.importer = Importer(IdResolver(
+            metadata.accessIDToName,
+            metadata.APIFieldIDs,
+            metadata.temporaryFieldIDs,
+            metadata.globalVariableIDs,
+            metadata.fieldIDtoDimensions
+        ))
+
+    def AddBoundaryCondition(self, id:int, fields:list, extents=None):
+        stmt = self.instantiation.internalIR.controlFlowStatements.add()
+        stmt.boundary_condition_decl_stmt.ID = id
+        stmt.boundary_condition_decl_stmt.functor = 'zero_gradient'
+        stmt.boundary_condition_decl_stmt.fields.extend(fields)
+        if extents is not None:
+            self.instantiation.metadata.boundaryCallToExtent[id].CopyFrom(extents)
+
+    def AddStencilCall(self, id:int, stencil_id:int):
+        stmt = self.instantiation.internalIR.controlFlowStatements.add()
+        stmt.stencil_call_decl_stmt.ID = id
+        self.instantiation.metadata.idToStencilCall[stencil_id].CopyFrom(stmt)
+
+    def Import(self) -> dict:
+        return self.importer.Import_BoundaryConditions(self.instantiation.internalIR, self.instantiation.metadata)
+
+    def test_keyed_by_the_next_stencil(self):
+        self.AddBoundaryCondition(10, ['u', 'v'])
+        self.AddStencilCall(20, stencil_id=5)
+        self.AddStencilCall(21, stencil_id=6)
+        self.AddBoundaryCondition(11, ['v', 'u'])
+        self.AddStencilCall(22, stencil_id=7)
+
+        bcs = self.Import()
+
+        self.assertTrue(sorted(bcs.keys()) == [5, 7])
+        self.assertTrue(len(bcs[5]) == 1)
+        self.assertTrue(bcs[5][0].ids == [1, 2])
+        self.assertTrue(bcs[5][0].arguments == { 'out': 1, 'in': 2 })
+        self.assertTrue(bcs[7][0].ids == [2, 1])
+        self.assertTrue(bcs[7][0].arguments == { 'out': 2, 'in': 1 })
+        self.assertTrue(bcs[7][0].functor == 'zero_gradient')
+
+    def test_trailing_ones_are_keyed_by_none(self):
+        self.AddStencilCall(20, stencil_id=5)
+        self.AddBoundaryCondition(10, ['u', 'v'])
+        self.AddBoundaryCondition(11, ['v', 'u'])
+
+        bcs = self.Import()
+
+        self.assertTrue(list(bcs.keys()) == [None])
+        self.assertTrue([bc.ids for bc in bcs[None]] == [[1, 2], [2, 1]])
+
+    def test_extents(self):
+        # Dawn stores the lower extents as non-positive offsets.
+        self.AddBoundaryCondition(10, ['u', 'v'], Extents(-1, 2, -3, 0))
+        self.AddStencilCall(20, stencil_id=5)
+
+        bcs = self.Import()
+
+        self.assertTrue(bcs[5][0].extents == ClosedInterval3D(1, 2, 3, 0, 0, 0))
+
+    def test_whole_halo_by_default(self):
+        self.AddBoundaryCondition(10, ['u', 'v'])
+        self.AddStencilCall(20, stencil_id=5)
+
+        bcs = self.Import()
+
+        halo = Symbol('halo')
+        self.assertTrue(bcs[5][0].extents == ClosedInterval3D(halo, halo, halo, halo, 0, 0))
+
+    def test_unknown_field(self):
+        self.AddBoundaryCondition(10, ['w'])
+        self.AddStencilCall(20, stencil_id=5)
+
+        self.assertRaises(KeyError, self.Import)
+
+class Import_SharedIds_test(unittest.TestCase):
+    def Stencil(self, instantiation, reads:list, writes:list):
+        stencil = instantiation.internalIR.stencils.add()
+        do_method = stencil.multiStages.add().stages.add().doMethods.add()
+        stmt = do_method.ast.block_stmt.statements.add()
+        for id in reads:
+            stmt.expr_stmt.data.accesses.readAccess[id].SetInParent()
+        for id in writes:
+            stmt.expr_stmt.data.accesses.writeAccess[id].SetInParent()
+
+    def test_ids_of_several_stencils(self):
+        instantiation = IIR_pb2.StencilInstantiation()
+        self.Stencil(instantiation, reads=[1], writes=[3, 4]) # 3 is a temporary passed on, 4 is private.
+        self.Stencil(instantiation, reads=[3], writes=[2, 5])
+        self.Stencil(instantiation, reads=[1, 5], writes=[2])
+
+        shared = Importer(None).Import_SharedIds(instantiation.internalIR.stencils)
+
+        self.assertTrue(shared == {1, 2, 3, 5})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,13 @@
 import ast
 import astunparse
+import functools
+import weakref
 from enum import Enum
 from helpers import *
 from IIR_AST import IIR_Transformer
+from Log import GetLogger
+
+log = GetLogger('Intermediates')
 
 
 def CreateUID() -> int:
@@ -13,6 +18,43 @@ def CreateUID() -> int:
     return CreateUID.counter
  
 
+def Modified(obj):
+    """
+    Invalidates the cached access summaries of obj and of the objects that contain it.
+    Has to be called whenever statements, their accesses or their offsets change.
+    """
+    pending = [obj]
+    while pending:
+        obj = pending.pop()
+        obj.__dict__.pop('_access_cache', None)
+        pending.extend(obj.__dict__.get('_owners', ()))
+
+
+def Own(owner, parts):
+    """ Registers owner as containing the parts, so modifying a part invalidates the owner's access summaries. """
+    for part in parts:
+        if '_owners' not in part.__dict__:
+            part._owners = weakref.WeakSet()
+        part._owners.add(owner)
+
+
+def CachedAccesses(method):
+    """
+    Memoizes an access summary per object and arguments until the next call to Modified() on it or on one of its parts.
+    The returned summary is shared, so callers must not mutate it.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args):
+        cache = self.__dict__.get('_access_cache')
+        if cache is None:
+            cache = self._access_cache = {}
+        key = (method.__name__,) + args
+        if key not in cache:
+            cache[key] = method(self, *args)
+        return cache[key]
+    return wrapper
+
+
 def FuseIntervalDicts(dicts) -> dict:
     """ dicts: An iteratable of dicts. """
     ret = {}
@@ -30,21 +72,34 @@ def Subtract(a:dict, b:dict) -> dict:
     # dict[id, ClosedInterval3D]
     ret = {}
     for id, interval in a.items():
-        if id == 3307:
-            id = 3307
         if id in b:
             if interval == b[id]:
                 continue # without adding
             else:
-                ret[id] = interval
-                print(ret[id], " - ", b[id], " = ")
-                ret[id].exclude(b[id])
-                print(ret[id])
+                ret[id] = interval.exclude(b[id])
+                log.debug('%s - %s = %s', interval, b[id], ret[id])
         else:
             ret[id] = interval
     return ret
 
 
+def SubscriptIndex(node: ast.Subscript) -> ast.AST:
+    """ Returns the index expression of a subscript. Before Python 3.9 it is wrapped in an ast.Index. """
+    return node.slice.value if isinstance(node.slice, getattr(ast, 'Index', ())) else node.slice
+
+
+def IndexElements(index: ast.AST) -> list:
+    """ Returns the elements of an index, e.g. of '(0, -1, 0)', or the index itself if it is a single number like '-1'. """
+    return index.elts if isinstance(index, ast.Tuple) else [index]
+
+
+def ConstantValue(node: ast.AST) -> int:
+    """ Returns the value of a number like '1' or '-1'. """
+    if isinstance(node, ast.UnaryOp):
+        return -ConstantValue(node.operand)
+    return node.value
+
+
 class Offsetter(ast.NodeTransformer):
     def __init__(self, offsets:dict):
         self.offsets = offsets # dict[name, tuple(offset)]
@@ -53,9 +108,10 @@ class Offsetter(ast.NodeTransformer):
         name = node.value.id
         if name not in self.offsets:
             return node
-        if isinstance(node.slice.value, ast.Constant):
+        index = SubscriptIndex(node)
+        if not isinstance(index, ast.Tuple):
             return node
-        for elt, offset in zip(node.slice.value.elts, self.offsets[name]):
+        for elt, offset in zip(index.elts, self.offsets[name]):
             if isinstance(elt, ast.UnaryOp):
                 elt.operand.value -= offset
             else:
@@ -63,19 +119,66 @@ class Offsetter(ast.NodeTransformer):
         return node
 
 
+class ReplaceSubscript(ast.NodeTransformer):
+    " Replaces subscript with name"
+
+    def __init__(self, repldict):
+        "repldict: Dict[(variable_name, index), new_name]"
+        self.replace = repldict
+
+    def visit_Subscript(self, node: ast.Subscript):
+        name = node.value.id
+        index = tuple(ConstantValue(elt) for elt in IndexElements(SubscriptIndex(node)))
+        key = (name, index)
+        if isinstance(node.value, ast.Name) and (key in self.replace):
+            return ast.copy_location(ast.Name(id=self.replace[key]), node)
+        return self.generic_visit(node)
+
+
 class Statement:
-    def __init__(self, code, line:int, reads:dict, writes:dict):
+    def __init__(self, code, line:int, reads:dict, writes:dict, tree:ast.AST=None):
+        """
+        code: The IIR statement, until it is unparsed into Python.
+        tree: The Python AST of the statement. The passes transform it, and it is unparsed into code only once, by Code().
+        """
         self.code = code
+        self.tree = tree
         self.line = CreateUID()
         self.reads = reads # dict[id, ClosedInterval3D]
         self.writes = writes # dict[id, ClosedInterval3D]
+        if tree is not None:
+            self.code = None
     
     def __str__(self):
         return "Line{}".format(self.line)
 
-    def Code(self):
+    @property
+    def reads(self) -> dict:
+        return self._reads
+
+    @reads.setter
+    def reads(self, value:dict):
+        self._reads = value
+        Modified(self)
+
+    @property
+    def writes(self) -> dict:
+        return self._writes
+
+    @writes.setter
+    def writes(self, value:dict):
+        self._writes = value
+        Modified(self)
+
+    def Code(self) -> str:
+        if self.code is None:
+            self.code = astunparse.unparse(self.tree)
         return self.code
 
+    def Transform(self, transformer:ast.NodeTransformer):
+        self.tree = transformer.visit(self.tree)
+        self.code = None
+
     def Reads(self) -> dict:
         return self.reads
 
@@ -88,50 +191,47 @@ class Statement:
     def WriteIds(self) -> set:
         return self.writes.keys()
 
+    @staticmethod
+    def _NamedOffsets(k_offsets:dict, id_resolver) -> dict:
+        "Returns Dict[name, tuple(offset)] of the fields' input connectors."
+        named_offsets = {}
+        for id, offset_k in k_offsets.items():
+            name = id_resolver.GetName(id) + '_in'
+            dims = id_resolver.GetDimensions(id)
+            offset = []
+            if dims.i:
+                offset.append(0)
+            if dims.j:
+                offset.append(0)
+            if dims.k:
+                offset.append(offset_k)
+            named_offsets[name] = tuple(offset)
+        return named_offsets
+
     def OffsetReads(self, k_offsets:dict, id_resolver):
         "k_offsets: Dict[id, offset:int]"
-        if not self.writes:
-            named_offsets = {}
-            for id, offset_k in k_offsets.items():
-                name = id_resolver.GetName(id) + '_in'
-                dims = id_resolver.GetDimensions(id)
-                offset = []
-                if dims.i:
-                    offset.append(0)
-                if dims.j:
-                    offset.append(0)
-                if dims.k:
-                    offset.append(offset_k)
-                named_offsets[name] = tuple(offset)
-            tree = ast.parse(self.code)
-            self.code = astunparse.unparse(Offsetter(named_offsets).visit(tree))
+        if not self.writes and k_offsets:
+            self.Transform(Offsetter(self._NamedOffsets(k_offsets, id_resolver)))
 
             for id, offset in k_offsets.items():
-                self.reads[id].offset(k = offset)
+                self.reads[id] = self.reads[id].offset(k = offset)
+            Modified(self)
 
     def OffsetWrites(self, k_offsets:dict, id_resolver):
         "k_offsets: Dict[id, offset:int]"
-        if not self.reads:
-            named_offsets = {}
-            for id, offset_k in k_offsets.items():
-                name = id_resolver.GetName(id) + '_in'
-                dims = id_resolver.GetDimensions(id)
-                offset = []
-                if dims.i:
-                    offset.append(0)
-                if dims.j:
-                    offset.append(0)
-                if dims.k:
-                    offset.append(offset_k)
-                named_offsets[name] = tuple(offset)
-            tree = ast.parse(self.code)
-            self.code = astunparse.unparse(Offsetter(named_offsets).visit(tree))
+        if not self.reads and k_offsets:
+            self.Transform(Offsetter(self._NamedOffsets(k_offsets, id_resolver)))
 
             for id, offset in k_offsets.items():
-                self.writes[id].offset(k = offset)
+                self.writes[id] = self.writes[id].offset(k = offset)
+            Modified(self)
 
 
 class DoMethod:
+    """
+    The access summaries are cached. Assign a new list to 'statements' instead of changing it in place.
+    """
+
     def __init__(self, k_interval:HalfOpenInterval, statements:list):
         self.uid = CreateUID()
         self.k_interval = k_interval
@@ -142,9 +242,20 @@ class DoMethod:
     def __str__(self):
         return "DoMethod_{}".format(self.uid)
 
+    @property
+    def statements(self) -> list:
+        return self._statements
+
+    @statements.setter
+    def statements(self, value:list):
+        self._statements = value
+        Own(self, value)
+        Modified(self)
+
     def Code(self):
-        return '\n'.join(stmt.code for stmt in self.statements)
+        return '\n'.join(stmt.Code() for stmt in self.statements)
 
+    @CachedAccesses
     def Reads(self) -> dict:
         # writes = {}
         # reads = {}
@@ -179,14 +290,17 @@ class DoMethod:
         # return ret
         return FuseIntervalDicts(x.Reads() for x in self.statements)
 
+    @CachedAccesses
     def Writes(self) -> dict:
         return FuseIntervalDicts(x.Writes() for x in self.statements)
 
+    @CachedAccesses
     def ReadIds(self, k_interval:HalfOpenInterval = None) -> set:
         if (k_interval is None) or (self.k_interval == k_interval):
             return set().union(*[x.ReadIds() for x in self.statements])
         return set()
 
+    @CachedAccesses
     def WriteIds(self, k_interval:HalfOpenInterval = None) -> set:
         if (k_interval is None) or (self.k_interval == k_interval):
             return set().union(*[x.WriteIds() for x in self.statements])
@@ -198,15 +312,29 @@ class Stage:
         self.do_methods = do_methods
         self.extents = extents
 
+    @property
+    def do_methods(self) -> list:
+        return self._do_methods
+
+    @do_methods.setter
+    def do_methods(self, value:list):
+        self._do_methods = value
+        Own(self, value)
+        Modified(self)
+
+    @CachedAccesses
     def Reads(self) -> dict:
         return FuseIntervalDicts(x.Reads() for x in self.do_methods)
 
+    @CachedAccesses
     def Writes(self) -> dict:
         return FuseIntervalDicts(x.Writes() for x in self.do_methods)
 
+    @CachedAccesses
     def ReadIds(self, k_interval:HalfOpenInterval=None) -> set:
         return set().union(*[x.ReadIds(k_interval) for x in self.do_methods])
 
+    @CachedAccesses
     def WriteIds(self, k_interval:HalfOpenInterval=None) -> set:
         return set().union(*[x.WriteIds(k_interval) for x in self.do_methods])
 
@@ -217,32 +345,126 @@ class ExecutionOrder(Enum):
     Parallel = 2
 
 
+class CacheType(Enum):
+    IJ = 0
+    K = 1
+    IJK = 2
+    Bypass = 3
+
+
+class CachePolicy(Enum):
+    Unknown = 0
+    FillFlush = 1
+    Fill = 2
+    Flush = 3
+    EPFlush = 4
+    BPFill = 5
+    Local = 6
+
+
+class Cache:
+    """ Dawn's decision to keep a field of a multi-stage in a buffer instead of re-reading it from memory. """
+
+    def __init__(self, id:int, type:CacheType, policy:CachePolicy, window:ClosedInterval):
+        """
+        window: The k-offsets the multi-stage accesses the field at, which the buffer holds. Contains 0.
+        A split multi-stage shares the cache of the whole, so each part may access fewer of them.
+        """
+        self.uid = CreateUID()
+        self.id = id
+        self.type = type
+        self.policy = policy
+        self.window = window
+
+    def __str__(self):
+        return "cache_{}".format(self.uid)
+
+    def Fills(self) -> bool:
+        return self.policy in (CachePolicy.Fill.value, CachePolicy.FillFlush.value, CachePolicy.BPFill.value)
+
+    def FillsEachLevel(self) -> bool:
+        return self.policy in (CachePolicy.Fill.value, CachePolicy.FillFlush.value)
+
+    def Flushes(self) -> bool:
+        return self.policy in (CachePolicy.Flush.value, CachePolicy.FillFlush.value, CachePolicy.EPFlush.value)
+
+    def FlushesEndPoint(self) -> bool:
+        return self.policy == CachePolicy.EPFlush.value
+
+
 class MultiStage:
-    def __init__(self, execution_order:ExecutionOrder, stages:list):
+    def __init__(self, execution_order:ExecutionOrder, stages:list, caches:dict=None):
         self.uid = CreateUID()
         self.execution_order = execution_order
         self.stages = stages
+        self.caches = caches if caches is not None else {} # dict[id, Cache]
         self.read_memlets = None
         self.write_memlets = None
 
     def __str__(self):
         return "state_{}".format(self.uid)
 
+    @property
+    def stages(self) -> list:
+        return self._stages
+
+    @stages.setter
+    def stages(self, value:list):
+        self._stages = value
+        Own(self, value)
+        Modified(self)
+
+    @CachedAccesses
     def Reads(self) -> dict:
         return FuseIntervalDicts(x.Reads() for x in self.stages)
 
+    @CachedAccesses
     def Writes(self) -> dict:
         return FuseIntervalDicts(x.Writes() for x in self.stages)
 
+    @CachedAccesses
     def ReadIds(self, k_interval:HalfOpenInterval=None) -> set:
         return set().union(*[x.ReadIds(k_interval) for x in self.stages])
 
+    @CachedAccesses
     def WriteIds(self, k_interval:HalfOpenInterval=None) -> set:
         return set().union(*[x.WriteIds(k_interval) for x in self.stages])
 
+    def KWindow(self, id:int) -> ClosedInterval:
+        """ Returns the k-offsets the multi-stage accesses a field at, including 0. """
+        accesses = [acc.k for acc in (self.Reads().get(id), self.Writes().get(id)) if acc is not None]
+        return Hull([ClosedInterval(0, 0)] + accesses)
+
+
+class BoundaryCondition:
+    def __init__(self, functor:str, ids:list, arguments:dict, body, extents:ClosedInterval3D):
+        """
+        functor: The name of the boundary condition functor.
+        ids: The fields it is applied to. The first one's halo is updated.
+        arguments: The ids of the fields, by the functor's argument names.
+        body: The IIR statement of the functor, until it is unparsed into Python.
+        extents: How far into the halo the field is updated, in each direction.
+        """
+        self.uid = CreateUID()
+        self.functor = functor
+        self.ids = ids
+        self.arguments = arguments
+        self.body = body
+        self.extents = extents
+        self.code = None # Python code of the body, accessing the fields through 'name_in[offset]' and 'name_out[offset]'.
+        self.accesses = {} # The ids of the accesses in the code: dict[(name_in or name_out, offset), id]
+
+    def __str__(self):
+        return f'bc_{self.functor}_{self.uid}'
+
+    def Id(self) -> int:
+        """ The field whose halo is updated. """
+        return self.ids[0]
+
 
 class Stencil:
-    def __init__(self, multi_stages:list):
+    def __init__(self, multi_stages:list, boundary_conditions:list = None):
+        """ boundary_conditions: The boundary conditions applied before the stencil, in order. """
         if not isinstance(multi_stages, list):
             raise TypeError("Expected list, got: {}".format(type(multi_stages).__name__))
         for x in multi_stages:
@@ -250,3 +472,4 @@ class Stencil:
                 raise TypeError("Expected MultiStage, got: {}".format(type(x).__name__))
 
         self.multi_stages = multi_stages
+        self.boundary_conditions = boundary_conditions or []
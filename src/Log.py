@@ -0,0 +1,76 @@
+import json
+import logging
+import sys
+
+# Diagnostics go to 'dawn2dace.<module>' loggers. Formatting is deferred by logging, so disabled messages cost a level check.
+root = logging.getLogger('dawn2dace')
+root.addHandler(logging.NullHandler())
+
+# Machine-readable records of what each pass did. Disabled unless Configure is given an event file.
+events = logging.getLogger('dawn2dace.events')
+events.propagate = False
+events.setLevel(logging.WARNING)
+
+_configuration = (logging.WARNING, None)
+
+
+def GetLogger(name:str) -> logging.Logger:
+    return root.getChild(name)
+
+
+def Event(pass_name:str, **data):
+    """ Emits an event of the given pass. 'data' must be JSON serializable. """
+    if events.isEnabledFor(logging.INFO):
+        events.info(pass_name, extra={ 'event' : data })
+
+
+class JsonEventHandler(logging.Handler):
+    """ Writes one JSON object per event and line. """
+
+    def __init__(self, stream):
+        logging.Handler.__init__(self)
+        self.stream = stream
+
+    def emit(self, record):
+        try:
+            event = { 'pass' : record.getMessage(), 'time' : record.created }
+            event.update(getattr(record, 'event', {}))
+            self.stream.write(json.dumps(event, default=str) + '\n')
+            self.stream.flush()
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self.stream.close()
+        logging.Handler.close(self)
+
+
+def Configure(level = logging.WARNING, event_file:str = None):
+    """
+    Sets the level of the diagnostics, which are written to stderr.
+    event_file: Where to append the event stream to. None disables it.
+    """
+    global _configuration
+    _configuration = (level, event_file)
+
+    for handler in list(root.handlers):
+        if not isinstance(handler, logging.NullHandler):
+            root.removeHandler(handler)
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter('%(levelname)s %(name)s: %(message)s'))
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    for handler in list(events.handlers):
+        events.removeHandler(handler)
+        handler.close()
+    if event_file is None:
+        events.setLevel(logging.WARNING)
+    else:
+        events.addHandler(JsonEventHandler(open(event_file, 'a')))
+        events.setLevel(logging.INFO)
+
+
+def Configuration() -> tuple:
+    """ Returns the arguments of the last Configure call, to repeat it in worker processes. """
+    return _configuration
@@ -0,0 +1,36 @@
+import unittest
+import json
+import logging
+import os
+import tempfile
+import Log
+
+class Log_test(unittest.TestCase):
+    def tearDown(self):
+        Log.Configure()
+
+    def test_events_disabled_by_default(self):
+        Log.Configure()
+        self.assertFalse(Log.events.isEnabledFor(logging.INFO))
+
+    def test_event_stream(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            file_name = os.path.join(tmp, 'events.jsonl')
+            Log.Configure(event_file=file_name)
+            Log.Event('AddRegisters', do_method='DoMethod_1', registers=3)
+            Log.Configure()
+            with open(file_name) as f:
+                events = [json.loads(line) for line in f]
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['pass'], 'AddRegisters')
+        self.assertEqual(events[0]['registers'], 3)
+
+    def test_level(self):
+        Log.Configure(logging.DEBUG)
+        self.assertTrue(Log.GetLogger('Importer').isEnabledFor(logging.DEBUG))
+        Log.Configure(logging.WARNING)
+        self.assertFalse(Log.GetLogger('Importer').isEnabledFor(logging.DEBUG))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import contextlib
+import gc
+import json
+import os
+import resource
+import sys
+import time
+
+
+def PeakRSS() -> int:
+    """ Peak resident set size of this process in bytes. """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return peak # macOS reports bytes.
+    return peak * 1024 # Linux reports kilobytes.
+
+
+class NullProfiler:
+    """ Stand-in that measures nothing. """
+
+    def Measure(self, name:str, **tags):
+        return contextlib.nullcontext()
+
+
+class Profiler:
+    """
+    Records wall time, peak RSS growth and the change in the number of live objects of translation passes.
+    Measurements nest, e.g. a multi-stage inside a stencil inside a pass.
+    """
+
+    def __init__(self, count_objects:bool = True):
+        self.count_objects = count_objects # Counting objects walks the whole heap, so it can be turned off.
+        self.records = []
+        self.origin = time.perf_counter()
+        self.depth = 0
+
+    @contextlib.contextmanager
+    def Measure(self, name:str, **tags):
+        record = { 'name' : name, 'tags' : tags, 'depth' : self.depth }
+        self.records.append(record)
+        objects = len(gc.get_objects()) if self.count_objects else 0
+        rss = PeakRSS()
+        start = time.perf_counter()
+        self.depth += 1
+        try:
+            yield record
+        finally:
+            self.depth -= 1
+            record['start'] = start - self.origin
+            record['seconds'] = time.perf_counter() - start
+            record['peak_rss_delta'] = PeakRSS() - rss
+            if self.count_objects:
+                record['objects_delta'] = len(gc.get_objects()) - objects
+
+    def Totals(self) -> dict:
+        """ Returns the summed up seconds and peak RSS growth of each name. """
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record['name'], { 'calls' : 0, 'seconds' : 0.0, 'peak_rss_delta' : 0 })
+            total['calls'] += 1
+            total['seconds'] += record['seconds']
+            total['peak_rss_delta'] += record['peak_rss_delta']
+        return totals
+
+    def Report(self) -> dict:
+        return { 'totals' : self.Totals(), 'records' : self.records }
+
+    def SaveJson(self, file_name:str):
+        with open(file_name, 'w') as f:
+            json.dump(self.Report(), f, indent=2)
+
+    def SaveChromeTrace(self, file_name:str):
+        """ Saves the records in the Trace Event Format, viewable in chrome://tracing or Perfetto. """
+        events = []
+        for record in self.records:
+            args = dict(record['tags'])
+            args['peak_rss_delta'] = record['peak_rss_delta']
+            if 'objects_delta' in record:
+                args['objects_delta'] = record['objects_delta']
+            events.append({
+                'name' : record['name'],
+                'cat' : 'dawn2dace',
+                'ph' : 'X',
+                'ts' : record['start'] * 1e6,
+                'dur' : record['seconds'] * 1e6,
+                'pid' : os.getpid(),
+                'tid' : 0,
+                'args' : args
+            })
+        with open(file_name, 'w') as f:
+            json.dump({ 'traceEvents' : events, 'displayTimeUnit' : 'ms' }, f)
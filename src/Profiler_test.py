@@ -0,0 +1,45 @@
+import unittest
+import json
+import os
+import tempfile
+from Profiler import *
+
+class Profiler_test(unittest.TestCase):
+    def test_records_nested_measurements(self):
+        profiler = Profiler()
+        with profiler.Measure('outer', stencil=0):
+            with profiler.Measure('inner'):
+                data = [0] * 1000
+        outer, inner = profiler.records
+        self.assertEqual(outer['depth'], 0)
+        self.assertEqual(inner['depth'], 1)
+        self.assertEqual(outer['tags'], { 'stencil' : 0 })
+        self.assertGreaterEqual(outer['seconds'], inner['seconds'])
+        self.assertIn('objects_delta', inner)
+
+    def test_totals(self):
+        profiler = Profiler(count_objects=False)
+        for index in range(3):
+            with profiler.Measure('pass', stencil=index):
+                pass
+        self.assertEqual(profiler.Totals()['pass']['calls'], 3)
+
+    def test_chrome_trace(self):
+        profiler = Profiler(count_objects=False)
+        with profiler.Measure('pass'):
+            pass
+        with tempfile.TemporaryDirectory() as tmp:
+            file_name = os.path.join(tmp, 'trace.json')
+            profiler.SaveChromeTrace(file_name)
+            with open(file_name) as f:
+                events = json.load(f)['traceEvents']
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['ph'], 'X')
+
+    def test_null_profiler(self):
+        with NullProfiler().Measure('pass', stencil=0):
+            pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import argparse
+import hashlib
+import importlib
+import os
+import sys
+
+# Modules whose source determines the translation result.
+TRANSLATOR_MODULES = ['dawn2dace', 'Importer', 'Unparser', 'Exporter', 'Intermediates', 'IdResolver', 'IIR_AST', 'helpers', 'HaloExchange']
+
+DEFAULT_DIRECTORY = os.environ.get('DAWN2DACE_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'dawn2dace'))
+DEFAULT_MAX_BYTES = 1 << 30
+
+
+# Installed modules that shape the translation result: DaCe builds the SDFGs, stencilflow's library nodes are expanded
+# into them in layout and schedule modes, and the protobuf bindings parse the IIR.
+VERSIONED_DEPENDENCIES = ['dace']
+SOURCE_DEPENDENCIES = ['stencilflow', 'IIR_pb2']
+
+
+def SourceFiles(module) -> list:
+    """ The Python files of a module, or of all modules of a package, in a stable order. """
+    if not hasattr(module, '__path__'):
+        return [module.__file__]
+    return sorted(
+        os.path.join(root, f)
+        for folder in module.__path__
+        for root, _, files in os.walk(folder)
+        for f in files if f.endswith('.py')
+    )
+
+
+def DependencyFingerprint(name:str, by_source:bool) -> bytes:
+    """
+    Identifies the installed version of a dependency: by its version number, or by_source by its files,
+    which also changes when it is installed from a repository or regenerated. Empty if it is not installed.
+    """
+    try:
+        module = importlib.import_module(name)
+    except ImportError:
+        return b''
+    if not by_source:
+        return f'{name}=={module.__version__}'.encode()
+    sha = hashlib.sha256(name.encode())
+    for path in SourceFiles(module):
+        with open(path, 'rb') as f:
+            sha.update(f.read())
+    return sha.digest()
+
+
+def TranslatorFingerprint() -> str:
+    """
+    Hash of the translator's source and of its dependencies.
+    Changes whenever one of TRANSLATOR_MODULES is edited, DaCe is upgraded, or stencilflow or the protobuf bindings change.
+    """
+    if not hasattr(TranslatorFingerprint, "value"):
+        folder = os.path.dirname(os.path.abspath(__file__))
+        sha = hashlib.sha256()
+        for name in VERSIONED_DEPENDENCIES:
+            sha.update(DependencyFingerprint(name, by_source=False))
+        for name in SOURCE_DEPENDENCIES:
+            sha.update(DependencyFingerprint(name, by_source=True))
+        for module in TRANSLATOR_MODULES:
+            with open(os.path.join(folder, module + '.py'), 'rb') as f:
+                sha.update(f.read())
+        TranslatorFingerprint.value = sha.hexdigest()
+    return TranslatorFingerprint.value
+
+
+class TranslationCache:
+    """
+    On-disk cache of translated SDFGs, keyed by the serialized StencilInstantiation and the translator version.
+    Least recently used entries are evicted once the cache grows beyond max_bytes.
+    """
+
+    def __init__(self, directory:str = DEFAULT_DIRECTORY, max_bytes:int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def Key(self, iir:bytes, options:str = '') -> str:
+        """ options: The translation options that change the result, e.g. the precision. """
+        sha = hashlib.sha256(TranslatorFingerprint().encode())
+        sha.update(options.encode())
+        sha.update(iir)
+        return sha.hexdigest()
+
+    def Path(self, key:str) -> str:
+        return os.path.join(self.directory, key + '.sdfg')
+
+    def Get(self, key:str) -> str:
+        """ Returns the path of the cached SDFG JSON, or None on a miss. """
+        path = self.Path(key)
+        try:
+            os.utime(path) # Marks the entry as recently used.
+        except FileNotFoundError:
+            return None
+        return path
+
+    def Put(self, key:str, sdfg):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.Path(key)
+        tmp = '{}.{}.tmp'.format(path, os.getpid())
+        sdfg.save(tmp, use_pickle=False)
+        os.replace(tmp, path) # Atomic, so concurrent readers never see partial files.
+        self.Evict()
+
+    def Entries(self) -> list:
+        """ Returns a list of (path, size, last use) of all entries, least recently used first. """
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for name in os.listdir(self.directory):
+            if not name.endswith('.sdfg'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue # Evicted by a concurrent process.
+            entries.append((path, stat.st_size, stat.st_mtime))
+        entries.sort(key = lambda entry: entry[2])
+        return entries
+
+    def Size(self) -> int:
+        return sum(size for _, size, _ in self.Entries())
+
+    def Evict(self):
+        """ Removes least recently used entries until the cache fits into max_bytes. """
+        entries = self.Entries()
+        size = sum(size for _, size, _ in entries)
+        for path, entry_size, _ in entries:
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+    def Clear(self):
+        for path, _, _ in self.Entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspects and clears the dawn2dace translation cache.")
+    parser.add_argument("command", choices=["info", "list", "clear", "evict"])
+    parser.add_argument("--dir", default=DEFAULT_DIRECTORY, help="Cache directory.")
+    parser.add_argument("--max-bytes", type=int, default=DEFAULT_MAX_BYTES, help="Size bound used by 'evict'.")
+    args = parser.parse_args()
+
+    cache = TranslationCache(args.dir, args.max_bytes)
+    if args.command == "info":
+        entries = cache.Entries()
+        print("Directory:   {}".format(cache.directory))
+        print("Fingerprint: {}".format(TranslatorFingerprint()))
+        print("Entries:     {}".format(len(entries)))
+        print("Size:        {} bytes".format(sum(size for _, size, _ in entries)))
+    elif args.command == "list":
+        for path, size, _ in cache.Entries():
+            print("{} {}".format(size, path))
+    elif args.command == "clear":
+        cache.Clear()
+    elif args.command == "evict":
+        cache.Evict()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import unittest
+import os
+import tempfile
+from TranslationCache import *
+
+class FakeSDFG:
+    def __init__(self, size:int):
+        self.size = size
+
+    def save(self, filename, use_pickle=False):
+        with open(filename, 'w') as f:
+            f.write('x' * self.size)
+
+class TranslationCache_test(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = TranslationCache(self.tmp.name, max_bytes=350)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_depends_on_iir(self):
+        self.assertEqual(self.cache.Key(b'abc'), self.cache.Key(b'abc'))
+        self.assertNotEqual(self.cache.Key(b'abc'), self.cache.Key(b'abd'))
+
+    def test_key_depends_on_options(self):
+        self.assertNotEqual(self.cache.Key(b'abc', 'float32'), self.cache.Key(b'abc', 'float64'))
+
+    def test_fingerprints_every_imported_translator_module(self):
+        # Log and Profiler only report on the translation, TranslationCache stores it.
+        folder = os.path.dirname(os.path.abspath(__file__))
+        local = { f[:-3] for f in os.listdir(folder) if f.endswith('.py') } - { 'Log', 'Profiler', 'TranslationCache' }
+        for module in TRANSLATOR_MODULES:
+            with open(os.path.join(folder, module + '.py')) as f:
+                for line in f:
+                    words = line.split()
+                    if words[:1] in (['import'], ['from']) and words[1] in local:
+                        self.assertIn(words[1], TRANSLATOR_MODULES, module)
+
+    def test_fingerprints_the_source_of_dependencies(self):
+        package = os.path.join(self.tmp.name, 'fake_dependency')
+        os.makedirs(package)
+        with open(os.path.join(package, '__init__.py'), 'w') as f:
+            f.write('x = 1\n')
+        sys.path.insert(0, self.tmp.name)
+        try:
+            before = DependencyFingerprint('fake_dependency', by_source=True)
+            with open(os.path.join(package, 'expansion.py'), 'w') as f:
+                f.write('y = 2\n')
+            self.assertNotEqual(before, DependencyFingerprint('fake_dependency', by_source=True))
+        finally:
+            sys.path.remove(self.tmp.name)
+            sys.modules.pop('fake_dependency', None)
+        self.assertEqual(DependencyFingerprint('not_installed_dependency', by_source=True), b'')
+
+    def test_miss(self):
+        self.assertIsNone(self.cache.Get(self.cache.Key(b'abc')))
+
+    def test_hit(self):
+        key = self.cache.Key(b'abc')
+        self.cache.Put(key, FakeSDFG(10))
+        self.assertEqual(self.cache.Get(key), self.cache.Path(key))
+
+    def test_evicts_least_recently_used(self):
+        keys = [self.cache.Key(bytes([x])) for x in range(3)]
+        for time, key in enumerate(keys):
+            self.cache.Put(key, FakeSDFG(100))
+            os.utime(self.cache.Path(key), (time, time))
+        self.assertIsNotNone(self.cache.Get(keys[0])) # Makes keys[1] the least recently used.
+
+        self.cache.Put(self.cache.Key(b'new'), FakeSDFG(100))
+
+        self.assertIsNotNone(self.cache.Get(keys[0]))
+        self.assertIsNone(self.cache.Get(keys[1]))
+        self.assertIsNotNone(self.cache.Get(keys[2]))
+        self.assertLessEqual(self.cache.Size(), 350)
+
+    def test_clear(self):
+        self.cache.Put(self.cache.Key(b'abc'), FakeSDFG(10))
+        self.cache.Clear()
+        self.assertEqual(self.cache.Entries(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,7 @@
 from IdResolver import IdResolver
+from helpers import FormatFloat
 import IIR_pb2
+import numpy
 
 def EscapePythonKeywords(word: str) -> str:
     keywords = {"False", "class", "finally", "is", "return", "None", 
@@ -13,8 +15,10 @@ def EscapePythonKeywords(word: str) -> str:
 
 class Unparser:
     """Unparses IIR's AST into Python."""
-    def __init__(self, id_resolver:IdResolver):
+    def __init__(self, id_resolver:IdResolver, float_type=numpy.float64):
+        """ float_type: The numpy type whose precision floating point literals are written in. """
         self.id_resolver = id_resolver
+        self.float_type = float_type
 
     def _unparse_logical_operator(self, op) -> str:
         return {'&&':'and', '||':'or', '!':'not'}.get(op, op)
@@ -80,16 +84,15 @@ class Unparser:
             return name + str(indices)
         return name
     
-    @staticmethod
-    def _unparse_literal_access_expr(expr) -> str:
+    def _unparse_literal_access_expr(self, expr) -> str:
         if expr.type.type_id == IIR_pb2.SIR_dot_statements__pb2.BuiltinType.Boolean:
             return "True" if expr.value else "False"
         if expr.type.type_id == IIR_pb2.SIR_dot_statements__pb2.BuiltinType.Integer:
             return expr.value
         if expr.type.type_id == IIR_pb2.SIR_dot_statements__pb2.BuiltinType.Float:
-            return '{:f}'.format(float(expr.value))
+            return FormatFloat(float(expr.value), self.float_type)
         if expr.type.type_id == IIR_pb2.SIR_dot_statements__pb2.BuiltinType.Double:
-            return '{:f}'.format(float(expr.value))
+            return FormatFloat(float(expr.value), self.float_type)
         if expr.type.type_id == IIR_pb2.SIR_dot_statements__pb2.BuiltinType.Invalid:
             raise ValueError(expr.type.type_id + " not supported")
         if expr.type.type_id == IIR_pb2.SIR_dot_statements__pb2.BuiltinType.Auto:
@@ -165,3 +168,48 @@ class Unparser:
         if which == "block_stmt":
             return self._unparse_block_stmt(stmt.block_stmt)
         raise ValueError("Unexpected stmt: " + which)
+
+
+class BoundaryUnparser(Unparser):
+    """
+    Unparses the body of a boundary condition functor into Python.
+    The fields are read through 'name_in[offset]' and written through 'name_out[offset]'.
+    """
+    def __init__(self, id_resolver:IdResolver, arguments:dict, float_type=numpy.float64):
+        """ arguments: The ids of the fields, by the functor's argument names. """
+        Unparser.__init__(self, id_resolver, float_type)
+        self.arguments = arguments
+        self.writing = False
+        self.accesses = {} # dict[(name_in or name_out, offset), id]
+
+    def _unparse_assignment_expr(self, expr) -> str:
+        self.writing = True
+        left = self._unparse_expr(expr.left)
+        self.writing = False
+        if expr.op == '=':
+            return "{} = ({})".format(left, self._unparse_expr(expr.right))
+        # Compound assignments, e.g. '+=', read the field before writing it.
+        return "{} = ({}) {} ({})".format(
+            left,
+            self._unparse_expr(expr.left),
+            expr.op[:-1],
+            self._unparse_expr(expr.right)
+        )
+
+    def _unparse_field_access_expr(self, expr) -> str:
+        id = self.arguments[expr.name]
+        name = EscapePythonKeywords(self.id_resolver.GetName(id)) + ('_out' if self.writing else '_in')
+        dims = self.id_resolver.GetDimensions(id)
+
+        indices = []
+        if dims.i:
+            indices.append(expr.cartesian_offset.i_offset)
+        if dims.j:
+            indices.append(expr.cartesian_offset.j_offset)
+        if dims.k:
+            indices.append(expr.vertical_offset)
+
+        self.accesses[(name, tuple(indices))] = id
+        if indices:
+            return name + str(indices)
+        return name
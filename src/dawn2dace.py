@@ -1,49 +1,72 @@
 import dace
 import argparse
 import ast
+import glob
+import itertools
+import logging
+import multiprocessing
+import numpy
 import os
 import pickle
+import shutil
 import sys
+import time
+import traceback
 import astunparse
 import IIR_pb2
 from Intermediates import *
 from Importer import Importer
 from Exporter import Exporter
 from IdResolver import IdResolver
-from Unparser import Unparser
+from Unparser import Unparser, BoundaryUnparser
+from TranslationCache import TranslationCache
+from Profiler import Profiler, NullProfiler
+from HaloExchange import HaloExchange, PeriodicHaloExchange
+from Log import GetLogger, Event
+import Log
 from IIR_AST import *
 
-def UnparseCode(stencils: list, id_resolver:IdResolver):
+log = GetLogger('dawn2dace')
+
+def UnparseCode(stencils: list, id_resolver:IdResolver, float_type=numpy.float64):
+    unparser = Unparser(id_resolver, float_type)
     for stencil in stencils:
+        UnparseBoundaryConditions(stencil.boundary_conditions, id_resolver, float_type)
         for multi_stage in stencil.multi_stages:
             for stage in multi_stage.stages:
                 for do_method in stage.do_methods:
                     for stmt in do_method.statements:
-                        stmt.code = Unparser(id_resolver).unparse_body_stmt(stmt.code)
-                        print(stmt.code)
-
-class ReplaceSubscript(ast.NodeTransformer):
-    " Replaces subscript with name"
+                        code = unparser.unparse_body_stmt(stmt.code)
+                        log.debug('%s', code)
+                        stmt.tree = ast.parse(code)
+                        stmt.code = None
 
-    def __init__(self, repldict):
-        "repldict: Dict[(variable_name, index), new_name]"
-        self.replace = repldict
+def UnparseBoundaryConditions(boundary_conditions: list, id_resolver:IdResolver, float_type=numpy.float64):
+    for bc in boundary_conditions:
+        unparser = BoundaryUnparser(id_resolver, bc.arguments, float_type)
+        bc.code = unparser.unparse_body_stmt(bc.body)
+        bc.accesses = unparser.accesses
+        log.debug('%s', bc.code)
 
-    def visit_Subscript(self, node: ast.Subscript):
-        name = node.value.id
-        if isinstance(node.slice.value, ast.Constant):
-            index = (node.slice.value.value,)
-        elif isinstance(node.slice.value, ast.UnaryOp):
-            index = (-node.slice.value.operand.value,)
-        else:
-            index = tuple((-elt.operand.value if isinstance(elt, ast.UnaryOp) else elt.value) for elt in node.slice.value.elts)
-        key = (name, index)
-        if isinstance(node.value, ast.Name) and (key in self.replace):
-            return ast.copy_location(ast.Name(id=self.replace[key]), node)
-        return self.generic_visit(node)
+def Lifetimes(stencil: Stencil) -> dict:
+    """ Returns the accessors of each id of a stencil: dict[id, list of (MultiStage, DoMethod)]. """
+    ret = {}
+    for multi_stage in stencil.multi_stages:
+        for stage in multi_stage.stages:
+            for do_method in stage.do_methods:
+                for id in do_method.ReadIds() | do_method.WriteIds():
+                    ret.setdefault(id, []).append((multi_stage, do_method))
+    return ret
 
-def AddRegisters(stencils: list, id_resolver):
+def AddRegisters(stencils: list, id_resolver, shared: set = frozenset()):
+    """
+    Loads the accessed memory into registers at the start of each DoMethod and stores them at its end.
+    The registers are named after the field and the DoMethod, so they stay apart when DoMethods are fused.
+    Temporaries that only live within one DoMethod, which writes them before reading, are never stored.
+    shared: The ids accessed by other stencils too, which are always stored.
+    """
     for stencil in stencils:
+        lifetimes = Lifetimes(stencil)
         for multi_stage in stencil.multi_stages:
             for stage in multi_stage.stages:
                 for do_method in stage.do_methods:
@@ -57,43 +80,45 @@ def AddRegisters(stencils: list, id_resolver):
                     # Construct replace dictionary, in-code and out-code
                     replace_dict = {} # Dict[(variable_name, index), new_name]
 
-                    in_code = "" # Reads memory into registers
+                    in_code = [] # Reads memory into registers
                     for id, interval in reads.items():
                         if id_resolver.IsLocal(id):
                             continue
                         name = id_resolver.GetName(id)
-                        for index in interval.range():
-                            reduced_index = id_resolver.DimFilterIndex(id, index)
-                            new_name = f'{name}_{len(replace_dict)}'
-                            replace_dict[(name, reduced_index)] = new_name
-                            in_code += f"{new_name} = {name}_in[{reduced_index}]\n"
+                        indices = [tuple(x) for x in interval.range_array(id_resolver.GetDimensions(id)).tolist()]
+                        new_names = [f'{name}_{do_method.uid}_{n}' for n in range(len(replace_dict), len(replace_dict) + len(indices))]
+                        replace_dict.update(zip(((name, index) for index in indices), new_names))
+                        in_code += [f"{new_name} = {name}_in[{index}]\n" for new_name, index in zip(new_names, indices)]
+
+                    demoted = { id for id in writes
+                        if id_resolver.IsATemporary(id) and (id not in reads) and (len(lifetimes[id]) == 1) and (id not in shared) }
+                    if demoted:
+                        Event('DemoteTemporaries', do_method=str(do_method), storage='register', fields=[id_resolver.GetName(id) for id in demoted])
+                    writes = { id : interval for id, interval in writes.items() if id not in demoted }
 
-                    out_code = "" # Writes registers into memory
+                    out_code = [] # Writes registers into memory
                     for id, interval in writes.items():
                         if id_resolver.IsLocal(id):
                             continue
                         name = id_resolver.GetName(id)
-                        for index in interval.range():
-                            reduced_index = id_resolver.DimFilterIndex(id, index)
-                            if (name, reduced_index) in replace_dict:
-                                new_name = replace_dict[(name, reduced_index)]
-                            else:
-                                new_name = f'{name}_{len(replace_dict)}'
-                                replace_dict[(name, reduced_index)] = new_name
-                            out_code += f"{name}_out[{reduced_index}] = {new_name}\n"
-
-                    in_stmt = Statement(in_code, line=0, reads=reads, writes={})
-                    out_stmt = Statement(out_code, line=0, reads={}, writes=writes)
+                        for index in interval.range_array(id_resolver.GetDimensions(id)).tolist():
+                            index = tuple(index)
+                            new_name = replace_dict.setdefault((name, index), f'{name}_{do_method.uid}_{len(replace_dict)}')
+                            out_code.append(f"{name}_out[{index}] = {new_name}\n")
+                    in_code = ''.join(in_code)
+                    out_code = ''.join(out_code)
+
+                    in_stmt = Statement(None, line=0, reads=reads, writes={}, tree=ast.parse(in_code))
+                    out_stmt = Statement(None, line=0, reads={}, writes=writes, tree=ast.parse(out_code))
 
                     # Transform Statements
                     for stmt in do_method.statements:
-                        tree = ast.parse(stmt.code)
-                        stmt.code = astunparse.unparse(ReplaceSubscript(replace_dict).visit(tree))
+                        stmt.Transform(ReplaceSubscript(replace_dict))
                         stmt.reads = {}
                         stmt.writes = {}
                     
-                    do_method.statements.insert(0, in_stmt)
-                    do_method.statements.append(out_stmt)
+                    do_method.statements = [in_stmt] + do_method.statements + [out_stmt]
+                    Event('AddRegisters', do_method=str(do_method), registers=len(replace_dict))
 
 
 def SplitMultiStages(stencils: list):
@@ -108,22 +133,186 @@ def SplitMultiStages(stencils: list):
                 key = lambda interval: FullEval(interval.lower, 'K', 1000),
                 reverse = (multi_stage.execution_order == ExecutionOrder.Backward_Loop.value)
             )
+            # The parts share the dict of caches, so a cache given to one part belongs to all of them.
             for interval in intervals:
                 new_stages = []
                 for stage in multi_stage.stages:
                     new_stages.append(Stage([dm for dm in stage.do_methods if dm.k_interval == interval], stage.extents))
-                new_ms.append(MultiStage(multi_stage.execution_order, new_stages))
+                new_ms.append(MultiStage(multi_stage.execution_order, new_stages, multi_stage.caches))
+            Event('SplitMultiStages', multi_stage=str(multi_stage), intervals=[str(x) for x in intervals])
         stencil.multi_stages = new_ms
 
 
-def AddMsMemlets(stencils: list, id_resolver):
+def IsCenter(node: ast.Subscript) -> bool:
+    """ Returns if a subscript like 'a_in[(0, 0, 0)]' accesses the center. """
+    index = ast.literal_eval(SubscriptIndex(node))
+    return not any(index if isinstance(index, tuple) else (index,))
+
+class CarryLoads(ast.NodeTransformer):
+    " Replaces loads of fields at the center with variables. "
+
+    def __init__(self, carriers:dict):
+        "carriers: Dict[input connector, variable name]"
+        self.carriers = carriers
+
+    def visit_Subscript(self, node: ast.Subscript):
+        if isinstance(node.value, ast.Name) and (node.value.id in self.carriers) and IsCenter(node):
+            return ast.copy_location(ast.Name(id=self.carriers[node.value.id], ctx=ast.Load()), node)
+        return self.generic_visit(node)
+
+class CarryStores(ast.NodeTransformer):
+    " Copies the registers stored to fields at the center into variables, and drops the stores to dead fields. "
+
+    def __init__(self, carriers:dict, dead:set):
+        "carriers: Dict[output connector, variable name], dead: Set[output connector]"
+        self.carriers = carriers
+        self.dead = dead
+
+    def visit_Assign(self, node: ast.Assign):
+        target = node.targets[0]
+        if not (isinstance(target, ast.Subscript) and isinstance(target.value, ast.Name) and IsCenter(target)):
+            return node
+        name = target.value.id
+        ret = [] if name in self.dead else [node]
+        if name in self.carriers:
+            ret.append(ast.copy_location(ast.Assign(targets=[ast.Name(id=self.carriers[name], ctx=ast.Store())], value=node.value), node))
+        return ret
+
+def Reach(extents: list) -> ClosedInterval3D:
+    """ Returns the extents reaching as far in each direction as any of the given ones. """
+    return ClosedInterval3D(*map(max, zip(*(e.to_6_tuple() for e in extents))))
+
+def IsGrowable(do_method: DoMethod, id_resolver) -> bool:
+    """
+    Returns if a DoMethod can be computed over larger extents than its stage's, because nothing reads the extra points.
+    It may only write temporaries, which Dawn computes just as far as they are read,
+    and read at the horizontal center, which keeps the reads within the larger extents.
+    """
+    center = ClosedInterval(0, 0)
+    return all(id_resolver.IsATemporary(id) for id in do_method.WriteIds()) \
+        and all(acc.i == center and acc.j == center for acc in do_method.Reads().values())
+
+def IsFusable(group: list, stage: Stage, do_method: DoMethod, id_resolver) -> bool:
+    """
+    Returns if a stage's DoMethod can join a group of (Stage, DoMethod) computing the same levels point by point.
+    The group is computed over the reach of all its stages' extents, so the DoMethods of smaller stages have to be growable.
+    It has to read the group's outputs at the center only, and must not overwrite the group's inputs.
+    """
+    if do_method.k_interval != group[0][1].k_interval:
+        return False
+    members = group + [(stage, do_method)]
+    if any(s.extents.k != stage.extents.k for s, _ in group):
+        return False
+    extents = Reach([s.extents for s, _ in members])
+    if any((s.extents != extents) and not IsGrowable(dm, id_resolver) for s, dm in members):
+        return False
+    written = set().union(*(dm.WriteIds() for _, dm in group))
+    read = set().union(*(dm.ReadIds() for _, dm in group))
+    center = ClosedInterval3D(0, 0, 0, 0, 0, 0)
+    if any(do_method.Reads()[id] != center for id in do_method.ReadIds() & written):
+        return False
+    return not (do_method.WriteIds() & read)
+
+def FuseGroup(group: list, lifetimes: dict, id_resolver, shared: set = frozenset()) -> Stage:
+    """
+    Fuses a group of (Stage, DoMethod) into a Stage with one DoMethod, over the reach of the stages' extents.
+    Fields a DoMethod reads from the preceding ones are passed on in variables instead of memory,
+    and temporaries that only live within the group are not stored at all.
+    shared: The ids accessed by other stencils too, which are always stored.
+    """
+    uids = { dm.uid for _, dm in group }
+    carried = set()
+    written = set()
+    for _, dm in group:
+        carried |= dm.ReadIds() & written
+        written |= dm.WriteIds()
+    exposed = set().union(*(dm.ReadIds() - carried for _, dm in group))
+    dead = { id for id in written
+        if id_resolver.IsATemporary(id) and (id not in exposed) and (id not in shared) and all(dm.uid in uids for _, dm in lifetimes[id]) }
+
+    names = { id : id_resolver.GetName(id) for id in carried | dead }
+    loads = CarryLoads({ f'{names[id]}_in' : f'{names[id]}_fused' for id in carried })
+    stores = CarryStores({ f'{names[id]}_out' : f'{names[id]}_fused' for id in carried }, { f'{names[id]}_out' for id in dead })
+
+    statements = []
+    for _, dm in group:
+        for stmt in dm.statements:
+            if stmt.ReadIds() & carried:
+                stmt.Transform(loads)
+                stmt.reads = { id : acc for id, acc in stmt.reads.items() if id not in carried }
+            if stmt.WriteIds() & (carried | dead):
+                stmt.Transform(stores)
+                stmt.writes = { id : acc for id, acc in stmt.writes.items() if id not in dead }
+        statements += dm.statements
+
+    extents = Reach([stage.extents for stage, _ in group])
+    Event('FuseStages', do_methods=[str(dm) for _, dm in group],
+        carried=sorted(names[id] for id in carried), dropped=sorted(names[id] for id in dead),
+        grown=[str(dm) for stage, dm in group if stage.extents != extents])
+    return Stage([DoMethod(group[0][1].k_interval, statements)], extents)
+
+def FuseStages(stencils: list, id_resolver, shared: set = frozenset()):
+    """
+    Fuses consecutive DoMethods of each multi-stage, so they are exported as one stencil.
+    shared: The ids accessed by other stencils too, which are always stored.
+    """
+    for stencil in stencils:
+        lifetimes = Lifetimes(stencil)
+        for multi_stage in stencil.multi_stages:
+            groups = [] # List of lists of (Stage, DoMethod)
+            for stage in multi_stage.stages:
+                for do_method in stage.do_methods:
+                    if groups and IsFusable(groups[-1], stage, do_method, id_resolver):
+                        groups[-1].append((stage, do_method))
+                    else:
+                        groups.append([(stage, do_method)])
+            if any(len(group) > 1 for group in groups):
+                multi_stage.stages = [
+                    FuseGroup(group, lifetimes, id_resolver, shared) if len(group) > 1 else Stage([group[0][1]], group[0][0].extents)
+                    for group in groups
+                ]
+
+def AreDisjoint(intervals) -> bool:
+    """ Returns if the k-intervals do not overlap. """
+    bounds = sorted((FullEval(x.lower, 'K', 1000), FullEval(x.upper, 'K', 1000)) for x in intervals)
+    return all(upper <= lower for (_, upper), (lower, _) in zip(bounds, bounds[1:]))
+
+def DemoteTemporaries(stencils: list, id_resolver, shared: set = frozenset()):
+    """
+    Gives temporaries that only live within one multi-stage, or the parts of one split multi-stage, a local cache,
+    which the Exporter lowers to an IJ-plane per k-level, or a ring of values per column in k-loops.
+    The parts have to access the temporary in disjoint k-intervals, so each level is computed before it is read.
+    shared: The ids accessed by other stencils too, which stay in memory.
+    """
+    for stencil in stencils:
+        for id, accessors in Lifetimes(stencil).items():
+            if not (id_resolver.IsATemporary(id) and id_resolver.GetDimensions(id).k) or (id in shared):
+                continue
+            multi_stage = accessors[0][0]
+            if any(ms.caches is not multi_stage.caches for ms, _ in accessors) or (id in multi_stage.caches):
+                continue
+            if not AreDisjoint({ dm.k_interval for _, dm in accessors }):
+                continue
+
+            window = Hull([ms.KWindow(id) for ms, _ in accessors])
+            if multi_stage.execution_order == ExecutionOrder.Parallel.value:
+                if window != ClosedInterval(0, 0):
+                    continue # Other levels are computed by other iterations of the k-map.
+                type = CacheType.IJ
+            else:
+                type = CacheType.K
+            multi_stage.caches[id] = Cache(id, type.value, CachePolicy.Local.value, window)
+            Event('DemoteTemporaries', multi_stage=str(multi_stage), storage=type.name, field=id_resolver.GetName(id), window=str(window))
+
+def AddMsMemlets(stencils: list, id_resolver, k_maps: bool = True):
     """
     For every parallel multi-stage we introduce a k-map.
     Thus the k-accesses need to be offsetted.
+    k_maps: False if parallel multi-stages are exported as 3D iteration spaces, which have no k-map.
     """
     for stencil in stencils:
         for multi_stage in stencil.multi_stages:
-            if multi_stage.execution_order == ExecutionOrder.Parallel.value:
+            if k_maps and multi_stage.execution_order == ExecutionOrder.Parallel.value:
                 # defines the slices of memory that will be mapped inside this multistage's scope.
                 multi_stage.read_memlets = copy.deepcopy(multi_stage.Reads())
                 multi_stage.write_memlets = copy.deepcopy(multi_stage.Writes())
@@ -154,9 +343,44 @@ def AddDoMethodMemlets(stencils: list, id_resolver):
                         k_write_offsets = { id: -acc.k.lower for id, acc in do_method.write_memlets.items() if id in stmt.WriteIds() }
                         stmt.OffsetWrites(k_write_offsets, id_resolver)
 
-def IIR_str_to_SDFG(iir: str):
-    stencilInstantiation = IIR_pb2.StencilInstantiation()
-    stencilInstantiation.ParseFromString(iir)
+def TranslationOptions(precision: Precision = None, dimensions: Dimensions = None, layout: str = None, schedule: Schedule = None,
+    halo_exchange: HaloExchange = None) -> str:
+    """ Returns the options that change the translation result, to key the translation cache with. """
+    options = str(precision or Precision()) + ';' + str(schedule or Schedule())
+    if halo_exchange is not None:
+        options += ';' + str(halo_exchange)
+    if dimensions is not None:
+        options += ';' + dimensions.Signature()
+    if layout is not None:
+        options += ';layout=' + layout
+    return options
+
+def IIR_str_to_SDFG(iir: str, cache: TranslationCache = None, profiler: Profiler = None, precision: Precision = None,
+    dimensions: Dimensions = None, layout: str = None, schedule: Schedule = None, halo_exchange: HaloExchange = None):
+    """
+    cache: Returns the cached SDFG if this IIR was translated before.
+    profiler: Measures each pass, per stencil and multi-stage.
+    precision: The floating point types of the fields and literals. Defaults to float64.
+    dimensions: Specializes the SDFG for these sizes, strides and halo. The SDFG then takes no size arguments.
+    layout: Orders the maps like this memory layout, e.g. 'kji'. The stencils are expanded for that.
+    schedule: The iteration spaces of the multi-stages, tile sizes and map schedule. Defaults to k-maps and k-loops.
+    halo_exchange: Updates the halos on its sides before each boundary condition, which then updates the others.
+    """
+    if precision is None:
+        precision = Precision()
+    if schedule is None:
+        schedule = Schedule()
+    if cache is not None:
+        key = cache.Key(iir, TranslationOptions(precision, dimensions, layout, schedule, halo_exchange))
+        path = cache.Get(key)
+        if path is not None:
+            return dace.SDFG.from_file(path)
+    if profiler is None:
+        profiler = NullProfiler()
+
+    with profiler.Measure('ParseFromString'):
+        stencilInstantiation = IIR_pb2.StencilInstantiation()
+        stencilInstantiation.ParseFromString(iir)
 
     metadata = stencilInstantiation.metadata
     id_resolver = IdResolver(
@@ -167,29 +391,215 @@ def IIR_str_to_SDFG(iir: str):
         metadata.fieldIDtoDimensions
         )
 
+    exp = Exporter(id_resolver, name=metadata.stencilName, profiler=profiler, precision=precision, layout=layout, schedule=schedule,
+        halo_exchange=halo_exchange)
+    with profiler.Measure('Export_Fields'):
+        exp.Export_ApiFields(metadata.APIFieldIDs)
+        exp.Export_TemporaryFields(metadata.temporaryFieldIDs)    
+        exp.Export_Globals({ id : stencilInstantiation.internalIR.globalVariableToValue[id_resolver.GetName(id)].value for id in metadata.globalVariableIDs })
+
+    passes = [
+        ('UnparseCode', lambda s: UnparseCode(s, id_resolver, precision.default)),
+        ('AddRegisters', lambda s: AddRegisters(s, id_resolver, shared)),
+        ('SplitMultiStages', lambda s: SplitMultiStages(s)),
+        ('FuseStages', lambda s: FuseStages(s, id_resolver, shared)),
+        ('DemoteTemporaries', lambda s: DemoteTemporaries(s, id_resolver, shared)),
+        ('AddMsMemlets', lambda s: AddMsMemlets(s, id_resolver, schedule.iteration_space == 'kmap')),
+        ('AddDoMethodMemlets', lambda s: AddDoMethodMemlets(s, id_resolver)),
+    ]
+
+    # Each stencil goes through all passes and is exported before the next one is imported,
+    # so only one stencil's intermediates are alive at a time.
     imp = Importer(id_resolver)
-    stencils = imp.Import_Stencils(stencilInstantiation.internalIR.stencils)
-
-    UnparseCode(stencils, id_resolver)
-    AddRegisters(stencils, id_resolver)
-    SplitMultiStages(stencils)
-    AddMsMemlets(stencils, id_resolver)
-    AddDoMethodMemlets(stencils, id_resolver)
-    
-    exp = Exporter(id_resolver, name=metadata.stencilName)
-    exp.Export_ApiFields(metadata.APIFieldIDs)
-    exp.Export_TemporaryFields(metadata.temporaryFieldIDs)    
-    exp.Export_Globals({ id : stencilInstantiation.internalIR.globalVariableToValue[id_resolver.GetName(id)].value for id in metadata.globalVariableIDs })
-    exp.Export_Stencils(stencils)
-
-    exp.sdfg.fill_scope_connectors()
+    with profiler.Measure('Import_SharedIds'):
+        shared = imp.Import_SharedIds(stencilInstantiation.internalIR.stencils)
+    with profiler.Measure('Import_BoundaryConditions'):
+        boundary_conditions = imp.Import_BoundaryConditions(stencilInstantiation.internalIR, metadata)
+    stencils = imp.Iter_Stencils(stencilInstantiation.internalIR.stencils, boundary_conditions)
+    for index in itertools.count():
+        with profiler.Measure('Import_Stencil', stencil=index):
+            stencil = next(stencils, None)
+        if stencil is None:
+            break
+        for name, run in passes:
+            with profiler.Measure(name, stencil=index):
+                run([stencil])
+        exp.Export_Stencil(stencil, index)
+        del stencil
+
+    # Boundary conditions after the last stencil call.
+    UnparseBoundaryConditions(boundary_conditions.get(None, []), id_resolver, precision.default)
+    exp.Export_BoundaryConditions(boundary_conditions.get(None, []))
+
+    exp.RemoveUnusedTransients()
+    if dimensions is not None:
+        exp.Specialize(dimensions)
+
+    with profiler.Measure('fill_scope_connectors'):
+        exp.sdfg.fill_scope_connectors()
+
+    if layout is not None:
+        with profiler.Measure('ApplyLayout'):
+            exp.ApplyLayout()
+    if schedule.NeedsExpansion():
+        with profiler.Measure('ApplySchedule'):
+            exp.ApplySchedule()
+
+    if cache is not None:
+        cache.Put(key, exp.sdfg)
     return exp.sdfg
 
-def IIR_file_to_SDFG_file(iir_file: str, sdfg_file: str):
-    with open(iir_file) as f:
+def IIR_file_to_SDFG_file(iir_file: str, sdfg_file: str, cache: TranslationCache = None, precision: Precision = None,
+    dimensions: Dimensions = None, layout: str = None, schedule: Schedule = None, halo_exchange: HaloExchange = None):
+    with open(iir_file, "rb") as f:
         iir = f.read()
 
-    sdfg = IIR_str_to_SDFG(iir)
+    if cache is not None:
+        path = cache.Get(cache.Key(iir, TranslationOptions(precision, dimensions, layout, schedule, halo_exchange)))
+        if path is not None:
+            shutil.copyfile(path, sdfg_file)
+            return
+
+    sdfg = IIR_str_to_SDFG(iir, cache, precision=precision, dimensions=dimensions, layout=layout, schedule=schedule, halo_exchange=halo_exchange)
 
     sdfg.save(sdfg_file, use_pickle=False)
-   
+
+
+class TranslationReport:
+    """ Outcome of translating one IIR file in a batch. """
+
+    def __init__(self, iir_file:str, sdfg_file:str, seconds:float, error:str=None):
+        self.iir_file = iir_file
+        self.sdfg_file = sdfg_file
+        self.seconds = seconds
+        self.error = error # Formatted traceback if the translation failed.
+
+    def __str__(self):
+        if self.Succeeded():
+            return "{} -> {} ({:.2f}s)".format(self.iir_file, self.sdfg_file, self.seconds)
+        return "{} FAILED ({:.2f}s)\n{}".format(self.iir_file, self.seconds, self.error)
+
+    def Succeeded(self) -> bool:
+        return self.error is None
+
+
+def CollectIIRFiles(paths) -> list:
+    """ Expands directories and glob patterns into a sorted list of .iir files. """
+    files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            files.update(glob.glob(os.path.join(path, "*.iir")))
+        else:
+            files.update(glob.glob(path))
+    return sorted(files)
+
+
+def _TranslateWorker(job) -> TranslationReport:
+    """ Translates one serialized StencilInstantiation inside a pool worker. """
+    iir_file, iir, sdfg_file, cache, profile, precision, dimensions, layout, schedule, halo_exchange = job
+    start = time.perf_counter()
+    try:
+        path = cache.Get(cache.Key(iir, TranslationOptions(precision, dimensions, layout, schedule, halo_exchange))) if cache is not None else None
+        if path is not None:
+            shutil.copyfile(path, sdfg_file)
+        else:
+            profiler = Profiler() if profile else None
+            sdfg = IIR_str_to_SDFG(iir, cache, profiler, precision, dimensions, layout, schedule, halo_exchange)
+            sdfg.save(sdfg_file, use_pickle=False)
+            if profiler is not None:
+                base = os.path.splitext(sdfg_file)[0]
+                profiler.SaveJson(base + ".profile.json")
+                profiler.SaveChromeTrace(base + ".trace.json")
+    except Exception:
+        return TranslationReport(iir_file, sdfg_file, time.perf_counter() - start, traceback.format_exc())
+    return TranslationReport(iir_file, sdfg_file, time.perf_counter() - start)
+
+
+def IIR_files_to_SDFG_files(iir_files: list, output_dir: str = None, processes: int = None, cache: TranslationCache = None, profile: bool = False,
+    precision: Precision = None, dimensions: Dimensions = None, layout: str = None, schedule: Schedule = None,
+    halo_exchange: HaloExchange = None) -> list:
+    """
+    Translates many IIR files in parallel, one StencilInstantiation per worker task.
+    A failing file is reported instead of aborting the batch.
+    output_dir: Where to put the SDFGs. Defaults to next to each IIR file.
+    processes: Size of the process pool. Defaults to the number of cores.
+    cache: Files whose translation is cached are copied instead of translated.
+    profile: Saves a JSON report and a Chrome trace of the passes next to each translated SDFG.
+    precision: The floating point types of the fields and literals. Defaults to float64.
+    dimensions: Specializes the SDFGs for these sizes, strides and halo.
+    layout: Orders the maps like this memory layout.
+    schedule: The iteration spaces of parallel multi-stages, tile sizes and map schedule.
+    halo_exchange: Updates the halos on its sides before each boundary condition.
+    Returns a list of TranslationReport, in the order of iir_files.
+    """
+    if precision is None:
+        precision = Precision()
+    jobs = []
+    for iir_file in iir_files:
+        sdfg_file = os.path.splitext(iir_file)[0] + ".sdfg"
+        if output_dir is not None:
+            sdfg_file = os.path.join(output_dir, os.path.basename(sdfg_file))
+        with open(iir_file, "rb") as f:
+            jobs.append((iir_file, f.read(), sdfg_file, cache, profile, precision, dimensions, layout, schedule, halo_exchange))
+
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    # One task per worker life keeps dace's global state from leaking between stencils.
+    with multiprocessing.Pool(processes, initializer=Log.Configure, initargs=Log.Configuration(), maxtasksperchild=1) as pool:
+        return pool.map(_TranslateWorker, jobs, chunksize=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Translates Dawn IIR files into SDFGs.")
+    parser.add_argument("paths", nargs="+", help="IIR files, directories or glob patterns.")
+    parser.add_argument("-o", "--output-dir", default=None, help="Directory for the SDFGs. Defaults to next to each IIR file.")
+    parser.add_argument("-j", "--processes", type=int, default=None, help="Number of worker processes. Defaults to the number of cores.")
+    parser.add_argument("--cache", nargs="?", const=TranslationCache().directory, default=None, metavar="DIR",
+        help="Reuse SDFGs of unchanged IIR files from a translation cache. See TranslationCache.py to inspect or clear it.")
+    parser.add_argument("--profile", action="store_true", help="Save <name>.profile.json and <name>.trace.json next to each SDFG.")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="Log what the passes do. Repeat for debug output.")
+    parser.add_argument("--events", default=None, metavar="FILE", help="Append a JSON line per pass event to FILE.")
+    parser.add_argument("--precision", default="float64", choices=["float32", "float64"], help="Floating point type of the fields and literals.")
+    parser.add_argument("--field-precision", action="append", default=[], metavar="NAME=TYPE",
+        help="Overrides the floating point type of one field, e.g. 'acc=float64'. Can be repeated.")
+    parser.add_argument("--specialize", default=None, metavar="I,J,K", help="Bake this domain size into the SDFGs as constants.")
+    parser.add_argument("--memory-sizes", default=None, metavar="I,J,K", help="Padded sizes of the specialized fields. Defaults to I,J,K+1.")
+    parser.add_argument("--layout", default=None,
+        help="Memory layout of the fields in C-array notation, e.g. 'kji'. Expands the stencils and orders the maps like it.")
+    parser.add_argument("--halo", type=int, default=0, help="Halo of the specialized domain.")
+    parser.add_argument("--iteration-space", default="kmap", choices=Schedule.ITERATION_SPACES,
+        help="'kmap': A k-map around IJ-plane stencils per parallel multi-stage. '3d': One I x J x K stencil per DoMethod.")
+    parser.add_argument("--tile", action="append", default=[], metavar="DIM=SIZE", help="Tile size of a dimension, e.g. 'i=32'. Can be repeated.")
+    parser.add_argument("--map-schedule", default="Default", help="dace.ScheduleType of the outermost maps, e.g. 'CPU_Multicore'.")
+    parser.add_argument("--vertical", default="loop", choices=Schedule.VERTICALS,
+        help="'loop': A k-loop around IJ-plane stencils per forward and backward multi-stage. 'column': An IJ-map around a k-loop per column.")
+    parser.add_argument("--periodic", default=None, metavar="DIMS",
+        help="Exchange the halos along these dimensions, e.g. 'ij', periodically instead of applying the boundary conditions.")
+    args = parser.parse_args()
+
+    Log.Configure([logging.WARNING, logging.INFO, logging.DEBUG][min(args.verbose, 2)], args.events)
+
+    cache = TranslationCache(args.cache) if args.cache is not None else None
+    iir_files = CollectIIRFiles(args.paths)
+    start = time.perf_counter()
+    precision = Precision(args.precision, dict(x.split('=') for x in args.field_precision))
+    dimensions = None
+    if args.specialize is not None:
+        I, J, K = (int(x) for x in args.specialize.split(','))
+        memory_sizes = [int(x) for x in args.memory_sizes.split(',')] if args.memory_sizes else [I, J, K + 1]
+        dimensions = Dimensions([I, J, K], memory_sizes, args.layout or 'ijk', args.halo)
+    schedule = Schedule(args.iteration_space, dict(x.split('=') for x in args.tile), args.map_schedule, args.vertical)
+    halo_exchange = PeriodicHaloExchange(args.periodic) if args.periodic else None
+    reports = IIR_files_to_SDFG_files(iir_files, args.output_dir, args.processes, cache, args.profile, precision, dimensions, args.layout, schedule,
+        halo_exchange)
+    for report in reports:
+        print(report)
+
+    failed = [r for r in reports if not r.Succeeded()]
+    print("Translated {} of {} files in {:.2f}s.".format(len(reports) - len(failed), len(reports), time.perf_counter() - start))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
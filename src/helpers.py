@@ -1,21 +1,39 @@
 import copy
 import numpy
+import weakref
 from functools import reduce
 from operator import mul
 
+
 class Any3D:
-    "Holds 3 objects in members i,j,k."
+    """
+    Holds 3 objects in members i,j,k. It is immutable, so it can be a key of dicts and sets.
+    Its members should be immutable too.
+    """
+    __slots__ = ('i', 'j', 'k')
 
     def __init__(self, i, j, k):
-        self.i = i
-        self.j = j
-        self.k = k
+        object.__setattr__(self, 'i', i)
+        object.__setattr__(self, 'j', j)
+        object.__setattr__(self, 'k', k)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("{} is immutable".format(type(self).__name__))
+
+    def __reduce__(self):
+        return (type(self), self.to_tuple())
 
     def __iter__(self):
         return (x for x in [self.i, self.j, self.k])
 
     def __hash__(self):
-        return hash(self.__iter__())
+        return hash(self.to_tuple())
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def __eq__(self, o) -> bool:
         return (self.i == o.i) and (self.j == o.j) and (self.k == o.k)
@@ -32,6 +50,7 @@ class Any3D:
 
 class Bool3D(Any3D):
     "Holds 3 bools in members i,j,k."
+    __slots__ = ()
 
     def __init__(self, i:bool, j:bool, k:bool):
         Any3D.__init__(self, i, j, k)
@@ -42,20 +61,22 @@ class Bool3D(Any3D):
         bools = [x for x in bools if x is not None]
         if len(bools) == 0:
             return None
-        ret = Bool3D(False, False, False)
-        for x in bools:
-            ret.i |= x.i
-            ret.j |= x.j
-            ret.k |= x.k
-        return ret
+        return Bool3D(any(x.i for x in bools), any(x.j for x in bools), any(x.k for x in bools))
 
 
 class HalfOpenInterval:
-    """ An interval that does not includ its upper boundary [lower, upper). """
+    """ An immutable interval that does not includ its upper boundary [lower, upper). """
+    __slots__ = ('lower', 'upper')
 
     def __init__(self, lower, upper):
-        self.lower = lower
-        self.upper = upper
+        object.__setattr__(self, 'lower', lower)
+        object.__setattr__(self, 'upper', upper)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("HalfOpenInterval is immutable")
+
+    def __reduce__(self):
+        return (HalfOpenInterval, (self.lower, self.upper))
 
     def __str__(self) -> str:
         return "{}:{}".format(self.lower, self.upper)
@@ -73,13 +94,18 @@ class HalfOpenInterval:
         return HalfOpenInterval(self.lower - o, self.upper - o)
 
     def __hash__(self):
-        return hash(self.__dict__.values())
+        return hash((self.lower, self.upper))
 
-    def offset(self, offset:int):
-        self.lower += offset
-        self.upper += offset
+    def __copy__(self):
         return self
 
+    def __deepcopy__(self, memo):
+        return self
+
+    def offset(self, offset:int):
+        """ Returns the interval moved by offset. """
+        return HalfOpenInterval(self.lower + offset, self.upper + offset)
+
     def to_closed_interval(self):
         return ClosedInterval(self.lower, self.upper - 1)
 
@@ -88,11 +114,18 @@ class HalfOpenInterval:
 
 
 class ClosedInterval:
-    """ An interval that includes its boundaries [lower, upper]. """
+    """ An immutable interval that includes its boundaries [lower, upper]. """
+    __slots__ = ('lower', 'upper')
 
     def __init__(self, lower, upper):
-        self.lower = lower
-        self.upper = upper
+        object.__setattr__(self, 'lower', lower)
+        object.__setattr__(self, 'upper', upper)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ClosedInterval is immutable")
+
+    def __reduce__(self):
+        return (ClosedInterval, (self.lower, self.upper))
 
     def __str__(self) -> str:
         return "{}..{}".format(self.lower, self.upper)
@@ -110,7 +143,13 @@ class ClosedInterval:
         return ClosedInterval(self.lower - o.lower, self.upper - o.upper)
 
     def __hash__(self):
-        return hash(self.__dict__.values())
+        return hash((self.lower, self.upper))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def contains(self, o):
         if isinstance(o, ClosedInterval):
@@ -119,17 +158,18 @@ class ClosedInterval:
             return self.lower <= o <= self.upper
 
     def exclude(self, o):
+        """ Returns the interval without the part it shares with o at one of its ends. """
         assert not o.contains(self)
         
         if self.contains(o.lower):
-            self.upper = o.lower - 1
+            return ClosedInterval(self.lower, o.lower - 1)
         elif self.contains(o.upper):
-            self.lower = o.upper + 1
+            return ClosedInterval(o.upper + 1, self.upper)
+        return self
 
     def offset(self, offset:int):
-        self.lower += offset
-        self.upper += offset
-        return self
+        """ Returns the interval moved by offset. """
+        return ClosedInterval(self.lower + offset, self.upper + offset)
 
     def to_halfopen_interval(self):
         return HalfOpenInterval(self.lower, self.upper + 1)
@@ -148,6 +188,8 @@ def HalfOpenIntervalStr(interval) -> str:
 
 
 class ClosedInterval3D(Any3D):
+    __slots__ = ()
+
     def __init__(self, *args):
         """
         Requires input of 'i_lower, i_upper, j_lower, j_upper, k_lower, k_upper'
@@ -178,19 +220,13 @@ class ClosedInterval3D(Any3D):
         return self.i.contains(o.i) and self.j.contains(o.j) and self.k.contains(o.k)
 
     def exclude(self, o):
+        """ Returns the interval without the parts it shares with o, in each dimension they differ in. """
         assert self != o
-        if self.i != o.i:
-            self.i.exclude(o.i)
-        if self.j != o.j:
-            self.j.exclude(o.j)
-        if self.k != o.k:
-            self.k.exclude(o.k)
+        return ClosedInterval3D(*(a.exclude(b) if a != b else a for a, b in zip(self, o)))
 
     def offset(self, i: int = 0, j: int = 0, k: int = 0):
-        self.i.offset(i)
-        self.j.offset(j)
-        self.k.offset(k)
-        return self
+        """ Returns the interval moved by the offsets. """
+        return ClosedInterval3D(self.i.offset(i), self.j.offset(j), self.k.offset(k))
 
     def to_6_tuple(self) -> tuple:
         return (str(self.i.lower), str(self.i.upper), str(self.j.lower), str(self.j.upper), str(self.k.lower), str(self.k.upper))
@@ -201,6 +237,22 @@ class ClosedInterval3D(Any3D):
                 for k in self.k.range():
                     yield i,j,k
 
+    def range_array(self, dims:Bool3D = None) -> numpy.ndarray:
+        """
+        Returns the points of range() as rows of an integer array, in the same order.
+        dims: If given, the points are projected onto the present dimensions and duplicates are removed.
+        """
+        lower = (self.i.lower, self.j.lower, self.k.lower)
+        shape = (self.i.upper - self.i.lower + 1, self.j.upper - self.j.lower + 1, self.k.upper - self.k.lower + 1)
+        points = numpy.indices(shape).reshape(3, -1).T + lower
+        if dims is None:
+            return points
+        points = points[:, list(dims.to_tuple())]
+        if points.shape[1] == 0:
+            return points[:1] # All points project onto the same 0-dimensional point.
+        # The projection of a lexicographically ordered range is lexicographically ordered, as is numpy.unique.
+        return numpy.unique(points, axis=0)
+
     def IsSingleton(self):
         return self.i.IsSingleton() and self.j.IsSingleton() and self.k.IsSingleton()
 
@@ -221,103 +273,168 @@ def Hull(intervals):
         )
 
 
+def _MergeTerms(a:tuple, b:tuple, sign:int) -> tuple:
+    """ Returns the canonical terms of a + sign * b. """
+    if not b:
+        return a
+    coefficients = dict(a)
+    for symbol, coefficient in b:
+        coefficients[symbol] = coefficients.get(symbol, 0) + sign * coefficient
+    return tuple(sorted((s, c) for s, c in coefficients.items() if c != 0))
+
+
 class SymbolicSum:
-    def __init__(self, symbols:list=[], positive:list=None, integer:int=0):
+    """
+    An immutable sum of symbols with integer coefficients plus an integer, e.g. 'K-halo+1'.
+    The terms are sorted by symbol and like terms are merged, so equal sums have equal terms.
+    Sums are interned, so building an already existing sum returns the existing object.
+    """
+    __slots__ = ('terms', 'integer', '_hash', '__weakref__')
+    _interned = weakref.WeakValueDictionary()
+
+    def __new__(cls, symbols:list=(), positive:list=None, integer:int=0):
         if positive is None:
             positive = [True for _ in symbols]
-        self.symbols = symbols
-        self.positive = positive
-        self.integer = integer
+        terms = _MergeTerms((), tuple((str(s), 1 if p else -1) for s, p in zip(symbols, positive)), 1)
+        return cls._Make(terms, integer)
+
+    @classmethod
+    def _Make(cls, terms:tuple, integer:int):
+        """ terms: Canonical tuple of (symbol name, coefficient). """
+        key = (terms, integer)
+        ret = cls._interned.get(key)
+        if ret is None:
+            ret = object.__new__(cls)
+            object.__setattr__(ret, 'terms', terms)
+            object.__setattr__(ret, 'integer', integer)
+            object.__setattr__(ret, '_hash', hash(integer) if not terms else hash(key))
+            cls._interned[key] = ret
+        return ret
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SymbolicSum is immutable")
+
+    def __reduce__(self):
+        return (SymbolicSum._Make, (self.terms, self.integer))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def __eq__(self, o):
+        if self is o:
+            return True
         if isinstance(o, int):
-            return (len(self.symbols) == 0) and (len(self.positive) == 0) and (self.integer == o)
-        return (self.symbols == o.symbols) and (self.positive == o.positive) and (self.integer == o.integer)
+            return not self.terms and self.integer == o
+        if isinstance(o, Symbol):
+            return self.terms == ((o.symbol, 1),) and self.integer == 0
+        if isinstance(o, SymbolicSum):
+            return self.terms == o.terms and self.integer == o.integer
+        return NotImplemented
 
     def __ne__(self, o):
         return not self == o
 
     def __hash__(self):
-        return hash((self.symbols, self.positive, self.integer))
+        return self._hash # Equal to the int's hash if there are no symbols.
 
     def __str__(self):
         symbols = ''
-        for s, p in zip(self.symbols, self.positive):
-            symbols += ('+' if p else '-') + str(s)
+        for s, c in self.terms:
+            symbols += ('+' if c > 0 else '-') + ('' if abs(c) == 1 else str(abs(c)) + '*') + s
 
         if symbols.startswith('+'):
             symbols = symbols[1:]
 
         if self.integer > 0:
-            return symbols + '+' + str(self.integer)
+            return symbols + '+' + str(self.integer) if symbols else str(self.integer)
         if self.integer < 0:
             return symbols + str(self.integer)
-        return symbols
+        return symbols or '0'
 
     def __neg__(self):
-        return SymbolicSum(copy.deepcopy(self.symbols), [not p for p in self.positive], -self.integer)
+        return SymbolicSum._Make(tuple((s, -c) for s, c in self.terms), -self.integer)
 
     def __add__(self, o):
-        if isinstance(o, SymbolicSum):
-            return SymbolicSum(
-                copy.deepcopy(self.symbols) + copy.deepcopy(o.symbols),
-                copy.deepcopy(self.positive) + copy.deepcopy(o.positive),
-                self.integer + o.integer)
         if isinstance(o, int):
-            return self + SymbolicSum(integer=o)
+            if o == 0:
+                return self
+            return SymbolicSum._Make(self.terms, self.integer + o)
+        if isinstance(o, SymbolicSum):
+            return SymbolicSum._Make(_MergeTerms(self.terms, o.terms, 1), self.integer + o.integer)
         if isinstance(o, Symbol):
-            return self + SymbolicSum(symbols=[o])
+            return SymbolicSum._Make(_MergeTerms(self.terms, ((o.symbol, 1),), 1), self.integer)
+        return NotImplemented
 
     def __sub__(self, o):
-        if isinstance(o, SymbolicSum):
-            return SymbolicSum(
-                copy.deepcopy(self.symbols) + copy.deepcopy(o.symbols),
-                copy.deepcopy(self.positive) + [not x for x in o.positive],
-                self.integer - o.integer)
         if isinstance(o, int):
-            return self - SymbolicSum(integer=o)
+            if o == 0:
+                return self
+            return SymbolicSum._Make(self.terms, self.integer - o)
+        if isinstance(o, SymbolicSum):
+            return SymbolicSum._Make(_MergeTerms(self.terms, o.terms, -1), self.integer - o.integer)
         if isinstance(o, Symbol):
-            return self - SymbolicSum(symbols=[o])
+            return SymbolicSum._Make(_MergeTerms(self.terms, ((o.symbol, 1),), -1), self.integer)
+        return NotImplemented
+
+    def __radd__(self, o):
+        return self + o
+
+    def __rsub__(self, o):
+        return -self + o
+
+    @property
+    def symbols(self) -> list:
+        return [Symbol(s) for s, c in self.terms for _ in range(abs(c))]
+
+    @property
+    def positive(self) -> list:
+        return [c > 0 for s, c in self.terms for _ in range(abs(c))]
 
     def IsInteger(self):
-        return len(self.positive) == 0
+        return not self.terms
 
     def Eval(self, symbol, value:int):
-        if isinstance(symbol, str):
-            symbol = Symbol(symbol)
+        """ Returns this sum with 'symbol' replaced by 'value'. """
+        if isinstance(symbol, Symbol):
+            symbol = symbol.symbol
 
-        symbols = []
-        positive = []
-        sum = 0
-        for s, p in zip(self.symbols, self.positive):
+        for s, c in self.terms:
             if s == symbol:
-                if p:
-                    sum += value
-                else:
-                    sum -= value
-            else:
-                symbols.append(s)
-                positive.append(p)
-
-        self.symbols = symbols
-        self.positive = positive
-        self.integer += sum
+                return SymbolicSum._Make(tuple(t for t in self.terms if t[0] != symbol), self.integer + c * value)
         return self
 
 
 class Symbol:
+    __slots__ = ('symbol',)
+
     def __init__(self, symbol:str):
-        self.symbol = symbol
+        object.__setattr__(self, 'symbol', symbol)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Symbol is immutable")
+
+    def __reduce__(self):
+        return (Symbol, (self.symbol,))
 
     def __str__(self):
         return self.symbol
 
     def __eq__(self, o):
-        return self.symbol == o.symbol
+        if isinstance(o, Symbol):
+            return self.symbol == o.symbol
+        if isinstance(o, SymbolicSum):
+            return o == self
+        return NotImplemented
 
     def __ne__(self, o):
         return not self == o
 
+    def __hash__(self):
+        return hash((((self.symbol, 1),), 0)) # Equal to the hash of the sum of only this symbol.
+
     def __neg__(self):
         return SymbolicSum() - self
 
@@ -327,14 +444,108 @@ class Symbol:
     def __sub__(self, o):
         return SymbolicSum() + self - o
 
+    def __radd__(self, o):
+        return self + o
+
+    def __rsub__(self, o):
+        return -self + o
+
 
 def FullEval(expr, symbol, value) -> int:
     if isinstance(expr, int):
         return expr
-    expr = copy.deepcopy(expr)
+    if isinstance(expr, Symbol):
+        expr = SymbolicSum() + expr
     return expr.Eval(symbol, value).integer
 
 
+def FormatFloat(value:float, float_type=numpy.float64) -> str:
+    """
+    Returns the shortest decimal literal that rounds to 'value' in the given floating point type.
+    Magnitudes outside [1e-7, 1e16) are written in scientific notation, which keeps their literals short.
+    """
+    value = float_type(value)
+    if value == 0 or 1e-7 <= abs(value) < 1e16:
+        return numpy.format_float_positional(value, unique=True, trim='0')
+    return numpy.format_float_scientific(value, unique=True, trim='0')
+
+
+class Precision:
+    """ The floating point types of the fields: A default and overrides per field name. """
+
+    __slots__ = ('default', 'fields')
+
+    def __init__(self, default=numpy.float64, fields:dict = None):
+        """ Types are given as numpy types or their names, e.g. numpy.float32 or 'float32'. """
+        self.default = numpy.dtype(default).type
+        self.fields = { name : numpy.dtype(type).type for name, type in (fields or {}).items() }
+
+    def __str__(self):
+        return ','.join([numpy.dtype(self.default).name] + [f'{name}={numpy.dtype(type).name}' for name, type in sorted(self.fields.items())])
+
+    def __eq__(self, o) -> bool:
+        return str(self) == str(o)
+
+    def __hash__(self):
+        return hash(str(self))
+
+    @staticmethod
+    def Parse(text:str):
+        """ Parses the format of __str__, e.g. 'float32,acc=float64'. """
+        default, *overrides = text.split(',')
+        return Precision(default, dict(x.split('=') for x in overrides))
+
+    def Of(self, name:str):
+        """ Returns the type of the field. """
+        return self.fields.get(name, self.default)
+
+
+class Schedule:
+    """ How the Exporter lays out the iteration spaces of the multi-stages. """
+
+    __slots__ = ('iteration_space', 'tiles', 'map_schedule', 'vertical')
+
+    ITERATION_SPACES = ('kmap', '3d')
+    VERTICALS = ('loop', 'column')
+
+    def __init__(self, iteration_space:str = 'kmap', tiles:dict = None, map_schedule:str = 'Default', vertical:str = 'loop'):
+        """
+        iteration_space: How parallel multi-stages iterate.
+            'kmap': A k-map around a nested SDFG that computes one IJ-plane per DoMethod.
+            '3d': One stencil per DoMethod over its whole I x J x K iteration space.
+        tiles: Tile sizes of the maps per dimension, e.g. { 'i' : 32, 'j' : 8 }. Dimensions without one are not tiled.
+        map_schedule: The name of the dace.ScheduleType of the outermost maps, e.g. 'CPU_Multicore' or 'GPU_Device'.
+        vertical: How forward and backward multi-stages iterate.
+            'loop': A k-loop around one IJ-plane stencil per DoMethod.
+            'column': An IJ-map around a k-loop per column, which keeps the cached levels in scalars.
+        """
+        if iteration_space not in self.ITERATION_SPACES:
+            raise ValueError("Unknown iteration space: {}".format(iteration_space))
+        if vertical not in self.VERTICALS:
+            raise ValueError("Unknown vertical iteration: {}".format(vertical))
+        tiles = dict(tiles or {})
+        if not set(tiles) <= set('ijk'):
+            raise ValueError("Tiles of unknown dimensions: {}".format(tiles))
+        self.iteration_space = iteration_space
+        self.tiles = { dim : int(size) for dim, size in sorted(tiles.items()) }
+        self.map_schedule = map_schedule
+        self.vertical = vertical
+
+    def __str__(self):
+        tiles = ''.join(f'{dim}{size}' for dim, size in self.tiles.items())
+        return f'{self.iteration_space},tiles={tiles},schedule={self.map_schedule},vertical={self.vertical}'
+
+    def __eq__(self, o) -> bool:
+        return str(self) == str(o)
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def NeedsExpansion(self) -> bool:
+        """ Returns if the maps have to be tiled or scheduled, which only exist once the stencils are expanded. """
+        return bool(self.tiles) or (self.map_schedule != 'Default')
+
+
 def prod(iterable):
     return reduce(mul, iterable, 1)
 
@@ -403,3 +614,7 @@ class Dimensions:
             'J_total_size' : numpy.int32(self.j.total_size),
             'K_total_size' : numpy.int32(self.k.total_size)
         }
+
+    def Signature(self) -> str:
+        """ Identifies the sizes, strides and halo. Dimensions with the same signature can share a specialized build. """
+        return ','.join(f'{name}={int(value)}' for name, value in self.ProgramArguments().items())
@@ -1,4 +1,5 @@
 import unittest
+import pickle
 from helpers import *
 from itertools import permutations
 
@@ -35,6 +36,36 @@ class SymbolicSum(unittest.TestCase):
         self.assertTrue(sym.IsInteger())
         self.assertEqual(sym.integer, 10)
 
+    def test_Eval_does_not_mutate(self):
+        sym = Symbol('I') + 1
+        self.assertEqual(FullEval(sym, 'I', 10), 11)
+        self.assertEqual(str(sym), 'I+1')
+
+    def test_merges_like_terms(self):
+        self.assertEqual(str(Symbol('K') + Symbol('K') - 1), '2*K-1')
+        self.assertEqual(str(Symbol('K') - Symbol('K')), '0')
+        self.assertTrue((Symbol('K') - Symbol('K') + 3) == 3)
+
+    def test_canonical(self):
+        a = Symbol('I') - Symbol('halo') + 1
+        b = 1 - Symbol('halo') + Symbol('I')
+        self.assertEqual(a, b)
+        self.assertIs(a, b)
+        self.assertEqual(hash(a), hash(b))
+        self.assertEqual(hash(Symbol('K') - Symbol('K') + 3), hash(3))
+        self.assertEqual(hash(Symbol('K')), hash(Symbol('K') + 0))
+        self.assertTrue(Symbol('K') == Symbol('K') + 0)
+
+    def test_immutable(self):
+        sym = Symbol('K') + 1
+        with self.assertRaises(AttributeError):
+            sym.integer = 2
+        self.assertIs(copy.deepcopy(sym), sym)
+
+    def test_pickle(self):
+        sym = Symbol('K') - 1
+        self.assertIs(pickle.loads(pickle.dumps(sym)), sym)
+
 
 class Bool3D_test(unittest.TestCase):
     def test_or(self):
@@ -60,6 +91,52 @@ class ClosedInterval_test(unittest.TestCase):
         self.assertEqual(s, 'halo..I-halo')
 
 
+class ClosedInterval3D_test(unittest.TestCase):
+    def test_has_no_dict(self):
+        self.assertFalse(hasattr(ClosedInterval3D(0,1,0,1,0,1), '__dict__'))
+
+    def test_equal_intervals_hash_equal(self):
+        a = ClosedInterval3D(-1,1,0,0,Symbol('K')-1,2)
+        b = ClosedInterval3D(-1,1,0,0,Symbol('K')-1,2)
+        self.assertEqual(hash(a), hash(b))
+        self.assertEqual(len({a, b}), 1)
+
+    def test_range_array(self):
+        interval = ClosedInterval3D(-1,1,0,1,-2,0)
+        self.assertEqual(interval.range_array().tolist(), [list(x) for x in interval.range()])
+
+    def test_range_array_projected(self):
+        interval = ClosedInterval3D(-1,1,0,1,-2,0)
+        self.assertEqual(interval.range_array(Bool3D(True,False,True)).tolist(),
+            [list(x) for x in sorted(set((i,k) for i,j,k in interval.range()))])
+        self.assertEqual(interval.range_array(Bool3D(False,False,False)).shape, (1,0))
+
+    def test_offset_returns_a_new_interval(self):
+        a = ClosedInterval3D(-1,1,0,0,Symbol('halo')+1,2)
+        b = a.offset(k = 3)
+        self.assertEqual(a, ClosedInterval3D(-1,1,0,0,Symbol('halo')+1,2))
+        self.assertEqual(str(b.k.lower), 'halo+4')
+
+    def test_exclude_returns_a_new_interval(self):
+        a = ClosedInterval3D(-1,1,0,0,0,2)
+        self.assertEqual(a.exclude(ClosedInterval3D(-1,1,0,0,2,3)), ClosedInterval3D(-1,1,0,0,0,1))
+        self.assertEqual(a, ClosedInterval3D(-1,1,0,0,0,2))
+
+    def test_is_immutable(self):
+        a = ClosedInterval3D(-1,1,0,0,0,2)
+        keys = { a : 'a' }
+        self.assertRaises(AttributeError, setattr, a, 'k', ClosedInterval(0, 0))
+        self.assertRaises(AttributeError, setattr, a.k, 'lower', 1)
+        self.assertRaises(AttributeError, setattr, HalfOpenInterval(0, 1), 'upper', 2)
+        self.assertRaises(AttributeError, setattr, Symbol('K'), 'symbol', 'J')
+        self.assertEqual(keys[ClosedInterval3D(-1,1,0,0,0,2)], 'a')
+
+    def test_pickles(self):
+        a = ClosedInterval3D(-1,1,0,0,Symbol('K')-1,2)
+        self.assertEqual(pickle.loads(pickle.dumps(a)), a)
+        self.assertEqual(pickle.loads(pickle.dumps(Bool3D(True,False,True))), Bool3D(True,False,True))
+
+
 class ToMemoryLayout_test(unittest.TestCase):
     def test_transforms_1D_to_memory_layout(self):
         original = 'i'
@@ -110,6 +187,71 @@ class Dimensions_test(unittest.TestCase):
         self.assertEqual([j,1,i*j], Dimensions([0,0,0], [i,j,k], 'kij').ijk.strides)
         self.assertEqual([1,i,i*j], Dimensions([0,0,0], [i,j,k], 'kji').ijk.strides)
 
+    def test_signature(self):
+        a = Dimensions([4, 5, 6], [4, 5, 7], 'ijk', halo=1)
+        self.assertEqual(a.Signature(), Dimensions([4, 5, 6], [4, 5, 7], 'ijk', halo=1).Signature())
+        self.assertNotEqual(a.Signature(), Dimensions([4, 5, 6], [4, 5, 7], 'kji', halo=1).Signature())
+        self.assertNotEqual(a.Signature(), Dimensions([4, 5, 6], [4, 5, 7], 'ijk', halo=2).Signature())
+        self.assertNotEqual(a.Signature(), Dimensions([4, 5, 6], [8, 5, 7], 'ijk', halo=1).Signature())
+
+
+class Precision_test(unittest.TestCase):
+    def test_format_float(self):
+        self.assertEqual(FormatFloat(0.1), '0.1')
+        self.assertEqual(FormatFloat(1), '1.0')
+        self.assertEqual(FormatFloat(1e-7), '0.0000001')
+        self.assertEqual(FormatFloat(3.14159265358979), '3.14159265358979')
+        self.assertEqual(FormatFloat(3.14159265358979, numpy.float32), '3.1415927')
+
+    def test_format_extreme_magnitudes(self):
+        for value in (1e300, -1e300, 1e-300, 5e-324, 1.7976931348623157e308, 1e16):
+            literal = FormatFloat(value)
+            self.assertLess(len(literal), 25, literal)
+            self.assertEqual(float(literal), value)
+        self.assertEqual(FormatFloat(1e300), '1.0e+300')
+        self.assertEqual(FormatFloat(1e-30, numpy.float32), '1.0e-30')
+        self.assertEqual(numpy.float32(FormatFloat(3.4e38, numpy.float32)), numpy.float32(3.4e38))
+
+    def test_overrides(self):
+        p = Precision('float32', { 'acc' : numpy.float64 })
+        self.assertIs(p.Of('u'), numpy.float32)
+        self.assertIs(p.Of('acc'), numpy.float64)
+
+    def test_parse(self):
+        p = Precision('float32', { 'b' : 'float64', 'a' : 'float64' })
+        self.assertEqual(str(p), 'float32,a=float64,b=float64')
+        self.assertEqual(Precision.Parse(str(p)), p)
+        self.assertEqual(Precision.Parse('float64'), Precision())
+
+    def test_pickle(self):
+        p = Precision('float32', { 'a' : 'float64' })
+        self.assertEqual(pickle.loads(pickle.dumps(p)), p)
+
+
+class Schedule_test(unittest.TestCase):
+    def test_default(self):
+        self.assertFalse(Schedule().NeedsExpansion())
+        self.assertEqual(Schedule(), Schedule('kmap', {}, 'Default'))
+
+    def test_tiles(self):
+        s = Schedule('3d', { 'j' : 8, 'i' : '32' })
+        self.assertEqual(s.tiles, { 'i' : 32, 'j' : 8 })
+        self.assertEqual(str(s), '3d,tiles=i32j8,schedule=Default,vertical=loop')
+        self.assertTrue(s.NeedsExpansion())
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, Schedule, 'ijk')
+        self.assertRaises(ValueError, Schedule, '3d', { 'x' : 4 })
+        self.assertRaises(ValueError, Schedule, vertical='kloop')
+
+    def test_vertical(self):
+        self.assertNotEqual(Schedule(vertical='column'), Schedule())
+        self.assertFalse(Schedule(vertical='column').NeedsExpansion())
+
+    def test_pickle(self):
+        s = Schedule('3d', { 'k' : 4 }, 'CPU_Multicore')
+        self.assertEqual(pickle.loads(pickle.dumps(s)), s)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
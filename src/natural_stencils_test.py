@@ -1,88 +1,22 @@
+import re
 from test_helpers import *
 from dace.transformation.dataflow import *
 from dace.transformation.optimizer import Optimizer
 from dace.subsets import Range
-
-def lap2D(data, i, j, k, plus=None, minus=None):
-    if (plus is None) and (minus is None):
-        return data[i-1,j,k] + data[i+1,j,k] - 2.0 * data[i,j,k] \
-            + (data[i,j+1,k] - data[i,j,k]) \
-            + (data[i,j-1,k] - data[i,j,k])
-
-    return data[i-1,j,k] + data[i+1,j,k] - 2.0 * data[i,j,k] \
-        + plus[j] * (data[i,j+1,k] - data[i,j,k]) \
-        + minus[j] * (data[i,j-1,k] - data[i,j,k])
-
-
-def diffusive_flux_x(lap, data, i, j, k):
-    flx = lap[i+1,j,k] - lap[i,j,k]
-    return 0.0 if (flx * (data[i+1,j,k] - data[i,j,k])) > 0.0 else flx
-
-def diffusive_flux_y(lap, data, crlato, i, j, k):
-    fly = crlato[j] * (lap[i,j+1,k] - lap[i,j,k])
-    return 0.0 if (fly * (data[i,j+1,k] - data[i,j,k])) > 0.0 else fly
-
-def type2(data, crlato, crlatu, hdmask, dim, halo=None):
-    halo = halo or dim.halo
-    lap = Zeros(dim.ijk)
-    for i in range(1, dim.I-1):
-        for j in range(1, dim.J-1):
-            for k in range(0, dim.K):
-                lap[i,j,k] = lap2D(data, i, j, k, crlato, crlatu)
-
-    out = Zeros(dim.ijk)
-    for i in range(halo, dim.I-halo):
-        for j in range(halo, dim.J-halo):
-            for k in range(0, dim.K):
-                delta_flux_x = diffusive_flux_x(lap, data, i, j, k) - diffusive_flux_x(lap, data, i-1, j, k)
-                delta_flux_y = diffusive_flux_y(lap, data, crlato, i, j, k) - diffusive_flux_y(lap, data, crlato, i, j-1, k)
-                out[i,j,k] = data[i,j,k] - hdmask[i,j,k] * (delta_flux_x + delta_flux_y)
-    return out
-
-def smag(u, v, hdmask, crlavo, crlavu, crlato, crlatu, acrlat0, dim):
-    eddlon = 5729.58
-    eddlat = 5729.58
-    T_sqr_s = Zeros(dim.ijk)
-    for i in range(1, dim.I):
-        for j in range(1, dim.J):
-            for k in range(0, dim.K):
-                frac_1_dx = acrlat0[j] * eddlon
-                frac_1_dy = eddlat / 6371.229e3
-
-                T_s = (v[i,j-1,k] - v[i,j,k]) * frac_1_dy - (u[i-1,j,k] - u[i,j,k]) * frac_1_dx
-                T_sqr_s[i,j,k] = T_s * T_s
-
-    S_sqr_uv = Zeros(dim.ijk)
-    for i in range(0, dim.I-1):
-        for j in range(0, dim.J-1):
-            for k in range(0, dim.K):
-                frac_1_dx = acrlat0[j] * eddlon
-                frac_1_dy = eddlat / 6371.229e3
-
-                S_uv = (u[i,j+1,k] - u[i,j,k]) * frac_1_dy - (v[i+1,j,k] - v[i,j,k]) * frac_1_dx
-                S_sqr_uv[i,j,k] = S_uv * S_uv
-
-    u_out = Zeros(dim.ijk)
-    v_out = Zeros(dim.ijk)
-    for i in range(dim.halo, dim.I-dim.halo):
-        for j in range(dim.halo, dim.J-dim.halo):
-            for k in range(0, dim.K):
-                weight_smag = 0.5
-                tau_smag = 0.3
-                hdweight = weight_smag * hdmask[i,j,k]
-
-                smag_u = tau_smag * numpy.sqrt(0.5 * (T_sqr_s[i,j,k] + T_sqr_s[i+1,j,k]) + 0.5 * (S_sqr_uv[i,j,k] + S_sqr_uv[i,j-1,k])) - hdweight
-                smag_u = min(0.5, max(0.0, smag_u))
-                u_out[i,j,k] = u[i,j,k] + smag_u * lap2D(u, i, j, k, crlato, crlatu)
-
-                smag_v = tau_smag * numpy.sqrt(0.5 * (T_sqr_s[i,j,k] + T_sqr_s[i,j+1,k]) + 0.5 * (S_sqr_uv[i,j,k] + S_sqr_uv[i-1,j,k])) - hdweight
-                smag_v = min(0.5, max(0.0, smag_v))
-                v_out[i,j,k] = v[i,j,k] + smag_v * lap2D(v, i, j, k, crlavo, crlavu)
-    return u_out, v_out
+from reference_stencils import *
 
 class coriolis(LegalSDFG, Asserts):
     def test_4_numerically(self):
-        dim = Dimensions([5,11,23], [5,11,24], 'ijk', halo=1)
+        self.check_numerically()
+
+    def test_4_numerically_specialized(self):
+        self.check_numerically(specialize=True)
+
+    def test_4_numerically_specialized_in_kji_layout(self):
+        self.check_numerically('kji', specialize=True)
+
+    def check_numerically(self, layout='ijk', specialize=False):
+        dim = Dimensions([5,11,23], [5,11,24], layout, halo=1)
         u = Waves(8.0, 2.0, 1.5, 1.5, 2.0, 4.0, dim.ijk);
         v = Waves(5.0, 1.2, 1.3, 1.7, 2.2, 3.5, dim.ijk);
         fc = Waves(2.0, 1.2, 1.3, 1.7, 2.2, 3.5, dim.ij);
@@ -99,7 +33,11 @@ class coriolis(LegalSDFG, Asserts):
                     # v_tens -= 0.25 * (fc * (u + u[j+1]) + fc[i-1] * (u[i-1] + u[i-1,j+1]));
                     v_tens[i,j,k] -= 0.25 * (fc[i,j] * (u[i,j,k] + u[i,j+1,k]) + fc[i-1,j] * (u[i-1,j,k] + u[i-1,j+1,k]))
 
-        sdfg = get_sdfg(self.__class__.__name__ + ".iir")
+        sdfg = get_sdfg(self.__class__.__name__ + ".iir", dimensions=dim if specialize else None)
+        # A specialized SDFG takes no sizes, strides or halo.
+        arguments = {} if specialize else dim.ProgramArguments()
+        if specialize:
+            self.assertFalse(sdfg.free_symbols)
         sdfg.save("gen/" + self.__class__.__name__ + ".sdfg")
         sdfg.expand_library_nodes()
         sdfg.save("gen/" + self.__class__.__name__ + "_expanded.sdfg")
@@ -114,7 +52,7 @@ class coriolis(LegalSDFG, Asserts):
             u = u,
             v = v,
             fc = fc,
-            **dim.ProgramArguments())
+            **arguments)
 
         self.assertIsClose(u_tens, u_tens_dace)
         self.assertIsClose(v_tens, v_tens_dace)
@@ -122,6 +60,12 @@ class coriolis(LegalSDFG, Asserts):
 
 class thomas(LegalSDFG, Asserts):
     def test_4_numerically(self):
+        self.check_numerically()
+
+    def test_4_numerically_in_columns(self):
+        self.check_numerically(Schedule(vertical='column'), '_columns')
+
+    def check_numerically(self, schedule=None, suffix=''):
         dim = Dimensions([4,4,4], [4,4,5], 'ijk', halo=0)
         a = Iota(dim.ijk,0)
         b = Iota(dim.ijk,9)
@@ -180,13 +124,13 @@ class thomas(LegalSDFG, Asserts):
                 for k in reversed(range(0, dim.K-1)):
                     data[i,j,k] = d[i,j,k] - (c[i,j,k] * data[i,j,k+1])
 
-        sdfg = get_sdfg(self.__class__.__name__ + ".iir")
-        sdfg.save("gen/" + self.__class__.__name__ + ".sdfg")
+        sdfg = get_sdfg(self.__class__.__name__ + ".iir", schedule=schedule)
+        sdfg.save("gen/" + self.__class__.__name__ + suffix + ".sdfg")
         sdfg.expand_library_nodes()
-        sdfg.save("gen/" + self.__class__.__name__ + "_expanded.sdfg")
+        sdfg.save("gen/" + self.__class__.__name__ + suffix + "_expanded.sdfg")
         sdfg.apply_strict_transformations(validate=False)
         sdfg.apply_transformations_repeated(InlineSDFG)
-        sdfg.save("gen/" + self.__class__.__name__ + "_expanded_st.sdfg")
+        sdfg.save("gen/" + self.__class__.__name__ + suffix + "_expanded_st.sdfg")
         sdfg = sdfg.compile()
 
         sdfg(
@@ -203,25 +147,77 @@ class thomas(LegalSDFG, Asserts):
         self.assertIsClose(d, d_dace)
         self.assertIsClose(data, data_dace)
 
+def MapOrders(sdfg) -> list:
+    """ Returns the dimensions each multi-dimensional map iterates over, outermost first, as read from the 3D fields its memlets index. """
+    orders = []
+    for node, state in sdfg.all_nodes_recursive():
+        if not isinstance(node, dace.nodes.MapEntry) or len(node.map.params) < 2:
+            continue
+        order = ''
+        for param in node.map.params:
+            for edge in state.scope_subgraph(node).edges():
+                memlet = edge.data
+                if memlet.data is None or len(state.parent.arrays[memlet.data].shape) != 3:
+                    continue
+                dims = [d for d, (begin, end, _) in zip('ijk', memlet.subset.ranges) if param in re.findall(r'\w+', f'{begin} {end}')]
+                if len(dims) == 1:
+                    order += dims[0]
+                    break
+        orders.append(order)
+    return orders
+
 class diffusion(LegalSDFG, Asserts):
     def test_4_numerically(self):
-        dim = Dimensions([6,6,6], [6,6,7], 'ijk', halo=2)
+        self.check_numerically()
+
+    def test_4_numerically_in_kji_layout(self):
+        self.check_numerically(layout='kji')
+
+    def test_4_numerically_in_3d(self):
+        self.check_numerically(schedule=Schedule(iteration_space='3d'))
+
+    def test_4_numerically_tiled(self):
+        self.check_numerically(schedule=Schedule(tiles={ 'i' : 4, 'j' : 3 }, map_schedule='CPU_Multicore'))
+
+    def test_4_numerically_in_3d_tiled(self):
+        self.check_numerically(layout='kji', schedule=Schedule(iteration_space='3d', tiles={ 'i' : 4, 'k' : 5 }, map_schedule='CPU_Multicore'))
+
+    def test_5_parallel_maps_do_not_nest(self):
+        for iteration_space in Schedule.ITERATION_SPACES:
+            sdfg = get_sdfg(self.__class__.__name__ + ".iir", schedule=Schedule(iteration_space, tiles={ 'j' : 3 }, map_schedule='CPU_Multicore'))
+            parallel = [(node, state) for node, state in sdfg.all_nodes_recursive()
+                if isinstance(node, dace.nodes.MapEntry) and node.map.schedule == dace.ScheduleType.CPU_Multicore]
+            self.assertTrue(parallel)
+            for node, state in parallel:
+                self.assertIsNone(state.entry_node(node))
+                self.assertIsNone(state.parent.parent_nsdfg_node)
+            # Only the requested dimension is tiled.
+            tile_maps = [node.map.params for node, _ in sdfg.all_nodes_recursive()
+                if isinstance(node, dace.nodes.MapEntry) and any(param.startswith('tile') for param in node.map.params)]
+            self.assertTrue(tile_maps)
+            for params in tile_maps:
+                self.assertTrue(len(params) == 1, params)
+
+    def test_5_maps_follow_the_layout(self):
+        dim = Dimensions([6,6,6], [6,6,7], 'kji', halo=2)
+        # Specializing removes the domain symbols from the map ranges.
+        sdfg = get_sdfg(self.__class__.__name__ + ".iir", dimensions=dim, layout='kji')
+        orders = MapOrders(sdfg)
+        self.assertTrue(orders)
+        for order in orders:
+            self.assertTrue(order == ''.join(sorted(order, key='kji'.index)), order)
+
+    def check_numerically(self, layout=None, schedule=None):
+        dim = Dimensions([6,6,6], [6,6,7], layout or 'ijk', halo=2)
         input = Waves(8.0, 2.0, 1.5, 1.5, 2.0, 4.0, dim.ijk)
         output = Zeros(dim.ijk)
         output_dace = Zeros(dim.ijk)
 
-        lap = Zeros(dim.ijk)
-        for i in range(1, dim.I-1):
-            for j in range(1, dim.J-1):
-                for k in range(0, dim.K):
-                    lap[i,j,k] = lap2D(input, i, j, k)
-
-        for i in range(dim.halo, dim.I-dim.halo):
-            for j in range(dim.halo, dim.J-dim.halo):
-                for k in range(0, dim.K):
-                    output[i,j,k] = diffusive_flux_x(lap, input, i, j, k) - diffusive_flux_x(lap, input, i-1, j, k)
+        h, I, J = dim.halo, dim.I, dim.J
+        flux_x = diffusive_flux_x(lap2D(input), input)
+        output[h:I-h, h:J-h] = flux_x[h:I-h, h:J-h] - flux_x[h-1:I-h-1, h:J-h]
 
-        sdfg = get_sdfg(self.__class__.__name__ + ".iir")
+        sdfg = get_sdfg(self.__class__.__name__ + ".iir", layout=layout, schedule=schedule)
         sdfg.save("gen/" + self.__class__.__name__ + ".sdfg")
         sdfg.expand_library_nodes()
         sdfg.save("gen/" + self.__class__.__name__ + "_expanded.sdfg")
@@ -239,17 +235,28 @@ class diffusion(LegalSDFG, Asserts):
 
 class laplace(LegalSDFG, Asserts):
     def test_4_numerically(self):
+        self.check_numerically()
+
+    def test_4_numerically_in_float32(self):
+        self.check_numerically(Precision('float32'), dace.float32, dace.float32, rtol=1e-5)
+
+    def test_4_numerically_in_mixed_precision(self):
+        self.check_numerically(Precision('float32', { 'output' : 'float64' }), dace.float32, dace.float64, rtol=1e-5)
+
+    def check_numerically(self, precision=None, input_type=dace.float64, output_type=dace.float64, rtol=1e-10):
         dim = Dimensions([4,8,12], [4,8,13], 'ijk', halo=1)
-        input = Waves(8.0, 2.0, 1.5, 1.5, 2.0, 4.0, dim.ijk)
+        input = Zeros(dim.ijk, input_type)
+        input[...] = Waves(8.0, 2.0, 1.5, 1.5, 2.0, 4.0, dim.ijk)
         output = Zeros(dim.ijk)
-        output_dace = Zeros(dim.ijk)
+        output_dace = Zeros(dim.ijk, output_type)
 
-        for i in range(dim.halo, dim.I-dim.halo):
-            for j in range(dim.halo, dim.J-dim.halo):
-                for k in range(0, dim.K):
-                    output[i,j,k] = lap2D(input, i, j, k)
+        # The reference computes in float64 from the rounded input.
+        h, I, J = dim.halo, dim.I, dim.J
+        output[h:I-h, h:J-h] = lap2D(input.astype(numpy.float64))[h:I-h, h:J-h]
 
-        sdfg = get_sdfg(self.__class__.__name__ + ".iir")
+        sdfg = get_sdfg(self.__class__.__name__ + ".iir", precision=precision)
+        for name, type in (('input', input_type), ('output', output_type)):
+            self.assertTrue(sdfg.arrays[name].dtype == type, name)
         sdfg.save("gen/" + self.__class__.__name__ + ".sdfg")
         sdfg.expand_library_nodes()
         sdfg.save("gen/" + self.__class__.__name__ + "_expanded.sdfg")
@@ -263,7 +270,7 @@ class laplace(LegalSDFG, Asserts):
             output = output_dace,
             **dim.ProgramArguments())
 
-        self.assertIsClose(output, output_dace)
+        self.assertIsClose(output, output_dace, rtol)
 
 class laplap(LegalSDFG, Asserts):
     def test_4_numerically(self):
@@ -277,15 +284,9 @@ class laplap(LegalSDFG, Asserts):
         lap = Zeros(dim.ijk)
         output_dace = Zeros(dim.ijk)
 
-        for i in range(dim.halo-1, dim.I-dim.halo+1):
-            for j in range(dim.halo-1, dim.J-dim.halo+1):
-                for k in range(0, dim.K):
-                    lap[i,j,k] = lap2D(input, i, j, k)
-
-        for i in range(dim.halo, dim.I-dim.halo):
-            for j in range(dim.halo, dim.J-dim.halo):
-                for k in range(0, dim.K):
-                    output[i,j,k] = lap2D(lap, i, j, k)
+        h, I, J = dim.halo, dim.I, dim.J
+        lap[h-1:I-h+1, h-1:J-h+1] = lap2D(input)[h-1:I-h+1, h-1:J-h+1]
+        output[h:I-h, h:J-h] = lap2D(lap)[h:I-h, h:J-h]
 
         sdfg = get_sdfg(self.__class__.__name__ + ".iir")
         sdfg.save("gen/" + self.__class__.__name__ + ".sdfg")
@@ -0,0 +1,91 @@
+"""
+NumPy reference implementations of the stencils that the tests and the autotuner check DaCe's output against.
+They operate on whole fields with slices instead of looping over points, but they perform the same floating point
+operations in the same order as the per-point formulation, so their results are identical to it, bit for bit.
+Fields are indexed [i,j,k], 1D fields in j, and may have any memory layout.
+"""
+import math
+import numpy
+
+def lap2D(data, plus=None, minus=None):
+    """ The horizontal laplacian of data in [1,I-1)x[1,J-1), zero elsewhere. plus and minus weigh the j-neighbours. """
+    center = data[1:-1, 1:-1]
+    lap = numpy.zeros_like(data)
+    if (plus is None) and (minus is None):
+        lap[1:-1, 1:-1] = data[:-2, 1:-1] + data[2:, 1:-1] - 2.0 * center \
+            + (data[1:-1, 2:] - center) \
+            + (data[1:-1, :-2] - center)
+    else:
+        lap[1:-1, 1:-1] = data[:-2, 1:-1] + data[2:, 1:-1] - 2.0 * center \
+            + plus[None, 1:-1, None] * (data[1:-1, 2:] - center) \
+            + minus[None, 1:-1, None] * (data[1:-1, :-2] - center)
+    return lap
+
+def diffusive_flux_x(lap, data):
+    """ The flux from i to i+1 in [0,I-1), zero where it runs against the gradient of data. """
+    flx = lap[1:] - lap[:-1]
+    return numpy.where(flx * (data[1:] - data[:-1]) > 0.0, 0.0, flx)
+
+def diffusive_flux_y(lap, data, crlato):
+    """ The flux from j to j+1 in [0,J-1), zero where it runs against the gradient of data. """
+    fly = crlato[None, :-1, None] * (lap[:, 1:] - lap[:, :-1])
+    return numpy.where(fly * (data[:, 1:] - data[:, :-1]) > 0.0, 0.0, fly)
+
+def type2(data, crlato, crlatu, hdmask, dim, halo=None):
+    halo = halo or dim.halo
+    I, J = dim.I, dim.J
+    lap = lap2D(data, crlato, crlatu)
+    flux_x = diffusive_flux_x(lap, data)
+    flux_y = diffusive_flux_y(lap, data, crlato)
+
+    out = numpy.zeros_like(data)
+    delta_flux_x = flux_x[halo:I-halo, halo:J-halo] - flux_x[halo-1:I-halo-1, halo:J-halo]
+    delta_flux_y = flux_y[halo:I-halo, halo:J-halo] - flux_y[halo:I-halo, halo-1:J-halo-1]
+    out[halo:I-halo, halo:J-halo] = data[halo:I-halo, halo:J-halo] - hdmask[halo:I-halo, halo:J-halo] * (delta_flux_x + delta_flux_y)
+    return out
+
+def smag(u, v, hdmask, crlavo, crlavu, crlato, crlatu, acrlat0, dim):
+    eddlon = 5729.58
+    eddlat = 5729.58
+    frac_1_dx = acrlat0[None, :, None] * eddlon
+    frac_1_dy = eddlat / 6371.229e3
+
+    T_sqr_s = numpy.zeros_like(u)
+    T_s = (v[1:, :-1] - v[1:, 1:]) * frac_1_dy - (u[:-1, 1:] - u[1:, 1:]) * frac_1_dx[:, 1:]
+    T_sqr_s[1:, 1:] = T_s * T_s
+
+    S_sqr_uv = numpy.zeros_like(u)
+    S_uv = (u[:-1, 1:] - u[:-1, :-1]) * frac_1_dy - (v[1:, :-1] - v[:-1, :-1]) * frac_1_dx[:, :-1]
+    S_sqr_uv[:-1, :-1] = S_uv * S_uv
+
+    h, I, J = dim.halo, dim.I, dim.J
+    inner = (slice(h, I-h), slice(h, J-h))
+    weight_smag = 0.5
+    tau_smag = 0.3
+    hdweight = weight_smag * hdmask[inner]
+
+    def Clip(x):
+        # Like min(0.5, max(0.0, x)), which keeps the sign of zeros.
+        x = numpy.where(x > 0.0, x, 0.0)
+        return numpy.where(x < 0.5, x, 0.5)
+
+    u_out = numpy.zeros_like(u)
+    smag_u = tau_smag * numpy.sqrt(0.5 * (T_sqr_s[inner] + T_sqr_s[h+1:I-h+1, h:J-h]) + 0.5 * (S_sqr_uv[inner] + S_sqr_uv[h:I-h, h-1:J-h-1])) - hdweight
+    u_out[inner] = u[inner] + Clip(smag_u) * lap2D(u, crlato, crlatu)[inner]
+
+    v_out = numpy.zeros_like(v)
+    smag_v = tau_smag * numpy.sqrt(0.5 * (T_sqr_s[inner] + T_sqr_s[h:I-h, h+1:J-h+1]) + 0.5 * (S_sqr_uv[inner] + S_sqr_uv[h-1:I-h-1, h:J-h])) - hdweight
+    v_out[inner] = v[inner] + Clip(smag_v) * lap2D(v, crlavo, crlavu)[inner]
+    return u_out, v_out
+
+def WaveValues(a, b, c, d, e, f, dim):
+    """
+    The values of a smooth test field of dim's shape, in float64:
+    a * (b + cos(pi * (x + c * y)) + sin(d * pi * (x + e * y))) / f + k * 0.01, with x = i/I and y = j/J.
+    """
+    I, J, K = dim.I or 1, dim.J or 1, dim.K or 1
+    x = (numpy.arange(I) / I)[:, None]
+    y = (numpy.arange(J) / J)[None, :]
+    plane = a * (b + numpy.cos(math.pi * (x + c * y)) + numpy.sin(d * math.pi * (x + e * y))) / f
+    values = plane[:, :, None] + numpy.arange(K) * 0.01
+    return values.reshape(dim.shape)
@@ -0,0 +1,163 @@
+import unittest
+import math
+import numpy
+from numpy.lib.stride_tricks import as_strided
+from helpers import *
+from reference_stencils import *
+
+# The per-point formulations, which the vectorized stencils must reproduce bit for bit.
+
+def Zeros(dim:Dim, dtype):
+    arr = numpy.zeros(dim.total_size, dtype=dtype)
+    return as_strided(arr, shape=dim.shape, strides=[s * arr.itemsize for s in dim.strides])
+
+def Waves(a, b, c, d, e, f, dim:Dim, dtype):
+    data = Zeros(dim, dtype)
+    for i in range(dim.I or 1):
+        for j in range(dim.J or 1):
+            for k in range(dim.K or 1):
+                index = tuple(index for index, size in [(i,dim.I),(j,dim.J),(k,dim.K)] if size)
+                x = i / (dim.I or 1)
+                y = j / (dim.J or 1)
+                data[index] = k * 0.01 + a * (b + math.cos(math.pi * (x + c * y)) + math.sin(d * math.pi * (x + e * y))) / f
+    return data
+
+def point_lap2D(data, i, j, k, plus=None, minus=None):
+    if (plus is None) and (minus is None):
+        return data[i-1,j,k] + data[i+1,j,k] - 2.0 * data[i,j,k] \
+            + (data[i,j+1,k] - data[i,j,k]) \
+            + (data[i,j-1,k] - data[i,j,k])
+
+    return data[i-1,j,k] + data[i+1,j,k] - 2.0 * data[i,j,k] \
+        + plus[j] * (data[i,j+1,k] - data[i,j,k]) \
+        + minus[j] * (data[i,j-1,k] - data[i,j,k])
+
+def point_diffusive_flux_x(lap, data, i, j, k):
+    flx = lap[i+1,j,k] - lap[i,j,k]
+    return 0.0 if (flx * (data[i+1,j,k] - data[i,j,k])) > 0.0 else flx
+
+def point_diffusive_flux_y(lap, data, crlato, i, j, k):
+    fly = crlato[j] * (lap[i,j+1,k] - lap[i,j,k])
+    return 0.0 if (fly * (data[i,j+1,k] - data[i,j,k])) > 0.0 else fly
+
+def point_type2(data, crlato, crlatu, hdmask, dim, halo=None):
+    halo = halo or dim.halo
+    lap = Zeros(dim.ijk, data.dtype)
+    for i in range(1, dim.I-1):
+        for j in range(1, dim.J-1):
+            for k in range(0, dim.K):
+                lap[i,j,k] = point_lap2D(data, i, j, k, crlato, crlatu)
+
+    out = Zeros(dim.ijk, data.dtype)
+    for i in range(halo, dim.I-halo):
+        for j in range(halo, dim.J-halo):
+            for k in range(0, dim.K):
+                delta_flux_x = point_diffusive_flux_x(lap, data, i, j, k) - point_diffusive_flux_x(lap, data, i-1, j, k)
+                delta_flux_y = point_diffusive_flux_y(lap, data, crlato, i, j, k) - point_diffusive_flux_y(lap, data, crlato, i, j-1, k)
+                out[i,j,k] = data[i,j,k] - hdmask[i,j,k] * (delta_flux_x + delta_flux_y)
+    return out
+
+def point_smag(u, v, hdmask, crlavo, crlavu, crlato, crlatu, acrlat0, dim):
+    eddlon = 5729.58
+    eddlat = 5729.58
+    T_sqr_s = Zeros(dim.ijk, u.dtype)
+    for i in range(1, dim.I):
+        for j in range(1, dim.J):
+            for k in range(0, dim.K):
+                frac_1_dx = acrlat0[j] * eddlon
+                frac_1_dy = eddlat / 6371.229e3
+
+                T_s = (v[i,j-1,k] - v[i,j,k]) * frac_1_dy - (u[i-1,j,k] - u[i,j,k]) * frac_1_dx
+                T_sqr_s[i,j,k] = T_s * T_s
+
+    S_sqr_uv = Zeros(dim.ijk, u.dtype)
+    for i in range(0, dim.I-1):
+        for j in range(0, dim.J-1):
+            for k in range(0, dim.K):
+                frac_1_dx = acrlat0[j] * eddlon
+                frac_1_dy = eddlat / 6371.229e3
+
+                S_uv = (u[i,j+1,k] - u[i,j,k]) * frac_1_dy - (v[i+1,j,k] - v[i,j,k]) * frac_1_dx
+                S_sqr_uv[i,j,k] = S_uv * S_uv
+
+    u_out = Zeros(dim.ijk, u.dtype)
+    v_out = Zeros(dim.ijk, u.dtype)
+    for i in range(dim.halo, dim.I-dim.halo):
+        for j in range(dim.halo, dim.J-dim.halo):
+            for k in range(0, dim.K):
+                weight_smag = 0.5
+                tau_smag = 0.3
+                hdweight = weight_smag * hdmask[i,j,k]
+
+                smag_u = tau_smag * numpy.sqrt(0.5 * (T_sqr_s[i,j,k] + T_sqr_s[i+1,j,k]) + 0.5 * (S_sqr_uv[i,j,k] + S_sqr_uv[i,j-1,k])) - hdweight
+                smag_u = min(0.5, max(0.0, smag_u))
+                u_out[i,j,k] = u[i,j,k] + smag_u * point_lap2D(u, i, j, k, crlato, crlatu)
+
+                smag_v = tau_smag * numpy.sqrt(0.5 * (T_sqr_s[i,j,k] + T_sqr_s[i,j+1,k]) + 0.5 * (S_sqr_uv[i,j,k] + S_sqr_uv[i-1,j,k])) - hdweight
+                smag_v = min(0.5, max(0.0, smag_v))
+                v_out[i,j,k] = v[i,j,k] + smag_v * point_lap2D(v, i, j, k, crlavo, crlavu)
+    return u_out, v_out
+
+
+class ReferenceStencils_test(unittest.TestCase):
+    def assertBitwiseEqual(self, expected, received):
+        self.assertEqual(expected.dtype, received.dtype)
+        unsigned = f'u{expected.dtype.itemsize}'
+        numpy.testing.assert_array_equal(
+            numpy.ascontiguousarray(expected).view(unsigned),
+            numpy.ascontiguousarray(received).view(unsigned))
+
+    def Inputs(self, dim, dtype):
+        def Field(a, b, c, d, e, f, field_dim):
+            data = Zeros(field_dim, dtype)
+            data[...] = WaveValues(a, b, c, d, e, f, field_dim)
+            return data
+        return (
+            Field(1.80, 1.20, 0.15, 1.15, 0.20, 1.40, dim.ijk),
+            Field(1.60, 1.10, 0.09, 1.11, 0.20, 1.40, dim.ijk),
+            Field(0.3, 1.22, 0.17, 1.19, 0.20, 1.40, dim.ijk),
+            Field(1.65, 1.12, 0.17, 1.19, 0.21, 1.20, dim.j),
+            Field(1.50, 1.22, 0.17, 1.19, 0.20, 1.10, dim.j),
+            Field(1.65, 1.12, 0.17, 1.09, 0.21, 1.20, dim.j),
+            Field(1.50, 1.22, 0.17, 1.09, 0.20, 1.10, dim.j),
+            Field(1.65, 1.22, 0.11, 1.52, 0.42, 1.02, dim.j),
+        )
+
+    def test_waves(self):
+        dim = Dimensions([7,9,5], [7,9,6], 'kji')
+        for dtype in (numpy.float32, numpy.float64):
+            for field_dim in (dim.ijk, dim.ij, dim.j):
+                expected = Waves(1.65, 1.22, 0.11, 1.52, 0.42, 1.02, field_dim, dtype)
+                received = Zeros(field_dim, dtype)
+                received[...] = WaveValues(1.65, 1.22, 0.11, 1.52, 0.42, 1.02, field_dim)
+                self.assertBitwiseEqual(expected, received)
+
+    def test_lap2D(self):
+        dim = Dimensions([6,7,3], [6,7,4], 'ijk')
+        data = Waves(8.0, 2.0, 1.5, 1.5, 2.0, 4.0, dim.ijk, numpy.float64)
+        expected = Zeros(dim.ijk, numpy.float64)
+        for i in range(1, dim.I-1):
+            for j in range(1, dim.J-1):
+                for k in range(0, dim.K):
+                    expected[i,j,k] = point_lap2D(data, i, j, k)
+        self.assertBitwiseEqual(expected, lap2D(data))
+
+    def test_type2_and_smag(self):
+        for dtype in (numpy.float32, numpy.float64):
+            for memory_layout in ('ijk', 'kji', 'jki'):
+                dim = Dimensions([12,11,4], [12,11,5], memory_layout, halo=4)
+                u, v, hdmask, crlavo, crlavu, crlato, crlatu, acrlat0 = self.Inputs(dim, dtype)
+
+                for halo in (None, 2):
+                    self.assertBitwiseEqual(
+                        point_type2(u, crlato, crlatu, hdmask, dim, halo),
+                        type2(u, crlato, crlatu, hdmask, dim, halo))
+
+                expected = point_smag(u, v, hdmask, crlavo, crlavu, crlato, crlatu, acrlat0, dim)
+                received = smag(u, v, hdmask, crlavo, crlavu, crlato, crlatu, acrlat0, dim)
+                for e, r in zip(expected, received):
+                    self.assertBitwiseEqual(e, r)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+#include "gtclang_dsl_defs/gtclang_dsl.hpp"
+
+using namespace gtclang::dsl;
+
+stencil_function constant_bc {
+  storage data;
+
+  Do {
+    data = 10.0;
+  }
+};
+
+stencil boundary_condition {
+  storage output, shifted, input;
+
+  Do {
+    vertical_region(k_start, k_end) {
+      output = input;
+    }
+    boundary_condition(constant_bc(), output);
+    vertical_region(k_start, k_end) {
+      shifted = output[i+1] + output[j-1];
+    }
+  }
+};
@@ -0,0 +1,20 @@
+#include "gtclang_dsl_defs/gtclang_dsl.hpp"
+
+using namespace gtclang::dsl;
+
+stencil fused_extents {
+  storage output, shifted, input;
+  var tmp;
+
+  Do {
+    vertical_region(k_start, k_end) {
+      tmp = input * 2.0;
+    }
+    vertical_region(k_start, k_end) {
+      output = tmp + 1.0;
+    }
+    vertical_region(k_start, k_end) {
+      shifted = tmp[i+1];
+    }
+  }
+};
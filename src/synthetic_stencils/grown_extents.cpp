@@ -0,0 +1,20 @@
+#include "gtclang_dsl_defs/gtclang_dsl.hpp"
+
+using namespace gtclang::dsl;
+
+stencil grown_extents {
+  storage output, input;
+  var a, b;
+
+  Do {
+    vertical_region(k_start, k_end) {
+      a = input * 2.0;
+    }
+    vertical_region(k_start, k_end) {
+      b = a + input;
+    }
+    vertical_region(k_start, k_end) {
+      output = b[i+1] + a[i-1];
+    }
+  }
+};
@@ -0,0 +1,16 @@
+#include "gtclang_dsl_defs/gtclang_dsl.hpp"
+
+using namespace gtclang::dsl;
+
+stencil k_cache_intervals {
+  storage output, input;
+
+  Do {
+    vertical_region(k_start, k_start) {
+      output = input[k+1] - input;
+    }
+    vertical_region(k_start+1, k_end) {
+      output = output[k-1] + input[k-1] + input;
+    }
+  }
+};
@@ -0,0 +1,19 @@
+#include "gtclang_dsl_defs/gtclang_dsl.hpp"
+
+using namespace gtclang::dsl;
+
+stencil k_cache_temporary {
+  storage output, input;
+  var tmp;
+
+  Do {
+    vertical_region(k_start, k_start) {
+      tmp = input;
+      output = tmp;
+    }
+    vertical_region(k_start+1, k_end) {
+      tmp = tmp[k-1] + input;
+      output = tmp[k-1] * 2.0 + tmp;
+    }
+  }
+};
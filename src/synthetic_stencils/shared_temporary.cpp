@@ -0,0 +1,27 @@
+#include "gtclang_dsl_defs/gtclang_dsl.hpp"
+
+using namespace gtclang::dsl;
+
+stencil_function zero_bc {
+  storage data;
+
+  Do {
+    data = 0.0;
+  }
+};
+
+stencil shared_temporary {
+  storage output, shifted, input;
+  var tmp;
+
+  Do {
+    vertical_region(k_start, k_end) {
+      tmp = input * 2.0;
+      output = input;
+    }
+    boundary_condition(zero_bc(), output);
+    vertical_region(k_start, k_end) {
+      shifted = output[i+1] + tmp;
+    }
+  }
+};
@@ -1,4 +1,8 @@
 from test_helpers import *
+import json
+import tempfile
+import Log
+from HaloExchange import PeriodicHaloExchange
 from dace.transformation.interstate import StateFusion, InlineSDFG
 from dace.transformation.dataflow import *
 
@@ -308,14 +312,30 @@ class horizontal_offsets(LegalSDFG, Asserts):
 
 class horizontal_temp_offsets(LegalSDFG, Asserts):
     def test_3_numerically(self):
+        self.check_numerically()
+
+    def test_3_numerically_in_3d(self):
+        self.check_numerically(Schedule(iteration_space='3d'))
+
+    def test_4_temporary_is_demoted(self):
+        # In k-maps, tmp is only accessed at the level of the iteration, so an IJ-plane of the nested SDFG holds it.
+        sdfg = get_sdfg(self.__class__.__name__ + ".iir")
+        self.assertNotIn('tmp', sdfg.arrays)
+        planes = [sub.arrays['tmp'] for sub in sdfg.all_sdfgs_recursive() if 'tmp' in sub.arrays]
+        self.assertTrue(planes)
+        for plane in planes:
+            self.assertTrue(plane.transient)
+            self.assertTrue(plane.shape[-1] == 1, plane.shape)
+
+    def check_numerically(self, schedule=None):
         dim = Dimensions([4,4,4], [4,4,5], 'ijk', halo=1)
         input = Iota(dim.ijk)
         output = Zeros(dim.ijk)
         output_dace = Zeros(dim.ijk)
 
-        # vertical_region(k_start+1, k_end) {
+        # vertical_region(k_start, k_end) {
         #     tmp = input;
-        #     output = tmp[k-1];
+        #     output = tmp[i-1];
         # }
 
         for i in range(dim.halo, dim.I-dim.halo):
@@ -323,7 +343,100 @@ class horizontal_temp_offsets(LegalSDFG, Asserts):
                 for k in range(0, dim.K):
                     output[i,j,k] = input[i-1,j,k]
 
+        sdfg = get_sdfg(self.__class__.__name__ + ".iir", schedule=schedule)
+        sdfg.save("gen/" + self.__class__.__name__ + ".sdfg")
+        sdfg.expand_library_nodes()
+        sdfg.apply_strict_transformations(validate=False)
+        sdfg.apply_transformations_repeated([InlineSDFG])
+        sdfg.save("gen/" + self.__class__.__name__ + "_expanded.sdfg")
+        sdfg = sdfg.compile()
+
+        sdfg(
+            input = input,
+            output = output_dace,
+            **dim.ProgramArguments())
+
+        self.assertEqual(output, output_dace)
+
+class k_cache_intervals(LegalSDFG, Asserts):
+    def test_3_numerically(self):
+        self.check_numerically()
+
+    def test_3_numerically_in_columns(self):
+        self.check_numerically(Schedule(vertical='column'))
+
+    def check_numerically(self, schedule=None):
+        dim = Dimensions([4,4,6], [4,4,7], 'ijk', halo=0)
+        input = Iota(dim.ijk)
+        output = Zeros(dim.ijk)
+        output_dace = Zeros(dim.ijk)
+
+        # vertical_region(k_start, k_start) { output = input[k+1] - input; }
+        # vertical_region(k_start+1, k_end) { output = output[k-1] + input[k-1] + input; }
+        # The intervals access input at different k-offsets, so neither may load the levels of the other.
+        for i in range(dim.halo, dim.I-dim.halo):
+            for j in range(dim.halo, dim.J-dim.halo):
+                output[i,j,0] = input[i,j,1] - input[i,j,0]
+                for k in range(1, dim.K):
+                    output[i,j,k] = output[i,j,k-1] + input[i,j,k-1] + input[i,j,k]
+
+        sdfg = get_sdfg(self.__class__.__name__ + ".iir", schedule=schedule)
+        sdfg.save("gen/" + self.__class__.__name__ + ".sdfg")
+        sdfg.expand_library_nodes()
+        sdfg.apply_strict_transformations(validate=False)
+        sdfg.apply_transformations_repeated([InlineSDFG])
+        sdfg.save("gen/" + self.__class__.__name__ + "_expanded.sdfg")
+        self.assertTrue(sdfg.is_valid())
+        sdfg = sdfg.compile()
+
+        sdfg(
+            input = input,
+            output = output_dace,
+            **dim.ProgramArguments())
+
+        self.assertEqual(output, output_dace)
+
+class k_cache_temporary(LegalSDFG, Asserts):
+    def test_3_numerically(self):
+        self.check_numerically()
+
+    def test_3_numerically_in_columns(self):
+        self.check_numerically(Schedule(vertical='column'))
+
+    def test_4_temporary_is_demoted_in_columns(self):
+        # tmp is read one level below the one written, also from one interval to the next,
+        # so a ring of two values per column holds it instead of a 3D field.
+        sdfg = get_sdfg(self.__class__.__name__ + ".iir", schedule=Schedule(vertical='column'))
+        self.assertNotIn('tmp', sdfg.arrays)
+        buffers = [array for sub in sdfg.all_sdfgs_recursive() for name, array in sub.arrays.items() if name.startswith('tmp_')]
+        self.assertTrue(buffers)
+        for buffer in buffers:
+            self.assertTrue(buffer.transient)
+            self.assertTrue(buffer.shape[-1] == 2, buffer.shape)
+
+    def test_4_temporary_stays_in_memory_in_planes(self):
+        # A stencil of an IJ-plane cannot read two levels of a ring.
         sdfg = get_sdfg(self.__class__.__name__ + ".iir")
+        self.assertIn('tmp', sdfg.arrays)
+
+    def check_numerically(self, schedule=None):
+        dim = Dimensions([4,4,6], [4,4,7], 'ijk', halo=0)
+        input = Iota(dim.ijk)
+        output = Zeros(dim.ijk)
+        output_dace = Zeros(dim.ijk)
+
+        # vertical_region(k_start, k_start) { tmp = input; output = tmp; }
+        # vertical_region(k_start+1, k_end) { tmp = tmp[k-1] + input; output = tmp[k-1] * 2.0 + tmp; }
+        tmp = Zeros(dim.ijk)
+        for i in range(dim.halo, dim.I-dim.halo):
+            for j in range(dim.halo, dim.J-dim.halo):
+                tmp[i,j,0] = input[i,j,0]
+                output[i,j,0] = tmp[i,j,0]
+                for k in range(1, dim.K):
+                    tmp[i,j,k] = tmp[i,j,k-1] + input[i,j,k]
+                    output[i,j,k] = tmp[i,j,k-1] * 2.0 + tmp[i,j,k]
+
+        sdfg = get_sdfg(self.__class__.__name__ + ".iir", schedule=schedule)
         sdfg.save("gen/" + self.__class__.__name__ + ".sdfg")
         sdfg.expand_library_nodes()
         sdfg.apply_strict_transformations(validate=False)
@@ -338,6 +451,167 @@ class horizontal_temp_offsets(LegalSDFG, Asserts):
 
         self.assertEqual(output, output_dace)
 
+class shared_temporary(LegalSDFG, Asserts):
+    def test_3_numerically(self):
+        dim = Dimensions([5,5,4], [5,5,5], 'ijk', halo=1)
+        input = Iota(dim.ijk)
+        shifted = Zeros(dim.ijk)
+        output_dace = Zeros(dim.ijk)
+        shifted_dace = Zeros(dim.ijk)
+
+        # vertical_region(k_start, k_end) { tmp = input * 2.0; output = input; }
+        # boundary_condition(zero_bc(), output); with zero_bc: data = 0.0;
+        # vertical_region(k_start, k_end) { shifted = output[i+1] + tmp; }
+        # The boundary condition splits the stencil, so tmp is written by one stencil and read by the next.
+        h, I, J = dim.halo, dim.I, dim.J
+        inner = (slice(h, I-h), slice(h, J-h))
+        output = numpy.zeros(dim.ijk.shape)
+        output[inner] = input[inner]
+        shifted[inner] = output[h+1:I-h+1, h:J-h] + input[inner] * 2.0
+
+        sdfg = get_sdfg(self.__class__.__name__ + ".iir")
+        self.assertIn('tmp', sdfg.arrays) # It has to live on between the stencils.
+        sdfg.save("gen/" + self.__class__.__name__ + ".sdfg")
+        sdfg.expand_library_nodes()
+        sdfg.apply_strict_transformations(validate=False)
+        sdfg.apply_transformations_repeated([InlineSDFG])
+        sdfg.save("gen/" + self.__class__.__name__ + "_expanded.sdfg")
+        sdfg = sdfg.compile()
+
+        sdfg(
+            input = input,
+            output = output_dace,
+            shifted = shifted_dace,
+            **dim.ProgramArguments())
+
+        self.assertEqual(output[inner], output_dace[inner])
+        self.assertEqual(shifted, shifted_dace)
+
+class fused_extents(LegalSDFG, Asserts):
+    def test_3_numerically(self):
+        dim = Dimensions([4,4,4], [4,4,5], 'ijk', halo=1)
+        input = Iota(dim.ijk)
+        output = Zeros(dim.ijk)
+        shifted = Zeros(dim.ijk)
+        output_dace = Zeros(dim.ijk)
+        shifted_dace = Zeros(dim.ijk)
+
+        # vertical_region(k_start, k_end) { tmp = input * 2.0; }
+        # vertical_region(k_start, k_end) { output = tmp + 1.0; }
+        # vertical_region(k_start, k_end) { shifted = tmp[i+1]; }
+        # The first stage also computes tmp at i+1, which the second must not write into output.
+        for i in range(dim.halo, dim.I-dim.halo):
+            for j in range(dim.halo, dim.J-dim.halo):
+                for k in range(0, dim.K):
+                    output[i,j,k] = input[i,j,k] * 2.0 + 1.0
+                    shifted[i,j,k] = input[i+1,j,k] * 2.0
+
+        sdfg = get_sdfg(self.__class__.__name__ + ".iir")
+        sdfg.save("gen/" + self.__class__.__name__ + ".sdfg")
+        sdfg.expand_library_nodes()
+        sdfg.apply_strict_transformations(validate=False)
+        sdfg.apply_transformations_repeated([InlineSDFG])
+        sdfg.save("gen/" + self.__class__.__name__ + "_expanded.sdfg")
+        sdfg = sdfg.compile()
+
+        sdfg(
+            input = input,
+            output = output_dace,
+            shifted = shifted_dace,
+            **dim.ProgramArguments())
+
+        self.assertEqual(output, output_dace)
+        self.assertEqual(shifted, shifted_dace)
+
+class grown_extents(LegalSDFG, Asserts):
+    def test_3_numerically(self):
+        dim = Dimensions([4,4,4], [4,4,5], 'ijk', halo=1)
+        input = Iota(dim.ijk)
+        output = Zeros(dim.ijk)
+        output_dace = Zeros(dim.ijk)
+
+        # vertical_region(k_start, k_end) { a = input * 2.0; }
+        # vertical_region(k_start, k_end) { b = a + input; }
+        # vertical_region(k_start, k_end) { output = b[i+1] + a[i-1]; }
+        for i in range(dim.halo, dim.I-dim.halo):
+            for j in range(dim.halo, dim.J-dim.halo):
+                for k in range(0, dim.K):
+                    output[i,j,k] = input[i+1,j,k] * 3.0 + input[i-1,j,k] * 2.0
+
+        sdfg = get_sdfg(self.__class__.__name__ + ".iir")
+        sdfg.save("gen/" + self.__class__.__name__ + ".sdfg")
+        sdfg.expand_library_nodes()
+        sdfg.apply_strict_transformations(validate=False)
+        sdfg.apply_transformations_repeated([InlineSDFG])
+        sdfg.save("gen/" + self.__class__.__name__ + "_expanded.sdfg")
+        sdfg = sdfg.compile()
+
+        sdfg(
+            input = input,
+            output = output_dace,
+            **dim.ProgramArguments())
+
+        self.assertEqual(output, output_dace)
+
+    def test_4_smaller_stage_is_grown(self):
+        # b is computed in i+1 only and a in i-1 and i+1, so b's stage is grown to a's to fuse them.
+        with tempfile.TemporaryDirectory() as tmp:
+            file_name = os.path.join(tmp, 'events.jsonl')
+            Log.Configure(event_file=file_name)
+            try:
+                get_sdfg(self.__class__.__name__ + ".iir")
+            finally:
+                Log.Configure()
+            with open(file_name) as f:
+                fusions = [event for event in map(json.loads, f) if event['pass'] == 'FuseStages']
+        self.assertTrue(len(fusions) == 1)
+        self.assertTrue(len(fusions[0]['do_methods']) == 2)
+        self.assertTrue(len(fusions[0]['grown']) == 1)
+
+class boundary_condition(LegalSDFG, Asserts):
+    def test_3_numerically(self):
+        self.check_numerically()
+
+    def test_3_numerically_with_periodic_halos(self):
+        self.check_numerically(PeriodicHaloExchange('ij'))
+
+    def check_numerically(self, halo_exchange=None):
+        dim = Dimensions([6,5,4], [6,5,5], 'ijk', halo=1)
+        input = Iota(dim.ijk)
+        shifted = Zeros(dim.ijk)
+        output_dace = Zeros(dim.ijk)
+        shifted_dace = Zeros(dim.ijk)
+
+        # vertical_region(k_start, k_end) { output = input; }
+        # boundary_condition(constant_bc(), output); with constant_bc: data = 10.0;
+        # vertical_region(k_start, k_end) { shifted = output[i+1] + output[j-1]; }
+        h, I, J = dim.halo, dim.I, dim.J
+        inner = (slice(h, I-h), slice(h, J-h))
+        if halo_exchange is None:
+            output = numpy.full(dim.ijk.shape, 10.0)
+            output[inner] = input[inner]
+        else:
+            # The exchange updates every side, so the functor updates none.
+            output = numpy.pad(input[inner], ((h, h), (h, h), (0, 0)), mode='wrap')
+        shifted[inner] = output[h+1:I-h+1, h:J-h] + output[h:I-h, h-1:J-h-1]
+
+        sdfg = get_sdfg(self.__class__.__name__ + ".iir", halo_exchange=halo_exchange)
+        sdfg.save("gen/" + self.__class__.__name__ + ".sdfg")
+        sdfg.expand_library_nodes()
+        sdfg.apply_strict_transformations(validate=False)
+        sdfg.apply_transformations_repeated([InlineSDFG])
+        sdfg.save("gen/" + self.__class__.__name__ + "_expanded.sdfg")
+        sdfg = sdfg.compile()
+
+        sdfg(
+            input = input,
+            output = output_dace,
+            shifted = shifted_dace,
+            **dim.ProgramArguments())
+
+        self.assertEqual(output[inner], output_dace[inner])
+        self.assertEqual(shifted, shifted_dace)
+
 class vertical_offsets(LegalSDFG, Asserts):
     def test_3_numerically(self):
         dim = Dimensions([4,4,4], [4,4,5], 'ijk', halo=0)
@@ -2,8 +2,8 @@ import unittest
 import numpy
 import sys
 import os
-import math
 from helpers import *
+from reference_stencils import WaveValues
 from numpy.lib.stride_tricks import as_strided
 from dace.transformation.interstate import InlineSDFG
 from dace.transformation.dataflow import MapFission, MapCollapse, MapFusion, MapExpansion, MapToForLoop, TrivialMapElimination, TrivialMapRangeElimination
@@ -21,9 +21,9 @@ def read_file(file_name):
         return f.read() # IIR as binary str.
     return None
 
-def get_sdfg(file_name):
+def get_sdfg(file_name, **options):
     iir = read_file(file_name)
-    return dawn2dace.IIR_str_to_SDFG(iir)
+    return dawn2dace.IIR_str_to_SDFG(iir, **options)
 
 def Zeros(dim:Dim, floattype=dace.float64):
     arr = numpy.zeros(dim.total_size, dtype=floattype.type)
@@ -37,13 +37,7 @@ def Iota(dim:Dim, offset=0, floattype=dace.float64):
 
 def Waves(a, b, c, d, e, f, dim:Dim):
     data = Zeros(dim)
-    for i in range(dim.I or 1):
-        for j in range(dim.J or 1):
-            for k in range(dim.K or 1):
-                index = tuple(index for index, size in [(i,dim.I),(j,dim.J),(k,dim.K)] if size)
-                x = i / (dim.I or 1)
-                y = j / (dim.J or 1)
-                data[index] = k * 0.01 + a * (b + math.cos(math.pi * (x + c * y)) + math.sin(d * math.pi * (x + e * y))) / f
+    data[...] = WaveValues(a, b, c, d, e, f, dim)
     return data
     
 class LegalSDFG: